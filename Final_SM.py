@@ -1,7 +1,32 @@
 # -------------------- School Management System --------------------
 from colorama import Fore, Back, Style, init
 from prettytable import PrettyTable
-from datetime import datetime
+from datetime import datetime, timedelta
+import csv
+import copy
+import re
+import sys
+import argparse
+import os
+import html
+import itertools
+import multiprocessing
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from bisect import bisect_left, bisect_right, insort
+from math import isfinite, sqrt
+import heapq
+import asyncio
+import threading
+import smtplib
+import json
+import time
+import http.client
+from urllib.parse import urlsplit, parse_qs, unquote
+from email.message import EmailMessage
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import wraps
 
 init(autoreset=True)
 
@@ -35,10 +60,53 @@ def normalize_class_name(c):
             return f"Class {n}"
     return None
 
+def is_valid_date(date_str):
+    try:
+        datetime.strptime(date_str, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
 def is_valid_weekday(day_str):
     valid_days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
     return day_str.capitalize() in valid_days
 
+def class_number(grade):
+    # "Class 10" -> 10, for a grade as normalize_class_name stores it
+    return int(grade.split()[1])
+
+RANGE_OPS = ("=", "<", "<=", ">", ">=", "between")
+
+def compare(value, op, arg):
+    # value <op> arg; "between" takes (low, high), both ends included
+    if op == "between":
+        return arg[0] <= value <= arg[1]
+    if op == "=":
+        return value == arg
+    if op == "!=":
+        return value != arg
+    if op == "<":
+        return value < arg
+    if op == "<=":
+        return value <= arg
+    if op == ">":
+        return value > arg
+    return value >= arg
+
+def sorted_range(entries, op, arg):
+    # (start, stop) of the (value, key) entries of a sorted list with value <op> arg
+    low, high = arg if op == "between" else (arg, arg)
+    start, stop = 0, len(entries)
+    if op in ("=", ">=", "between"):
+        start = bisect_left(entries, (low,))
+    elif op == ">":
+        start = bisect_right(entries, (low, "\U0010ffff"))
+    if op in ("=", "<=", "between"):
+        stop = bisect_right(entries, (high, "\U0010ffff"))
+    elif op == "<":
+        stop = bisect_left(entries, (high,))
+    return start, max(start, stop)
+
 
 
 def header(title):
@@ -46,70 +114,420 @@ def header(title):
     print(Fore.MAGENTA + f"  {title}")
     print(Fore.MAGENTA + "-" * 48 + Style.RESET_ALL)
 
+# -------------------- Errors --------------------
+# raised by the manager service methods; the menus print them, batch mode logs them
+
+class SchoolError(Exception):
+    pass
+
+class ValidationError(SchoolError, ValueError):
+    pass
+
+class NotFoundError(SchoolError, LookupError):
+    pass
+
+# -------------------- Locking --------------------
+# Managers can be shared between threads (API server, batch jobs). Each has a
+# reader-writer lock; exam marks and fee payments are further partitioned by
+# class so writes to one class don't block reports on another. Lock order:
+# manager lock, then class locks (sorted), then the fee ledger, then the
+# student manager, which never takes another manager's lock.
+
+class RWLock:
+    # many readers or one writer; a waiting writer holds back new readers so
+    # busy reports can't starve it. Re-entrant per thread, but a reader can't
+    # upgrade to a writer.
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = {}  # thread id -> read depth
+        self._writer = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me or me in self._readers:
+                self._readers[me] = self._readers.get(me, 0) + 1
+                return
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers[me] = 1
+
+    def release_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._readers[me] > 1:
+                self._readers[me] -= 1
+                return
+            del self._readers[me]
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            if me in self._readers:
+                raise RuntimeError("cannot upgrade a read lock to a write lock")
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self):
+        with self._cond:
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+class PartitionLocks:
+    # one RWLock per key (a class name), created on first use
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def __getitem__(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._guard:
+                lock = self._locks.setdefault(key, RWLock())
+        return lock
+
+    @contextmanager
+    def write_many(self, keys):
+        # always in sorted order, so two multi-class writers can't deadlock
+        locks = [self[k] for k in sorted(set(keys), key=str)]
+        for lock in locks:
+            lock.acquire_write()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release_write()
+
+    @contextmanager
+    def read_many(self, keys):
+        # same order as write_many
+        locks = [self[k] for k in sorted(set(keys), key=str)]
+        for lock in locks:
+            lock.acquire_read()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release_read()
+
+def read_locked(method):
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock.read():
+            return method(self, *args, **kwargs)
+    return locked
+
+def write_locked(method):
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock.write():
+            return method(self, *args, **kwargs)
+    return locked
+
+# -------------------- Snapshots --------------------
+# Long reports (the fee dashboard, report card export, statistics for every
+# exam) run on a frozen copy of a manager rather than holding its locks
+# throughout. Writers never change a stored record in place - a student, a
+# student's marks in one exam, a balance, a payment - they build a new one and
+# swap it in, so a snapshot only copies the indexes and stays point-in-time
+# however long the report takes. Taking one holds the manager's write lock for
+# the copy only, so it never sees a half-applied write; the exam manager, whose
+# marks writers hold its read lock and their class's write lock, takes read
+# locks on both instead, so reports keep running while it copies.
+
+def frozen_copy(manager):
+    # shallow copy with locks of its own; the caller replaces every index writers change
+    snap = copy.copy(manager)
+    snap.lock = RWLock()
+    if hasattr(manager, "class_locks"):
+        snap.class_locks = PartitionLocks()
+    snap.frozen = True
+    # timing wrappers (Instrumentation) are bound to the live manager; the copy runs its own methods
+    for name, value in list(vars(snap).items()):
+        if getattr(value, "instrumented", False):
+            delattr(snap, name)
+    return snap
+
+# -------------------- Change Events --------------------
+# Managers don't reach into each other to clean up after a student changes.
+# The student manager publishes what happened and the exam and fee managers
+# subscribe, each following its own back-reference index (reg_no -> the exams
+# or payments that mention the student), so a change touches only the related
+# records. Events are queued under the student manager's lock, so they are in
+# the order the changes were made, and delivered after it is released, which
+# keeps it a leaf in the lock order. The delivery lock comes before every
+# manager lock.
+
+class EventBus:
+    def __init__(self):
+        self._handlers = {}  # event name -> [handler], called in the order subscribed
+        self._queue = deque()
+        self._delivering = threading.RLock()
+
+    def subscribe(self, event, handler):
+        self._handlers.setdefault(event, []).append(handler)
+
+    def publish(self, event, **details):
+        # called with the publisher's lock held; deliver() once it is released
+        self._queue.append((event, details))
+
+    def pending(self):
+        return bool(self._queue)
+
+    def deliver(self):
+        # one event at a time, in publish order; returns once everything queued so far is handled
+        with self._delivering:
+            while self._queue:
+                event, details = self._queue.popleft()
+                for handler in self._handlers.get(event, ()):
+                    handler(**details)
+
+    @contextmanager
+    def paused(self):
+        # nothing is delivered until the block ends
+        with self._delivering:
+            yield
+
 # -------------------- Student Manager --------------------
 
 class StudentManager:
     DEFAULT_SUBJECTS = ["Tamil", "English", "Maths", "Science", "Social Science", "Computer Science"]
+    FIELDS = ("name", "grade", "age", "gender", "email", "phone")
+    EDITABLE = ("reg_no",) + FIELDS
+    frozen = False  # True on a snapshot
 
     def __init__(self):
         # list of student dicts; key fields: reg_no, name, grade, age, gender, email, phone
         self.students = []
+        self._by_reg = {}  # reg_no (lower case) -> student dict
+        # secondary indexes for queries: grade / gender -> {reg_no (lower case): student},
+        # and (age, reg_no lower case) kept sorted for age ranges
+        self._by_grade = {}
+        self._by_gender = {}
+        self._ages = []
+        self.lock = RWLock()
+        # "student_added" (student), "student_changed" (before, after) and "student_removed" (student)
+        self.events = EventBus()
 
     def get_student(self, reg_no):
-        return next((s for s in self.students if s["reg_no"].lower() == reg_no.lower()), None)
-
-    def add_student(self):
-        header("Add Student")
-        name = input("Name: ").strip()
-        if not is_valid_name(name):
-            print(Fore.RED + " Invalid name (letters and spaces only).")
-            return
+        return self._by_reg.get(reg_no.lower())
 
-        reg_no = input("Register number (alphanumeric): ").strip()
-        if not is_alphanumeric(reg_no):
-            print(Fore.RED + " Invalid register number (must be alphanumeric).")
-            return
-        if self.get_student(reg_no):
-            print(Fore.RED + " A student with this register number already exists.")
-            return
+    def require_student(self, reg_no):
+        student = self.get_student(str(reg_no).strip())
+        if not student:
+            raise NotFoundError("Student not found.")
+        return student
 
-        grade_raw = input("Class (1-12 or 'Class N'): ").strip()
-        grade = normalize_class_name(grade_raw)
-        if not grade:
-            print(Fore.RED + " Invalid class (must be 1..12).")
-            return
+    def clean_field(self, field, value):
+        # validated value of one student field, in the form it is stored
+        value = str(value).strip()
+        if field == "reg_no":
+            if not is_alphanumeric(value):
+                raise ValidationError("Invalid register number (must be alphanumeric).")
+            if self.get_student(value):
+                raise ValidationError("A student with this register number already exists.")
+            return value
+        if field == "name":
+            if not is_valid_name(value):
+                raise ValidationError("Invalid name (letters and spaces only).")
+            return value
+        if field == "grade":
+            grade = normalize_class_name(value)
+            if not grade:
+                raise ValidationError("Invalid class (must be 1..12).")
+            return grade
+        if field == "age":
+            if not is_valid_age(value):
+                raise ValidationError("Invalid age. Must be numeric between 3 and 120.")
+            return int(value)
+        if field == "gender":
+            if not is_valid_gender(value):
+                raise ValidationError("Invalid gender.")
+            return value.title()
+        if field == "email":
+            if not is_valid_email(value):
+                raise ValidationError("Invalid email.")
+            return value
+        if field == "phone":
+            if not is_valid_phone(value):
+                raise ValidationError("Invalid phone.")
+            return value
+        raise ValidationError("Invalid field.")
 
-        age = input("Age: ").strip()
-        if not is_valid_age(age):
-            print(Fore.RED + " Invalid age. Must be numeric between 3 and 120.")
-            return
+    def _index(self, s):
+        key = s["reg_no"].lower()
+        self._by_reg[key] = s
+        self._by_grade.setdefault(s["grade"], {})[key] = s
+        self._by_gender.setdefault(s["gender"], {})[key] = s
+        insort(self._ages, (s["age"], key))
 
-        gender = input("Gender (Male/Female/Other): ").strip()
-        if not is_valid_gender(gender):
-            print(Fore.RED + " Invalid gender.")
-            return
+    def _unindex(self, s):
+        key = s["reg_no"].lower()
+        del self._by_reg[key]
+        del self._by_grade[s["grade"]][key]
+        del self._by_gender[s["gender"]][key]
+        del self._ages[bisect_left(self._ages, (s["age"], key))]
 
-        email = input("Email: ").strip()
-        if not is_valid_email(email):
-            print(Fore.RED + " Invalid email.")
-            return
+    # ---- service methods ----
 
-        phone = input("Phone: ").strip()
-        if not is_valid_phone(phone):
-            print(Fore.RED + " Invalid phone.")
-            return
+    def create_student(self, name, reg_no, grade, age, gender, email, phone):
+        # a removal still being handled must not catch a new student with the same reg_no
+        self.events.deliver()
+        s = self._create_student(name, reg_no, grade, age, gender, email, phone)
+        self.events.deliver()
+        return s
 
-        student = {
-            "reg_no": reg_no,
-            "name": name,
-            "grade": grade,
-            "age": int(age),
-            "gender": gender.title(),
-            "email": email,
-            "phone": phone
-        }
+    @write_locked
+    def _create_student(self, name, reg_no, grade, age, gender, email, phone):
+        student = {"reg_no": self.clean_field("reg_no", reg_no)}
+        for field, value in zip(self.FIELDS, (name, grade, age, gender, email, phone)):
+            student[field] = self.clean_field(field, value)
         self.students.append(student)
-        print(Fore.GREEN + f" Student '{name}' added to {grade} (Reg: {reg_no}).")
+        self._index(student)
+        self.events.publish("student_added", student=student)
+        return student
+
+    def edit_student(self, reg_no, field, value):
+        s = self._edit_student(reg_no, field, value)
+        self.events.deliver()
+        return s
+
+    @write_locked
+    def _edit_student(self, reg_no, field, value):
+        old = self.require_student(reg_no)
+        field = str(field).strip().lower()
+        if field not in self.EDITABLE:
+            raise ValidationError("Invalid field.")
+        # a new record swapped in, so snapshots keep the old one
+        s = dict(old, **{field: self.clean_field(field, value)})
+        self.students[self.students.index(old)] = s
+        self._unindex(old)
+        self._index(s)
+        self.events.publish("student_changed", before=old, after=s)
+        return s
+
+    def delete_student(self, reg_no):
+        s = self._delete_student(reg_no)
+        self.events.deliver()
+        return s
+
+    @write_locked
+    def _delete_student(self, reg_no):
+        s = self.require_student(reg_no)
+        self.students.remove(s)
+        self._unindex(s)
+        self.events.publish("student_removed", student=s)
+        return s
+
+    @read_locked
+    def find_students(self, keyword):
+        kw = str(keyword).strip().lower()
+        return [s for s in self.students if kw in s["name"].lower() or kw in s["reg_no"].lower()]
+
+    @read_locked
+    def class_counts(self):
+        summary = {grade: len(members) for grade, members in self._by_grade.items() if members}
+        return dict(sorted(summary.items(), key=lambda x: int("".join(ch for ch in x[0] if ch.isdigit()))))
+
+    @read_locked
+    def index_scan(self, field, op, value, count_only=False):
+        # the students one index yields for `field op value` (or just how many),
+        # None if no index answers it; grade compares by class number
+        if field == "reg_no" and op == "=":
+            s = self._by_reg.get(value.lower())
+            hits = [s] if s else []
+        elif field == "gender" and op == "=":
+            hits = self._by_gender.get(value, {})
+            return len(hits) if count_only else list(hits.values())
+        elif field == "grade" and op in RANGE_OPS:
+            groups = [members for grade, members in self._by_grade.items() if compare(class_number(grade), op, value)]
+            if count_only:
+                return sum(len(members) for members in groups)
+            hits = [s for members in groups for s in members.values()]
+        elif field == "age" and op in RANGE_OPS:
+            start, stop = sorted_range(self._ages, op, value)
+            if count_only:
+                return stop - start
+            hits = [self._by_reg[key] for _, key in self._ages[start:stop]]
+        else:
+            return None
+        return len(hits) if count_only else hits
+
+    @read_locked
+    def students_in_class(self, grade):
+        grade = self.clean_field("grade", grade)
+        return list(self._by_grade.get(grade, {}).values())
+
+    def snapshot(self):
+        if self.frozen:
+            return self
+        with self.lock.read():
+            snap = frozen_copy(self)
+            snap.students = list(self.students)
+            snap._by_reg = dict(self._by_reg)
+            snap._by_grade = {grade: dict(members) for grade, members in self._by_grade.items()}
+            snap._by_gender = {gender: dict(members) for gender, members in self._by_gender.items()}
+            snap._ages = list(self._ages)
+        return snap
+
+    def settled_snapshot(self):
+        # a snapshot whose every change has reached the subscribers; taken inside
+        # events.paused(), so no later change reaches them before the caller is done
+        while True:
+            self.events.deliver()
+            with self.lock.read():
+                if not self.events.pending():
+                    return self.snapshot()
+
+    # ---- menu actions ----
+
+    def add_student(self):
+        header("Add Student")
+        try:
+            # each answer is checked as soon as it is typed
+            name = self.clean_field("name", input("Name: "))
+            reg_no = self.clean_field("reg_no", input("Register number (alphanumeric): "))
+            grade = self.clean_field("grade", input("Class (1-12 or 'Class N'): "))
+            age = self.clean_field("age", input("Age: "))
+            gender = self.clean_field("gender", input("Gender (Male/Female/Other): "))
+            email = self.clean_field("email", input("Email: "))
+            phone = self.clean_field("phone", input("Phone: "))
+            student = self.create_student(name, reg_no, grade, age, gender, email, phone)
+        except SchoolError as e:
+            print(Fore.RED + f" {e}")
+            return
+        print(Fore.GREEN + f" Student '{name}' added to {student['grade']} (Reg: {reg_no}).")
 
     def view_students(self):
         header("Students List")
@@ -117,7 +535,8 @@ class StudentManager:
             print(Fore.YELLOW + "No students found.")
             return
         # default sorted by grade then roll
-        sorted_list = sorted(self.students, key=lambda s: (int("".join(ch for ch in s["grade"] if ch.isdigit())), s["reg_no"]))
+        with self.lock.read():
+            sorted_list = sorted(self.students, key=lambda s: (int("".join(ch for ch in s["grade"] if ch.isdigit())), s["reg_no"]))
         for s in sorted_list:
             print(f"{Fore.CYAN}{s['reg_no']}{Style.RESET_ALL} | {s['name']} | {s['grade']} | Age: {s['age']} | {s['gender']} | {s['email']} | {s['phone']}")
 
@@ -129,48 +548,20 @@ class StudentManager:
             print(Fore.RED + " Student not found.")
             return
         print(Fore.YELLOW + f"Current record: {s}")
-        valid_fields = ("name", "grade", "age", "gender", "email", "phone")
         while True:
-            print("Which field to update? (name / grade / age / gender / email / phone)")
+            print("Which field to update? (reg_no / name / grade / age / gender / email / phone)")
             field = input("Field: ").strip().lower()
-            if field not in valid_fields:
+            if field not in self.EDITABLE:
                 print(Fore.RED + " Invalid field.")
                 continue
             new_val = input(f"Enter new value for {field}: ").strip()
-            # validate
-            if field == "name":
-                if not is_valid_name(new_val):
-                    print(Fore.RED + " Invalid name (letters and spaces only).")
-                    continue
-                s["name"] = new_val
-            elif field == "grade":
-                norm = normalize_class_name(new_val)
-                if not norm:
-                    print(Fore.RED + " Invalid class (must be 1..12).")
-                    continue
-                s["grade"] = norm
-            elif field == "age":
-                if not is_valid_age(new_val):
-                    print(Fore.RED + " Invalid age. Must be numeric between 3 and 120.")
-                    continue
-                s["age"] = int(new_val)
-            elif field == "gender":
-                if not is_valid_gender(new_val):
-                    print(Fore.RED + " Invalid gender.")
-                    continue
-                s["gender"] = new_val.title()
-            elif field == "email":
-                if not is_valid_email(new_val):
-                    print(Fore.RED + " Invalid email.")
-                    continue
-                s["email"] = new_val
-            elif field == "phone":
-                if not is_valid_phone(new_val):
-                    print(Fore.RED + " Invalid phone.")
-                    continue
-                s["phone"] = new_val
+            try:
+                updated = self.edit_student(s["reg_no"], field, new_val)
+            except ValidationError as e:
+                print(Fore.RED + f" {e}")
+                continue
             print(Fore.GREEN + f" Updated {field} for {s['name']}.")
-            break
+            return updated["reg_no"]
 
     def remove_student(self):
         header("Remove Student")
@@ -181,15 +572,15 @@ class StudentManager:
             return
         confirm = input(Fore.YELLOW + f"Confirm remove {s['name']} (y/N): ").strip().lower()
         if confirm == "y":
-            self.students.remove(s)
+            self.delete_student(s["reg_no"])
             print(Fore.GREEN + f" Student {s['name']} removed.")
+            return s["reg_no"]
         else:
             print("Cancelled.")
 
     def search_student(self):
         header("Search Student")
-        kw = input("Enter name or register number to search: ").strip().lower()
-        results = [s for s in self.students if kw in s["name"].lower() or kw in s["reg_no"].lower()]
+        results = self.find_students(input("Enter name or register number to search: "))
         if not results:
             print(Fore.YELLOW + "No matching students.")
             return
@@ -198,23 +589,20 @@ class StudentManager:
 
     def count_students_per_class(self):
         header("Students per Class")
-        summary = {}
-        for s in self.students:
-            summary[s["grade"]] = summary.get(s["grade"], 0) + 1
+        summary = self.class_counts()
         if not summary:
             print(Fore.YELLOW + "No students.")
             return
-        for grade in sorted(summary.keys(), key=lambda g: int("".join(ch for ch in g if ch.isdigit()))):
-            print(f"{grade}: {summary[grade]} students")
+        for grade, count in summary.items():
+            print(f"{grade}: {count} students")
 
     def list_students_by_class(self):
         header("Students by Class")
-        class_input = input("Enter class (1-12 or 'Class N'): ").strip()
-        grade = normalize_class_name(class_input)
+        grade = normalize_class_name(input("Enter class (1-12 or 'Class N'): ").strip())
         if not grade:
             print(Fore.RED + " Invalid class.")
             return
-        students = [s for s in self.students if s["grade"] == grade]
+        students = self.students_in_class(grade)
         if not students:
             print(Fore.YELLOW + f"No students in {grade}.")
             return
@@ -225,30 +613,94 @@ class StudentManager:
 
 class TeacherManager:
     DEFAULT_SUBJECTS = StudentManager.DEFAULT_SUBJECTS
+    FIELDS = ("name", "experience", "qualifications")
 
     def __init__(self):
         self.teachers = []  # dict: id, name, experience, qualifications, subjects(list)
         self._counter = 1
+        self.lock = RWLock()
 
+    @read_locked
     def get_teacher(self, tid):
         return next((t for t in self.teachers if t["id"].lower() == tid.lower()), None)
 
+    def require_teacher(self, tid):
+        t = self.get_teacher(str(tid).strip())
+        if not t:
+            raise NotFoundError("Teacher not found.")
+        return t
+
+    def clean_field(self, field, value):
+        value = str(value).strip()
+        if field == "name":
+            if not is_valid_name(value):
+                raise ValidationError("Invalid name.")
+            return value
+        if field == "experience":
+            if not value.isdigit():
+                raise ValidationError("Experience must be numeric.")
+            return int(value)
+        if field == "qualifications":
+            return value
+        raise ValidationError("Invalid field.")
+
+    # ---- service methods ----
+
+    @write_locked
+    def create_teacher(self, name, experience, qualifications):
+        t = {"id": None}
+        for field, value in zip(self.FIELDS, (name, experience, qualifications)):
+            t[field] = self.clean_field(field, value)
+        t["subjects"] = []
+        t["id"] = f"T{self._counter:03d}"
+        self.teachers.append(t)
+        self._counter += 1
+        return t
+
+    @write_locked
+    def edit_teacher(self, tid, field, value):
+        t = self.require_teacher(tid)
+        field = str(field).strip().lower()
+        if field not in self.FIELDS:
+            raise ValidationError("Invalid field.")
+        t[field] = self.clean_field(field, value)
+        return t
+
+    @write_locked
+    def delete_teacher(self, tid):
+        t = self.require_teacher(tid)
+        self.teachers.remove(t)
+        return t
+
+    @write_locked
+    def assign_subject_to_teacher(self, tid, subject):
+        t = self.require_teacher(tid)
+        subject = str(subject).strip()
+        if subject not in self.DEFAULT_SUBJECTS:
+            raise ValidationError("Invalid subject.")
+        if subject in t["subjects"]:
+            raise ValidationError("Subject already assigned.")
+        t["subjects"].append(subject)
+        return t
+
+    @read_locked
+    def subject_teachers(self):
+        # subject -> teachers assigned to it, for every default subject
+        return {subject: [t for t in self.teachers if subject in t["subjects"]] for subject in self.DEFAULT_SUBJECTS}
+
+    # ---- menu actions ----
+
     def add_teacher(self):
         header("Add Teacher")
-        name = input("Name: ").strip()
-        if not is_valid_name(name):
-            print(Fore.RED + " Invalid name.")
-            return
-        experience = input("Experience (years): ").strip()
-        if not experience.isdigit():
-            print(Fore.RED + " Experience must be numeric.")
+        try:
+            name = self.clean_field("name", input("Name: "))
+            experience = self.clean_field("experience", input("Experience (years): "))
+            qual = input("Qualifications: ")
+            t = self.create_teacher(name, experience, qual)
+        except SchoolError as e:
+            print(Fore.RED + f" {e}")
             return
-        qual = input("Qualifications: ").strip()
-        tid = f"T{self._counter:03d}"
-        t = {"id": tid, "name": name, "experience": int(experience), "qualifications": qual, "subjects": []}
-        self.teachers.append(t)
-        self._counter += 1
-        print(Fore.GREEN + f" Teacher {name} added with ID {tid}")
+        print(Fore.GREEN + f" Teacher {name} added with ID {t['id']}")
 
     def view_teachers(self):
         header("Teachers List")
@@ -261,70 +713,67 @@ class TeacherManager:
 
     def update_teacher(self):
         header("Update Teacher")
-        tid = input("Teacher ID: ").strip()
-        t = self.get_teacher(tid)
-        if not t:
-            print(Fore.RED + " Teacher not found.")
+        try:
+            t = self.require_teacher(input("Teacher ID: "))
+        except SchoolError as e:
+            print(Fore.RED + f" {e}")
             return
-        valid_fields = ("name", "experience", "qualifications")
         while True:
             print("Fields: name, experience, qualifications")
             field = input("Field to update: ").strip().lower()
-            if field not in valid_fields:
+            if field not in self.FIELDS:
                 print(Fore.RED + " Invalid field.")
                 continue
             new = input(f"Enter new {field}: ").strip()
-            if field == "name":
-                if not is_valid_name(new):
-                    print(Fore.RED + " Invalid name.")
-                    continue
-                t["name"] = new
-            elif field == "experience":
-                if not new.isdigit():
-                    print(Fore.RED + " Experience must be numeric.")
-                    continue
-                t["experience"] = int(new)
-            else:
-                t["qualifications"] = new
+            try:
+                self.edit_teacher(t["id"], field, new)
+            except ValidationError as e:
+                print(Fore.RED + f" {e}")
+                continue
+            except SchoolError as e:
+                print(Fore.RED + f" {e}")  # removed at another terminal meanwhile
+                return
             print(Fore.GREEN + f" Updated teacher {t['id']}.")
             break
 
     def remove_teacher(self):
         header("Remove Teacher")
-        tid = input("Teacher ID: ").strip()
-        t = self.get_teacher(tid)
-        if not t:
-            print(Fore.RED + " Teacher not found.")
+        try:
+            t = self.require_teacher(input("Teacher ID: "))
+        except SchoolError as e:
+            print(Fore.RED + f" {e}")
             return
         confirm = input(Fore.YELLOW + f"Confirm remove {t['name']} (y/N): ").strip().lower()
-        if confirm == "y":
-            self.teachers.remove(t)
-            print(Fore.GREEN + f" Teacher {t['name']} removed.")
-        else:
+        if confirm != "y":
             print("Cancelled.")
+            return
+        try:
+            self.delete_teacher(t["id"])
+        except SchoolError as e:
+            print(Fore.RED + f" {e}")
+            return
+        print(Fore.GREEN + f" Teacher {t['name']} removed.")
 
     def assign_subject(self):
         header("Assign Subject to Teacher")
-        tid = input("Teacher ID: ").strip()
-        t = self.get_teacher(tid)
-        if not t:
-            print(Fore.RED + " Teacher not found.")
+        try:
+            t = self.require_teacher(input("Teacher ID: "))
+        except SchoolError as e:
+            print(Fore.RED + f" {e}")
             return
         print("Available subjects:", ", ".join(self.DEFAULT_SUBJECTS))
         subj = input("Enter subject to assign: ").strip()
-        if subj not in self.DEFAULT_SUBJECTS:
-            print(Fore.RED + " Invalid subject.")
-            return
-        if subj in t["subjects"]:
-            print(Fore.YELLOW + " Subject already assigned.")
+        try:
+            self.assign_subject_to_teacher(t["id"], subj)
+        except SchoolError as e:
+            print(Fore.RED + f" {e}")
             return
-        t["subjects"].append(subj)
         print(Fore.GREEN + f" Assigned {subj} to {t['name']}.")
 
     def view_subjects_and_teachers(self):
         header("Subjects and Teachers")
-        for subject in self.DEFAULT_SUBJECTS:
-            assigned = [f"{t['name']} ({t['id']})" for t in self.teachers if subject in t["subjects"]]
+        for subject, teachers in self.subject_teachers().items():
+            assigned = [f"{t['name']} ({t['id']})" for t in teachers]
             if assigned:
                 print(f"{subject}: {', '.join(assigned)}")
             else:
@@ -334,8 +783,94 @@ class TeacherManager:
 
 class TimetableManger:
     DEFAULT_SUBJECTS = StudentManager.DEFAULT_SUBJECTS
+    WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
     def __init__(self):
         self.time_tables = {}  # class_name -> {day: [periods]}
+        self.lock = RWLock()
+
+    def _clean_subject(self, subj):
+        subj = str(subj).strip()
+        if not subj:
+            raise ValidationError("Subject cannot be empty.")
+        if subj.lower() not in (s.lower() for s in self.DEFAULT_SUBJECTS):
+            raise ValidationError("Invalid subject!")
+        return subj
+
+    def _require_timetable(self, class_name):
+        grade = normalize_class_name(str(class_name).strip())
+        if grade not in self.time_tables:
+            raise NotFoundError(f"No timetable found for {grade}.")
+        return grade
+
+    def _require_day(self, grade, day):
+        day = str(day).strip().capitalize()
+        if day not in self.time_tables[grade]:
+            raise ValidationError("Invalid day.")
+        return day
+
+    # ---- service methods ----
+
+    @write_locked
+    def set_timetable(self, class_name, days):
+        # days: {weekday: [7 subjects]} for every weekday
+        grade = normalize_class_name(str(class_name).strip())
+        if not grade:
+            raise ValidationError("Invalid class")
+        table = {}
+        for day in self.WEEKDAYS:
+            periods = days.get(day) or []
+            if len(periods) != 7:
+                raise ValidationError(f"{day} needs 7 periods.")
+            table[day] = [self._clean_subject(subj) for subj in periods]
+        self.time_tables[grade] = table
+        return table
+
+    @read_locked
+    def get_timetable(self, class_name):
+        return {day: list(periods) for day, periods in self.time_tables[self._require_timetable(class_name)].items()}
+
+    @write_locked
+    def set_period(self, class_name, day, period, subject):
+        grade = self._require_timetable(class_name)
+        days = self.time_tables[grade]
+        day = self._require_day(grade, day)
+        if not (str(period).strip().isdigit() and 1 <= int(period) <= 7):
+            raise ValidationError("Invalid period number.")
+        days[day][int(period) - 1] = self._clean_subject(subject)
+        return days
+
+    @write_locked
+    def delete_timetable(self, class_name):
+        grade = self._require_timetable(class_name)
+        del self.time_tables[grade]
+        return grade
+
+    @write_locked
+    def remove_day(self, class_name, day):
+        # the day's row goes; the other days keep their periods
+        grade = self._require_timetable(class_name)
+        day = self._require_day(grade, day)
+        del self.time_tables[grade][day]
+        return day
+
+    @write_locked
+    def clear_day(self, class_name, day):
+        # the row stays with every period set to "-"
+        grade = self._require_timetable(class_name)
+        day = self._require_day(grade, day)
+        self.time_tables[grade][day] = ["-"] * 7
+        return day
+
+    @write_locked
+    def clear_timetable(self, class_name):
+        grade = self._require_timetable(class_name)
+        for day in self.time_tables[grade]:
+            self.time_tables[grade][day] = ["-"] * 7
+        return grade
+
+    # ---- menu actions ----
+
     def add_timetable(self):
         header("Add Timetable")
         class_name = input("Enter class Name (1-12): ")
@@ -347,24 +882,24 @@ class TimetableManger:
         if not days:
             print(Fore.RED + " Timetable creation cancelled or failed.")
             return
-        self.time_tables[class_name] = days
+        try:
+            self.set_timetable(class_name, days)
+        except SchoolError as e:
+            print(Fore.RED + f" {e}")
+            return
         print(Fore.GREEN + f" Timetable for {class_name} added.")
 
     def input_weekly_timetable(self):
         days = {}
-        weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-        for day in weekdays:
+        for day in self.WEEKDAYS:
             print(Fore.CYAN + f"\nEnter subjects for {day}:")
             periods = []
             for i in range(1, 8):
-                subj = input(f"  Period {i}: ").strip()
-                if not subj:
-                    print(Fore.RED + "  Subject cannot be empty. Try again.")
+                try:
+                    periods.append(self._clean_subject(input(f"  Period {i}: ")))
+                except ValidationError as e:
+                    print(Fore.RED + f"  {e}")
                     return None
-                if subj.lower() not in (s.lower() for s in self.DEFAULT_SUBJECTS):
-                    print("Invalid subject!")
-                    return 
-                periods.append(subj)
             days[day] = periods
         return days
     
@@ -397,11 +932,12 @@ class TimetableManger:
             return
         if class_name is None:
             class_name = input("Enter class to view timetable (1-12 or 'Class N'): ").strip()
-            class_name = normalize_class_name(class_name)
-        if class_name not in self.time_tables:
-            print(Fore.RED + f"No timetable found for {class_name}.")
+        class_name = normalize_class_name(str(class_name))
+        try:
+            days = self.get_timetable(class_name)
+        except SchoolError as e:
+            print(Fore.RED + str(e))
             return
-        days = self.time_tables[class_name]
         main_table = PrettyTable()
         main_table.field_names = ["Day"] + [f"Period {i}" for i in range(1, 8)]
         for day in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]:
@@ -415,12 +951,12 @@ class TimetableManger:
         if not self.time_tables:
             print(Fore.YELLOW + "No timetables available.")
             return
-        class_name = input("Enter class name to edit timetable: ").strip()
-        class_name = normalize_class_name(class_name)
-        if class_name not in self.time_tables:
-            print(Fore.RED + f"No timetable found for {class_name}.")
+        class_name = normalize_class_name(input("Enter class name to edit timetable: ").strip())
+        try:
+            days = self.get_timetable(class_name)
+        except SchoolError as e:
+            print(Fore.RED + str(e))
             return
-        days = self.time_tables[class_name]
         day = input("Enter the day to edit (Monday-Friday): ").strip().capitalize()
         if day not in days:
             print(Fore.RED + "Invalid day.")
@@ -434,13 +970,11 @@ class TimetableManger:
             return
         print(f"Current subject for {day} Period {period_num}: {days[day][period_num-1]}")
         new_subject = input("Enter new subject: ").strip()
-        if not new_subject:
-            print(Fore.RED + "Subject cannot be empty.")
-            return
-        if new_subject.lower() not in (s.lower() for s in self.DEFAULT_SUBJECTS):
-            print(Fore.RED + "Invalid subject!")
+        try:
+            self.set_period(class_name, day, period_num, new_subject)
+        except SchoolError as e:
+            print(Fore.RED + str(e))
             return
-        days[day][period_num-1] = new_subject
         print(Fore.GREEN + f"Updated {day} Period {period_num} to {new_subject} for {class_name}.")
 
     def remove_timetable(self):
@@ -448,72 +982,589 @@ class TimetableManger:
         if not self.time_tables:
             print(Fore.YELLOW + "No timetables available.")
             return
-        class_name = input("Enter class name to remove timetable from: ").strip()
-        class_name = normalize_class_name(class_name)
-        if class_name not in self.time_tables:
-            print(Fore.RED + f"No timetable found for {class_name}.")
+        class_name = normalize_class_name(input("Enter class name to remove timetable from: ").strip())
+        try:
+            days = self.get_timetable(class_name)
+        except SchoolError as e:
+            print(Fore.RED + str(e))
             return
         print("1. Remove entire timetable for this class")
         print("2. Remove a specific day's row from this timetable")
         print("3. Empty a day's row (set all periods to '-')")
         print("4. Clear all rows (reset all days, keep columns)")
         choice = input("Enter your choice (1/2/3/4): ").strip()
-        if choice == "1":
-            confirm = input(f"Are you sure you want to delete the entire timetable for {class_name}? (y/N): ").strip().lower()
-            if confirm == "y":
-                del self.time_tables[class_name]
-                print(Fore.GREEN + f"Timetable for {class_name} deleted.")
-            else:
-                print("Cancelled.")
-        elif choice == "2":
-            day = input("Enter the day to remove (Monday-Friday): ").strip().capitalize()
-            if day not in self.time_tables[class_name]:
-                print(Fore.RED + "Invalid day.")
-                return
-            confirm = input(f"Are you sure you want to delete {day} from {class_name}'s timetable? (y/N): ").strip().lower()
-            if confirm == "y":
-                del self.time_tables[class_name][day]
-                print(Fore.GREEN + f"{day} removed from {class_name}'s timetable.")
+        try:
+            if choice == "1":
+                confirm = input(f"Are you sure you want to delete the entire timetable for {class_name}? (y/N): ").strip().lower()
+                if confirm == "y":
+                    self.delete_timetable(class_name)
+                    print(Fore.GREEN + f"Timetable for {class_name} deleted.")
+                else:
+                    print("Cancelled.")
+            elif choice == "2":
+                day = input("Enter the day to remove (Monday-Friday): ").strip().capitalize()
+                if day not in days:
+                    print(Fore.RED + "Invalid day.")
+                    return
+                confirm = input(f"Are you sure you want to delete {day} from {class_name}'s timetable? (y/N): ").strip().lower()
+                if confirm == "y":
+                    self.remove_day(class_name, day)
+                    print(Fore.GREEN + f"{day} removed from {class_name}'s timetable.")
+                else:
+                    print("Cancelled.")
+            elif choice == "3":
+                day = input("Enter the day to empty (Monday-Friday): ").strip().capitalize()
+                if day not in days:
+                    print(Fore.RED + "Invalid day.")
+                    return
+                confirm = input(f"Are you sure you want to empty all periods for {day} in {class_name}? (y/N): ").strip().lower()
+                if confirm == "y":
+                    self.clear_day(class_name, day)
+                    print(Fore.GREEN + f"All periods for {day} in {class_name} have been emptied.")
+                else:
+                    print("Cancelled.")
+            elif choice == "4":
+                confirm = input(f"Are you sure you want to clear all rows for {class_name}? (y/N): ").strip().lower()
+                if confirm == "y":
+                    self.clear_timetable(class_name)
+                    print(Fore.GREEN + f"All rows for {class_name} have been cleared. Columns remain.")
+                else:
+                    print("Cancelled.")
             else:
-                print("Cancelled.")
-        elif choice == "3":
-            day = input("Enter the day to empty (Monday-Friday): ").strip().capitalize()
-            if day not in self.time_tables[class_name]:
-                print(Fore.RED + "Invalid day.")
+                print(Fore.RED + "Invalid option.")
+        except SchoolError as e:
+            # changed at another terminal since the menu was shown
+            print(Fore.RED + str(e))
+
+# -------------------- Grading Schemes --------------------
+
+# cutoffs are ascending lower bounds; grades has one more entry than cutoffs.
+# "absolute" schemes compare the student's average, "relative" schemes compare
+# the student's percentile rank within the exam.
+GRADING_SCHEMES = {
+    "standard": {"type": "absolute", "cutoffs": [50, 60, 70, 80, 90],
+                 "grades": ["F", "D", "C", "B", "A", "A+"]},
+    "cbse": {"type": "absolute", "cutoffs": [21, 33, 41, 51, 61, 71, 81, 91],
+             "grades": ["E2", "E1", "D", "C2", "C1", "B2", "B1", "A2", "A1"]},
+    "state": {"type": "absolute", "cutoffs": [35, 50, 60, 75],
+              "grades": ["Fail", "Pass", "Second Class", "First Class", "Distinction"]},
+    "curve": {"type": "relative", "cutoffs": [10, 30, 70, 90],
+              "grades": ["E", "D", "C", "B", "A"]},
+}
+
+def apply_grading_scheme(scheme, averages):
+    # averages: reg_no -> average; grades the whole exam in one pass
+    cutoffs, grades = scheme["cutoffs"], scheme["grades"]
+    if scheme["type"] == "relative":
+        ranked = sorted(averages.values())
+        n = len(ranked)
+        # percentile rank: students below plus half of those tied
+        return {reg_no: grades[bisect_right(cutoffs, 50 * (bisect_left(ranked, avg) + bisect_right(ranked, avg)) / n)]
+                for reg_no, avg in averages.items()}
+    return {reg_no: grades[bisect_right(cutoffs, avg)] for reg_no, avg in averages.items()}
+
+# -------------------- Marks Moderation --------------------
+
+def moderation_function(spec, stats):
+    # builds the per-mark mapping for one subject column from its raw statistics
+    mean, sd = stats["mean"], stats["stdev"]
+    if spec["method"] == "zscore":
+        if not sd:
+            return lambda m: round(min(max(spec["mean"], 0), 100))
+        return lambda m: round(min(max(spec["mean"] + (m - mean) / sd * spec["sd"], 0), 100))
+    if spec["method"] == "linear":
+        if not mean:
+            return lambda m: m
+        factor = spec["mean"] / mean
+        return lambda m: round(min(max(m * factor, 0), 100))
+    if spec["method"] == "cap":
+        return lambda m: min(m, round(spec["cap"]))
+    raise ValueError(f"unknown moderation method: {spec['method']}")
+
+def describe_moderation(spec):
+    if spec["method"] == "zscore":
+        return f"z-score to mean {spec['mean']:g}, sd {spec['sd']:g}"
+    if spec["method"] == "linear":
+        return f"linear rescale to mean {spec['mean']:g}"
+    return f"capped at {spec['cap']:g}"
+
+# -------------------- Report Card Cache --------------------
+
+class ReportCardCache:
+    # LRU cache of computed report card entries keyed by (reg_no, exam id)
+    def __init__(self, max_entries=50000, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # (reg_no, exam id) -> (card, approx size)
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self._by_student = {}  # reg_no -> set of keys
+        self._by_exam = {}  # exam id -> set of keys
+        # every lookup reorders the LRU, so even readers need the mutex
+        self.mutex = threading.Lock()
+
+    def get(self, reg_no, eid):
+        with self.mutex:
+            entry = self.entries.get((reg_no, eid))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end((reg_no, eid))
+            return entry[0]
+
+    def put(self, reg_no, eid, card):
+        with self.mutex:
+            key = (reg_no, eid)
+            self._discard(key)
+            # rough footprint: fixed dict overhead plus one tuple per subject
+            size = 400 + 120 * len(card["marks"])
+            self.entries[key] = (card, size)
+            self.bytes += size
+            self._by_student.setdefault(reg_no, set()).add(key)
+            self._by_exam.setdefault(eid, set()).add(key)
+            while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+                self._discard(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= entry[1]
+        for index, part in ((self._by_student, key[0]), (self._by_exam, key[1])):
+            keys = index[part]
+            keys.discard(key)
+            if not keys:
+                del index[part]
+
+    def invalidate(self, reg_no, eid):
+        with self.mutex:
+            self._discard((reg_no, eid))
+
+    def invalidate_student(self, reg_no):
+        with self.mutex:
+            for key in list(self._by_student.get(reg_no, ())):
+                self._discard(key)
+
+    def invalidate_exam(self, eid):
+        with self.mutex:
+            for key in list(self._by_exam.get(eid, ())):
+                self._discard(key)
+
+    def copy(self):
+        # an independent cache holding the same cards, for a snapshot
+        with self.mutex:
+            other = ReportCardCache(self.max_entries, self.max_bytes)
+            other.entries = OrderedDict(self.entries)
+            other.bytes = self.bytes
+            other._by_student = {reg_no: set(keys) for reg_no, keys in self._by_student.items()}
+            other._by_exam = {eid: set(keys) for eid, keys in self._by_exam.items()}
+        return other
+
+    def clear(self):
+        with self.mutex:
+            self.entries.clear()
+            self._by_student.clear()
+            self._by_exam.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.mutex:
+            lookups = self.hits + self.misses
+            return {"entries": len(self.entries), "approx_bytes": self.bytes, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": 100 * self.hits / lookups if lookups else 0.0}
+
+# -------------------- Report Card Export --------------------
+
+def format_mark(m, raw):
+    if m is None:
+        return "-"
+    return f"{m} (raw {raw})" if m != raw else f"{m}"
+
+def report_card_lines(student, cards):
+    lines = [f"Report Card for {student['name']} ({student['reg_no']}) - {student['grade']}"]
+    for card in cards:
+        exam = card["exam"]
+        lines.append("")
+        lines.append(f"Exam: {exam['name']} ({exam['id']}) date: {exam['date']}")
+        for subj, m, raw in card["marks"]:
+            lines.append(f"  {subj}: {format_mark(m, raw)}")
+        if card["average"] is not None:
+            lines.append(f"  Total: {card['total']}  Average: {card['average']:.2f}  Grade: {card['grade']}")
+    if not cards:
+        lines.append("No marks recorded for this student yet.")
+    return lines
+
+def render_report_card_html(student, cards):
+    esc = html.escape
+    parts = ["<!DOCTYPE html>", "<html><head><meta charset=\"utf-8\">",
+             f"<title>Report Card - {esc(student['reg_no'])}</title></head><body>",
+             f"<h1>{esc(student['name'])} ({esc(student['reg_no'])}) - {esc(student['grade'])}</h1>"]
+    for card in cards:
+        exam = card["exam"]
+        parts.append(f"<h2>{esc(exam['name'])} ({esc(exam['id'])}) - {esc(exam['date'])}</h2>")
+        parts.append("<table border=\"1\"><tr><th>Subject</th><th>Marks</th></tr>")
+        for subj, m, raw in card["marks"]:
+            parts.append(f"<tr><td>{esc(subj)}</td><td>{format_mark(m, raw)}</td></tr>")
+        parts.append("</table>")
+        if card["average"] is not None:
+            parts.append(f"<p>Total: {card['total']} &nbsp; Average: {card['average']:.2f} &nbsp; "
+                         f"Grade: {esc(card['grade'])}</p>")
+    if not cards:
+        parts.append("<p>No marks recorded for this student yet.</p>")
+    parts.append("</body></html>")
+    return "\n".join(parts).encode("utf-8")
+
+def render_report_card_pdf(student, cards, lines_per_page=48):
+    # minimal single-font PDF writer: one text stream per page, Helvetica 11pt
+    lines = report_card_lines(student, cards)
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+    font_id = 3 + 2 * len(pages)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               ("<< /Type /Pages /Kids [" + " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+                + f"] /Count {len(pages)} >>").encode()]
+    for i, page in enumerate(pages):
+        text = ["BT /F1 11 Tf 14 TL 50 790 Td"]
+        for line in page:
+            line = line.encode("latin-1", "replace").decode("latin-1")
+            text.append("(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") Tj T*")
+        text.append("ET")
+        stream = "\n".join(text).encode("latin-1")
+        objects.append((f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {4 + 2 * i} 0 R "
+                        f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>").encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for n, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % n + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+REPORT_CARD_RENDERERS = {"html": render_report_card_html, "pdf": render_report_card_pdf}
+
+def _same_file_content(path, data):
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+def _write_report_card_shard(shard):
+    # runs in a worker process; a file already holding exactly this card is
+    # skipped, so an interrupted export can simply be started again while
+    # cards changed since (marks, moderation, grading) are still rewritten.
+    # fresh rewrites every file.
+    out_dir, formats, items, fresh = shard
+    written = skipped = 0
+    for student, cards in items:
+        for fmt in formats:
+            path = os.path.join(out_dir, f"{student['reg_no']}.{fmt}")
+            data = REPORT_CARD_RENDERERS[fmt](student, cards)
+            if not fresh and _same_file_content(path, data):
+                skipped += 1
+                continue
+            tmp = path + ".part"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            written += 1
+    return written, skipped
+
+# -------------------- Exam Analytics --------------------
+
+class ExamAnalytics:
+    PASS_MARK = 50
+    PERCENTILES = (10, 25, 50, 75, 90)
+
+    def __init__(self):
+        # (exam id, subject) -> sorted list of marks, kept in step with every mark entered
+        self.scores = {}
+        # (exam id, subject) -> [sum, sum of squares]
+        self.sums = {}
+        # (exam id, subject) -> computed stats; dropped when a mark in that column changes
+        self._cache = {}
+
+    def record(self, eid, subj, old, new):
+        key = (eid, subj)
+        col = self.scores.setdefault(key, [])
+        sums = self.sums.setdefault(key, [0, 0])
+        if old is not None:
+            del col[bisect_left(col, old)]
+            sums[0] -= old
+            sums[1] -= old * old
+        if new is not None:
+            insort(col, new)
+            sums[0] += new
+            sums[1] += new * new
+        self._cache.pop(key, None)
+
+    def drop_exam(self, eid, subjects):
+        for subj in subjects:
+            self.scores.pop((eid, subj), None)
+            self.sums.pop((eid, subj), None)
+            self._cache.pop((eid, subj), None)
+        self._cache.pop((eid, None), None)
+
+    def subject_stats(self, eid, subj):
+        key = (eid, subj)
+        stats = self._cache.get(key)
+        if stats is None:
+            stats = self._compute(self.scores.get(key, []), self.sums.get(key, (0, 0)))
+            self._cache[key] = stats
+        return stats
+
+    def _compute(self, col, sums):
+        n = len(col)
+        if not n:
+            return None
+        mean = sums[0] / n
+        # 10-mark bands, the last one including 100
+        edges = list(range(0, 100, 10))
+        counts = [bisect_left(col, hi) - bisect_left(col, lo) for lo, hi in zip(edges, edges[1:] + [101])]
+        return {
+            "count": n,
+            "mean": mean,
+            "median": self._percentile(col, 50),
+            "stdev": sqrt(max(sums[1] / n - mean * mean, 0)),
+            "min": col[0],
+            "max": col[-1],
+            "percentiles": {p: self._percentile(col, p) for p in self.PERCENTILES},
+            "histogram": [(f"{lo}-{lo + 9 if lo < 90 else 100}", c) for lo, c in zip(edges, counts)],
+            "pass_rate": 100 * (n - bisect_left(col, self.PASS_MARK)) / n,
+        }
+
+    def _percentile(self, col, p):
+        # linear interpolation between closest ranks
+        pos = (len(col) - 1) * p / 100
+        lo = int(pos)
+        hi = min(lo + 1, len(col) - 1)
+        return col[lo] + (col[hi] - col[lo]) * (pos - lo)
+
+    def exam_pass_counts(self, exam, records):
+        # (students passing every subject they were marked in, students marked)
+        marked = [d for d in records.values() if any(subj in d for subj in exam["subjects"])]
+        passed = sum(1 for d in marked
+                     if all(d[subj] >= self.PASS_MARK for subj in exam["subjects"] if subj in d))
+        return passed, len(marked)
+
+    def exam_pass_rate(self, exam, records):
+        # share of students passing every subject they were marked in
+        key = (exam["id"], None)
+        rate = self._cache.get(key)
+        if rate is None:
+            passed, marked = self.exam_pass_counts(exam, records)
+            rate = 100 * passed / marked if marked else None
+            self._cache[key] = rate
+        return rate
+
+    def invalidate_exam(self, eid):
+        self._cache.pop((eid, None), None)
+
+    def snapshot(self):
+        # columns are updated in place, so they are copied; cached stats never are
+        snap = ExamAnalytics()
+        snap.scores = {key: list(col) for key, col in self.scores.items()}
+        snap.sums = {key: list(sums) for key, sums in self.sums.items()}
+        snap._cache = dict(self._cache)
+        return snap
+
+# -------------------- Progress Trends --------------------
+
+def exam_average(exam, subdict):
+    vals = [subdict[subj] for subj in exam["subjects"] if subj in subdict]
+    return sum(vals) / len(vals) if vals else None
+
+class ProgressTracker:
+    def __init__(self):
+        # reg_no -> [(exam date, exam id, average)] kept in date order
+        self.series = {}
+        # reg_no -> change in average between the student's last two exams
+        self.latest_delta = {}
+        # exam id -> [sum of student averages, students]
+        self.exam_totals = {}
+        # a student's history can span classes, so this isn't covered by the class locks
+        self.mutex = threading.RLock()
+
+    def record(self, exam, reg_no, old_avg, new_avg):
+        with self.mutex:
+            if old_avg == new_avg:
                 return
-            confirm = input(f"Are you sure you want to empty all periods for {day} in {class_name}? (y/N): ").strip().lower()
-            if confirm == "y":
-                self.time_tables[class_name][day] = ["-"]*7
-                print(Fore.GREEN + f"All periods for {day} in {class_name} have been emptied.")
-            else:
-                print("Cancelled.")
-        elif choice == "4":
-            confirm = input(f"Are you sure you want to clear all rows for {class_name}? (y/N): ").strip().lower()
-            if confirm == "y":
-                for day in self.time_tables[class_name]:
-                    self.time_tables[class_name][day] = ["-"]*7
-                print(Fore.GREEN + f"All rows for {class_name} have been cleared. Columns remain.")
-            else:
-                print("Cancelled.")
+            points = self.series.setdefault(reg_no, [])
+            totals = self.exam_totals.setdefault(exam["id"], [0, 0])
+            if old_avg is not None:
+                points.remove((exam["date"], exam["id"], old_avg))
+                totals[0] -= old_avg
+                totals[1] -= 1
+            if new_avg is not None:
+                insort(points, (exam["date"], exam["id"], new_avg))
+                totals[0] += new_avg
+                totals[1] += 1
+            self._refresh_delta(reg_no)
+
+    def _refresh_delta(self, reg_no):
+        points = self.series.get(reg_no)
+        if points and len(points) >= 2:
+            self.latest_delta[reg_no] = points[-1][2] - points[-2][2]
         else:
-            print(Fore.RED + "Invalid option.")
+            self.latest_delta.pop(reg_no, None)
+            if not points:
+                self.series.pop(reg_no, None)
+
+    def drop_exam(self, exam, records):
+        with self.mutex:
+            self.exam_totals.pop(exam["id"], None)
+            for reg_no, subdict in records.items():
+                avg = exam_average(exam, subdict)
+                if avg is not None:
+                    self.series[reg_no].remove((exam["date"], exam["id"], avg))
+                    self._refresh_delta(reg_no)
+
+    def latest(self, reg_no):
+        # (average in the student's most recent exam, exams with marks); (None, 0) before any
+        with self.mutex:
+            points = self.series.get(reg_no)
+            return (points[-1][2], len(points)) if points else (None, 0)
+
+    def class_average(self, eid):
+        total, n = self.exam_totals.get(eid, (0, 0))
+        return total / n if n else None
+
+    def slope(self, reg_no):
+        # least-squares trend in average marks per exam taken
+        with self.mutex:
+            ys = [avg for _, _, avg in self.series.get(reg_no, [])]
+            n = len(ys)
+            if n < 2:
+                return None
+            mean_x, mean_y = (n - 1) / 2, sum(ys) / n
+            return sum((x - mean_x) * (y - mean_y) for x, y in enumerate(ys)) / sum((x - mean_x) ** 2 for x in range(n))
+
+    def movers(self, count, declining, reg_nos=None):
+        with self.mutex:
+            deltas = self.latest_delta.items()
+            if reg_nos is not None:
+                deltas = ((r, self.latest_delta[r]) for r in reg_nos if r in self.latest_delta)
+            if declining:
+                return heapq.nsmallest(count, ((r, d) for r, d in deltas if d < 0), key=lambda x: x[1])
+            return heapq.nlargest(count, ((r, d) for r, d in deltas if d > 0), key=lambda x: x[1])
+
+    def snapshot(self):
+        with self.mutex:
+            snap = ProgressTracker()
+            snap.series = {reg_no: list(points) for reg_no, points in self.series.items()}
+            snap.latest_delta = dict(self.latest_delta)
+            snap.exam_totals = {eid: list(totals) for eid, totals in self.exam_totals.items()}
+        return snap
 
 # -------------------- Exam Manager --------------------
 
 class ExamManager:
+    frozen = False  # True on a snapshot
+    RECENT_EXAMS = 15  # exams listed when picking one; List Exams reaches the rest
+
     def __init__(self, student_manager, teacher_manager):
         self.student_manager = student_manager
         self.teacher_manager = teacher_manager
         self.exams = []  # list of dict: id, name, grade, subjects, date
+        self._exams_by_id = {}  # exam id -> exam dict
+        self._exams_by_grade = {}  # class -> [(date, exam id)] in date order
+        self._exam_dates = []  # [(date, exam id)] for every exam, in date order
         # marks: nested dict exam_id -> reg_no -> {subject: marks}
         self.marks = {}
+        # reg_no -> list of exam ids the student has marks in
+        self.student_exams = {}
+        # class -> (exam, student) mark records in that class's exams, kept per class so
+        # each count changes under its own class lock
+        self._marks_in_class = {}
+        self.grading_scheme = "standard"
+        # exam id -> {reg_no: grade letter}; dropped whenever the exam's marks change
+        self._grade_cache = {}
+        self.analytics = ExamAnalytics()
+        self.progress = ProgressTracker()
+        # exam id -> {subject: moderation spec}; raw marks stay in self.marks
+        self.moderation = {}
+        # exam id -> moderated copy of self.marks[exam id], rebuilt when marks or moderation change
+        self._moderated = {}
+        self.report_cache = ReportCardCache()
         self._counter = 1
+        # exam list, indexes, grading and moderation settings; marks are under class_locks[exam grade]
+        self.lock = RWLock()
+        self.class_locks = PartitionLocks()
+        student_manager.events.subscribe("student_changed", self._on_student_changed)
+        student_manager.events.subscribe("student_removed", self._on_student_removed)
+
+    def snapshot(self):
+        if self.frozen:
+            return self
+        with self.student_manager.events.paused():
+            # settled first, as handling its events takes our write lock; nothing further
+            # is delivered until the copy is done
+            students = self.student_manager.settled_snapshot()
+            # the read lock keeps out exam changes, the class read locks keep out marks;
+            # reports and report cards carry on meanwhile
+            with self.lock.read(), self.class_locks.read_many(self._exams_by_grade):
+                snap = frozen_copy(self)
+                snap.student_manager = students
+                snap.exams = list(self.exams)
+                snap._exams_by_id = dict(self._exams_by_id)
+                snap._exams_by_grade = {grade: list(dates) for grade, dates in self._exams_by_grade.items()}
+                snap._exam_dates = list(self._exam_dates)
+                snap.marks = {eid: dict(records) for eid, records in self.marks.items()}
+                snap.student_exams = {reg_no: list(eids) for reg_no, eids in self.student_exams.items()}
+                snap._marks_in_class = dict(self._marks_in_class)
+                snap.moderation = {eid: dict(specs) for eid, specs in self.moderation.items()}
+                snap._grade_cache = dict(self._grade_cache)
+                snap._moderated = dict(self._moderated)
+                snap.analytics = self.analytics.snapshot()
+                snap.progress = self.progress.snapshot()
+                snap.report_cache = self.report_cache.copy()
+        return snap
 
     def _generate_eid(self):
         eid = f"E{self._counter:03d}"
         self._counter += 1
         return eid
 
+    def require_exam(self, eid):
+        exam = self.get_exam(str(eid))
+        if not exam:
+            raise NotFoundError("Exam not found.")
+        return exam
+
+    @write_locked
+    def create_exam(self, name, grade, subjects="all", date=None):
+        # subjects: list of subject names, or "all" for the default subjects
+        name = str(name).strip()
+        if not name:
+            raise ValidationError("Exam name required.")
+        grade = normalize_class_name(str(grade).strip())
+        if not grade:
+            raise ValidationError("Invalid class.")
+        if isinstance(subjects, str):
+            subjects = (list(self.student_manager.DEFAULT_SUBJECTS) if subjects.strip().lower() == "all"
+                        else [subj.strip() for subj in subjects.split(",") if subj.strip()])
+        for subj in subjects:
+            if subj not in self.student_manager.DEFAULT_SUBJECTS:
+                raise ValidationError(f"Invalid subject: {subj}")
+        date = str(date or "").strip() or datetime.now().strftime("%Y-%m-%d")
+        if not is_valid_date(date):
+            raise ValidationError("Invalid date (use YYYY-MM-DD).")
+        eid = self._generate_eid()
+        exam = {"id": eid, "name": name, "grade": grade, "subjects": list(subjects), "date": date}
+        self.exams.append(exam)
+        self._index_exam(exam)
+        self.marks[eid] = {}  # initialize
+        return exam
+
     def add_exam(self):
         header("Add Exam")
         name = input("Exam name (e.g., Midterm, Final): ").strip()
@@ -521,68 +1572,307 @@ class ExamManager:
             print(Fore.RED + " Exam name required.")
             return
         grade_raw = input("Class for exam (1-12): ").strip()
-        grade = normalize_class_name(grade_raw)
-        if not grade:
+        if not normalize_class_name(grade_raw):
             print(Fore.RED + " Invalid class.")
             return
         # choose subjects (comma separated) or "all"
         print("Default subjects:", ", ".join(self.student_manager.DEFAULT_SUBJECTS))
         subj_input = input("Enter subjects (comma-separated) or 'all': ").strip()
-        if subj_input.lower() == "all":
-            subjects = list(self.student_manager.DEFAULT_SUBJECTS)
-        else:
-            subjects = [s.strip() for s in subj_input.split(",") if s.strip()]
-            # validate subjects
-            for s in subjects:
-                if s not in self.student_manager.DEFAULT_SUBJECTS:
-                    print(Fore.RED + f" Invalid subject: {s}")
-                    return
-        date = input("Exam date (optional YYYY-MM-DD): ").strip() or datetime.now().strftime("%Y-%m-%d")
-        eid = self._generate_eid()
-        exam = {"id": eid, "name": name, "grade": grade, "subjects": subjects, "date": date}
-        self.exams.append(exam)
-        self.marks[eid] = {}  # initialize
-        print(Fore.GREEN + f" Exam '{name}' ({eid}) for {grade} created with subjects: {', '.join(subjects)}")
+        date = input("Exam date (optional YYYY-MM-DD): ").strip()
+        try:
+            exam = self.create_exam(name, grade_raw, subj_input, date)
+        except ValidationError as e:
+            print(Fore.RED + f" {e}")
+            return
+        print(Fore.GREEN + f" Exam '{name}' ({exam['id']}) for {exam['grade']} created with subjects: "
+                           f"{', '.join(exam['subjects'])}")
+
+    def _index_exam(self, exam):
+        self._exams_by_id[exam["id"]] = exam
+        insort(self._exams_by_grade.setdefault(exam["grade"], []), (exam["date"], exam["id"]))
+        insort(self._exam_dates, (exam["date"], exam["id"]))
+
+    def _unindex_exam(self, exam):
+        del self._exams_by_id[exam["id"]]
+        key = (exam["date"], exam["id"])
+        by_grade = self._exams_by_grade[exam["grade"]]
+        del by_grade[bisect_left(by_grade, key)]
+        if not by_grade:
+            del self._exams_by_grade[exam["grade"]]
+        del self._exam_dates[bisect_left(self._exam_dates, key)]
+
+    def get_exam(self, eid):
+        return self._exams_by_id.get(eid.strip().upper())
+
+    @read_locked
+    def exams_between(self, grade=None, start=None, end=None):
+        # dates are YYYY-MM-DD strings, so the index sorts chronologically
+        index = self._exam_dates if grade is None else self._exams_by_grade.get(grade, [])
+        lo = bisect_left(index, (start, "")) if start else 0
+        hi = bisect_right(index, (end, "\uffff")) if end else len(index)
+        return [self._exams_by_id[eid] for _, eid in index[lo:hi]]
+
+    @read_locked
+    def recent_exams(self, limit):
+        # the latest exams by date, oldest first, and how many are older
+        return [self._exams_by_id[eid] for _, eid in self._exam_dates[-limit:]], max(len(self._exam_dates) - limit, 0)
 
-    def list_exams(self):
+    def list_exams(self, exams=None):
         header("Exams")
-        if not self.exams:
+        if exams is None:
+            exams = self.exams
+        if not exams:
             print(Fore.YELLOW + "No exams defined.")
             return
-        for e in self.exams:
+        for e in exams:
             print(f"{e['id']} | {e['name']} | {e['grade']} | {e['date']} | Subjects: {', '.join(e['subjects'])}")
 
+    def list_recent_exams(self):
+        # exam pickers show a window of the latest exams, not the whole history
+        exams, older = self.recent_exams(self.RECENT_EXAMS)
+        self.list_exams(exams)
+        if older:
+            print(Fore.YELLOW + f"({older} older exams not shown; List Exams finds them by class and date.)")
+
+    def find_exams(self):
+        header("Find Exams")
+        cls = input("Class (1-12, blank for all): ").strip()
+        grade = None
+        if cls:
+            grade = normalize_class_name(cls)
+            if not grade:
+                print(Fore.RED + " Invalid class.")
+                return
+        start = input("From date (YYYY-MM-DD, blank for any): ").strip()
+        end = input("To date (YYYY-MM-DD, blank for any): ").strip()
+        if (start and not is_valid_date(start)) or (end and not is_valid_date(end)):
+            print(Fore.RED + " Invalid date (use YYYY-MM-DD).")
+            return
+        self.list_exams(self.exams_between(grade, start or None, end or None))
+
+    def eligible_student(self, exam, reg_no):
+        student = self.student_manager.require_student(reg_no)
+        if student["grade"] != exam["grade"]:
+            raise ValidationError(f"Student {student['name']} is in {student['grade']}, not eligible for {exam['grade']}.")
+        return student
+
+    def clean_mark(self, subj, m):
+        m = str(m).strip()
+        if not (m.isdigit() and 0 <= int(m) <= 100):
+            raise ValidationError(f"Invalid marks for {subj}. Must be 0-100.")
+        return int(m)
+
+    def record_marks(self, eid, reg_no, marks):
+        # marks: {subject: 0-100} for some or all of the exam's subjects; returns the student's marks
+        exam = self.require_exam(eid)
+        student = self.eligible_student(exam, reg_no)
+        sub_marks = {}
+        for subj, m in marks.items():
+            if subj not in exam["subjects"]:
+                raise ValidationError(f"{subj} is not a subject of exam {exam['id']}.")
+            sub_marks[subj] = self.clean_mark(subj, m)
+        with self.lock.read(), self.class_locks[exam["grade"]].write():
+            if self._exams_by_id.get(exam["id"]) is not exam:
+                raise NotFoundError("Exam not found.")  # removed while we were validating
+            if not self.student_manager.get_student(student["reg_no"]):
+                raise NotFoundError("Student not found.")  # removed or renamed since then
+            self._store_marks(exam["id"], student["reg_no"], sub_marks)
+            return dict(self.marks[exam["id"]][student["reg_no"]])
+
     def enter_marks(self):
         header("Enter Marks for Student")
         if not self.exams:
             print(Fore.YELLOW + "No exams available.")
             return
-        self.list_exams()
+        self.list_recent_exams()
+        try:
+            exam = self.require_exam(input("Enter Exam ID: ").strip())
+            student = self.eligible_student(exam, input("Enter student register number: ").strip())
+            # prompt marks for each subject
+            sub_marks = {subj: self.clean_mark(subj, input(f"Marks for {subj} (0-100): ")) for subj in exam["subjects"]}
+            self.record_marks(exam["id"], student["reg_no"], sub_marks)
+        except SchoolError as e:
+            print(Fore.RED + f" {e}")
+            return
+        print(Fore.GREEN + f" Marks recorded for {student['name']} in exam {exam['id']}.")
+
+    def bulk_enter_marks(self):
+        header("Bulk Enter Marks from CSV")
+        if not self.exams:
+            print(Fore.YELLOW + "No exams available.")
+            return
+        self.list_recent_exams()
         eid = input("Enter Exam ID: ").strip()
-        exam = next((x for x in self.exams if x["id"].lower() == eid.lower()), None)
+        exam = self.get_exam(eid)
         if not exam:
             print(Fore.RED + " Exam not found.")
             return
-        reg_no = input("Enter student register number: ").strip()
-        student = self.student_manager.get_student(reg_no)
-        if not student:
-            print(Fore.RED + " Student not found.")
-            return
-        if student["grade"] != exam["grade"]:
-            print(Fore.RED + f" Student {student['name']} is in {student['grade']}, not eligible for {exam['grade']}.")
+        print(f"CSV columns: reg_no, {', '.join(exam['subjects'])}")
+        path = input("CSV file path: ").strip()
+        try:
+            loaded, errors = self.import_marks(exam["id"], path)
+        except (OSError, ValidationError) as e:
+            print(Fore.RED + f" Could not load marks: {e}")
             return
-        # prompt marks for each subject
-        sub_marks = {}
-        for subj in exam["subjects"]:
-            m = input(f"Marks for {subj} (0-100): ").strip()
-            if not (m.isdigit() and 0 <= int(m) <= 100):
-                print(Fore.RED + f" Invalid marks for {subj}. Must be 0-100.")
-                return
-            sub_marks[subj] = int(m)
-        # store
-        self.marks[exam["id"]].setdefault(student["reg_no"], {})
-        self.marks[exam["id"]][student["reg_no"]].update(sub_marks)
-        print(Fore.GREEN + f" Marks recorded for {student['name']} in exam {exam['id']}.")
+        print(Fore.GREEN + f" Marks recorded for {loaded} students in exam {exam['id']}.")
+        if errors:
+            print(Fore.YELLOW + f" {len(errors)} rows skipped:")
+            for line_no, reg_no, reason in errors:
+                print(f"  line {line_no} ({reg_no or '-'}): {reason}")
+
+    @read_locked
+    def import_marks(self, eid, path):
+        # (students loaded, [(line, reg_no, reason)] rows skipped)
+        return self.load_marks_csv(self.require_exam(eid), path)
+
+    def load_marks_csv(self, exam, path):
+        # eligible students for the exam's class, looked up once for the whole sheet
+        eligible = {s["reg_no"].lower(): s["reg_no"] for s in self.student_manager.students_in_class(exam["grade"])}
+        subjects = {subj.lower(): subj for subj in exam["subjects"]}
+        staged = {}
+        errors = []
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            head = next(reader, None)
+            if not head:
+                raise ValidationError("file is empty")
+            head = [h.strip().lower() for h in head]
+            if "reg_no" not in head:
+                raise ValidationError("missing 'reg_no' column")
+            unknown = [h for h in head if h != "reg_no" and h not in subjects]
+            if unknown:
+                raise ValidationError(f"columns not in this exam: {', '.join(unknown)}")
+            reg_col = head.index("reg_no")
+            subj_cols = [(i, subjects[h]) for i, h in enumerate(head) if h != "reg_no"]
+            for row in reader:
+                line_no = reader.line_num
+                if not any(cell.strip() for cell in row):
+                    continue
+                reg_raw = row[reg_col].strip() if reg_col < len(row) else ""
+                reg_no = eligible.get(reg_raw.lower())
+                if reg_no is None:
+                    reason = "student not found" if not self.student_manager.get_student(reg_raw) \
+                        else f"student not in {exam['grade']}"
+                    errors.append((line_no, reg_raw, reason))
+                    continue
+                if reg_no in staged:
+                    errors.append((line_no, reg_raw, "duplicate row for student"))
+                    continue
+                cells = [(subj, row[i].strip() if i < len(row) else "") for i, subj in subj_cols]
+                bad = [subj for subj, m in cells if m and not (m.isdigit() and 0 <= int(m) <= 100)]
+                if bad:
+                    errors.append((line_no, reg_raw, f"invalid marks for {', '.join(bad)} (must be 0-100)"))
+                    continue
+                sub_marks = {subj: int(m) for subj, m in cells if m}
+                if not sub_marks:
+                    errors.append((line_no, reg_raw, "no marks given"))
+                    continue
+                staged[reg_no] = sub_marks
+        # the sheet is fully read and checked before anything is written
+        with self.lock.read(), self.class_locks[exam["grade"]].write():
+            for reg_no, sub_marks in staged.items():
+                self._store_marks(exam["id"], reg_no, sub_marks)
+        return len(staged), errors
+
+    def _store_marks(self, eid, reg_no, sub_marks):
+        exam = self._exams_by_id[eid]
+        current = self.marks[eid].get(reg_no, {})
+        if reg_no not in self.marks[eid]:
+            self._marks_in_class[exam["grade"]] = self._marks_in_class.get(exam["grade"], 0) + 1
+        old_avg = exam_average(exam, current)
+        for subj, m in sub_marks.items():
+            if current.get(subj) != m:
+                self.analytics.record(eid, subj, current.get(subj), m)
+        # a new record swapped in, so snapshots keep the old one
+        updated = self.marks[eid][reg_no] = {**current, **sub_marks}
+        self.progress.record(exam, reg_no, old_avg, exam_average(exam, updated))
+        self._moderated.pop(eid, None)
+        self._grade_cache.pop(eid, None)
+        self.analytics.invalidate_exam(eid)
+        # curve grades and moderated marks depend on the whole exam, not just this student
+        if self.moderation.get(eid) or GRADING_SCHEMES[self.grading_scheme]["type"] == "relative":
+            self.report_cache.invalidate_exam(eid)
+        else:
+            self.report_cache.invalidate(reg_no, eid)
+        exam_ids = self.student_exams.setdefault(reg_no, [])
+        if eid not in exam_ids:
+            exam_ids.append(eid)
+
+    def _drop_marks(self, exam, reg_no):
+        # the reverse of _store_marks: one student's marks leave the exam and every total built on them
+        eid = exam["id"]
+        current = self.marks[eid].pop(reg_no, None)
+        if current is None:
+            return
+        self._marks_in_class[exam["grade"]] -= 1
+        for subj, m in current.items():
+            self.analytics.record(eid, subj, m, None)
+        self.progress.record(exam, reg_no, exam_average(exam, current), None)
+        self._moderated.pop(eid, None)
+        self._grade_cache.pop(eid, None)
+        self.analytics.invalidate_exam(eid)
+        self.report_cache.invalidate_exam(eid)
+
+    @write_locked
+    def _on_student_removed(self, student):
+        # only the exams the student has marks in are touched
+        reg_no = student["reg_no"]
+        for eid in self.student_exams.pop(reg_no, []):
+            self._drop_marks(self._exams_by_id[eid], reg_no)
+        self.report_cache.invalidate_student(reg_no)
+
+    @write_locked
+    def _on_student_changed(self, before, after):
+        old, new = before["reg_no"], after["reg_no"]
+        if old != new:
+            # moved exam by exam so every total follows; marks already entered under the
+            # new reg_no (before this event arrived) are newer and win
+            for eid in self.student_exams.pop(old, []):
+                moved = self.marks[eid][old]
+                self._drop_marks(self._exams_by_id[eid], old)
+                current = self.marks[eid].get(new, {})
+                self._store_marks(eid, new, {subj: m for subj, m in moved.items() if subj not in current})
+        self.report_cache.invalidate_student(old)
+
+    def remove_exam(self):
+        header("Remove Exam")
+        if not self.exams:
+            print(Fore.YELLOW + "No exams available.")
+            return
+        self.list_recent_exams()
+        eid = input("Enter Exam ID to remove: ").strip()
+        exam = self.get_exam(eid)
+        if not exam:
+            print(Fore.RED + " Exam not found.")
+            return
+        confirm = input(Fore.YELLOW + f"Confirm remove {exam['name']} ({exam['id']}) and its marks (y/N): ").strip().lower()
+        if confirm != "y":
+            print("Cancelled.")
+            return
+        self.delete_exam(exam["id"])
+        print(Fore.GREEN + f" Exam {exam['id']} removed.")
+
+    @write_locked
+    def delete_exam(self, eid):
+        exam = self.require_exam(eid)
+        self.exams.remove(exam)
+        self._unindex_exam(exam)
+        self._grade_cache.pop(exam["id"], None)
+        self.report_cache.invalidate_exam(exam["id"])
+        self.moderation.pop(exam["id"], None)
+        self._moderated.pop(exam["id"], None)
+        self.analytics.drop_exam(exam["id"], exam["subjects"])
+        records = self.marks.pop(exam["id"], {})
+        self._marks_in_class[exam["grade"]] = self._marks_in_class.get(exam["grade"], 0) - len(records)
+        self.progress.drop_exam(exam, records)
+        # only the students who sat this exam need their index pruned
+        for reg_no in records:
+            exam_ids = self.student_exams.get(reg_no)
+            if exam_ids and exam["id"] in exam_ids:
+                exam_ids.remove(exam["id"])
+                if not exam_ids:
+                    del self.student_exams[reg_no]
+        return exam
 
     def view_report_card(self):
         header("View Student Report Card")
@@ -592,103 +1882,1196 @@ class ExamManager:
             print(Fore.RED + " Student not found.")
             return
         print(Fore.CYAN + f"Report Card for {student['name']} ({student['reg_no']}) - {student['grade']}")
-        found = False
-        for exam in self.exams:
-            exam_marks_for_student = self.marks.get(exam["id"], {}).get(student["reg_no"], None)
-            if exam_marks_for_student:
-                found = True
-                print(Fore.YELLOW + f"\nExam: {exam['name']} ({exam['id']}) date: {exam['date']}")
-                total = 0
-                count = 0
-                for subj in exam["subjects"]:
-                    m = exam_marks_for_student.get(subj, None)
-                    if m is None:
-                        print(f"  {subj}: -")
-                    else:
-                        print(f"  {subj}: {m}")
-                        total += m
-                        count += 1
-                if count:
-                    avg = total / count
-                    grade_letter = self._grade_from_avg(avg)
-                    print(Fore.GREEN + f"  Total: {total}  Average: {avg:.2f}  Grade: {grade_letter}")
-        if not found:
+        cards = self.report_card(student["reg_no"])
+        for card in cards:
+            exam = card["exam"]
+            print(Fore.YELLOW + f"\nExam: {exam['name']} ({exam['id']}) date: {exam['date']}")
+            for subj, m, raw in card["marks"]:
+                print(f"  {subj}: {format_mark(m, raw)}")
+            if card["average"] is not None:
+                print(Fore.GREEN + f"  Total: {card['total']}  Average: {card['average']:.2f}  Grade: {card['grade']}")
+        if not cards:
             print(Fore.YELLOW + "No marks recorded for this student yet.")
 
+    @read_locked
+    def report_card(self, reg_no):
+        # one entry per exam the student sat, in the order the exams were created
+        cards = []
+        for eid in sorted(self.student_exams.get(reg_no, []), key=lambda e: int(e[1:])):
+            card = self.report_cache.get(reg_no, eid)
+            if card is not None:
+                cards.append(card)
+                continue
+            exam = self._exams_by_id[eid]
+            with self.class_locks[exam["grade"]].read():
+                exam_marks_for_student = self.marks.get(eid, {}).get(reg_no)
+                if not exam_marks_for_student:
+                    continue
+                effective = self.effective_marks(eid)[reg_no]
+                marks = [(subj, effective.get(subj), exam_marks_for_student.get(subj)) for subj in exam["subjects"]]
+                scored = [m for _, m, _ in marks if m is not None]
+                card = {"exam": exam, "marks": marks, "total": sum(scored), "average": None, "grade": None}
+                if scored:
+                    card["average"] = card["total"] / len(scored)
+                    card["grade"] = self.exam_grades(exam)[reg_no]
+                # cached while the class is still read-locked, so no newer marks can slip in first
+                self.report_cache.put(reg_no, eid, card)
+            cards.append(card)
+        return cards
+
+    def student_report(self, reg_no):
+        student = self.student_manager.require_student(reg_no)
+        return {"student": student, "cards": self.report_card(student["reg_no"])}
+
+    def export_report_cards(self):
+        header("Export Report Cards")
+        students = self.student_manager.students
+        if not students:
+            print(Fore.YELLOW + "No students found.")
+            return
+        out_dir = input("Output directory [report_cards]: ").strip() or "report_cards"
+        fmt = input("Format (html/pdf/both) [html]: ").strip().lower() or "html"
+        if fmt not in ("html", "pdf", "both"):
+            print(Fore.RED + " Invalid format.")
+            return
+        formats = ("html", "pdf") if fmt == "both" else (fmt,)
+        workers = input(f"Worker processes [{os.cpu_count() or 1}]: ").strip()
+        if workers and not workers.isdigit():
+            print(Fore.RED + " Worker count must be numeric.")
+            return
+        workers = int(workers) if workers else (os.cpu_count() or 1)
+        fresh = input("Rewrite every card, even unchanged ones? (y/N): ").strip().lower() == "y"
+        try:
+            written, skipped = self.write_report_cards(out_dir, formats, max(workers, 1), fresh=fresh,
+                                                       progress=self._print_progress)
+        except OSError as e:
+            print(Fore.RED + f"\n Export failed: {e}")
+            return
+        print(Fore.GREEN + f"\n Wrote {written} files to {out_dir} ({skipped} already up to date).")
+
+    def _print_progress(self, done, total):
+        print(f"\r  {done}/{total} students", end="", flush=True)
+
+    def write_report_cards(self, out_dir, formats, workers, shard_size=500, progress=None, fresh=False):
+        os.makedirs(out_dir, exist_ok=True)
+        # every card comes from one snapshot, so marks entered meanwhile can't leave the
+        # export half old and half new; workers get plain copies of what they render
+        snap = self.snapshot()
+        cards = [({k: s[k] for k in ("reg_no", "name", "grade")}, snap.report_card(s["reg_no"]))
+                 for s in snap.student_manager.students]
+        shards = [(out_dir, formats, cards[i:i + shard_size], fresh) for i in range(0, len(cards), shard_size)]
+        written = skipped = done = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_write_report_card_shard, shard): len(shard[2]) for shard in shards}
+            for fut in as_completed(futures):
+                w, sk = fut.result()
+                written += w
+                skipped += sk
+                done += futures[fut]
+                if progress:
+                    progress(done, len(cards))
+        return written, skipped
+
+    @read_locked
+    def class_summary(self, eid, top=5):
+        # subject averages, class average and toppers, on moderated marks where set
+        exam = self.require_exam(eid)
+        with self.class_locks[exam["grade"]].read():
+            return self._class_summary(exam, top)
+
+    def _class_summary(self, exam, top):
+        records = self.effective_marks(exam["id"])
+        subject_marks = {}
+        totals = {}
+        for reg_no, subdict in records.items():
+            totals[reg_no] = sum(v for v in subdict.values())
+            for subj in exam["subjects"]:
+                if subj in subdict:
+                    subject_marks.setdefault(subj, []).append(subdict[subj])
+        return {"exam": exam, "students": len(records),
+                "moderated": list(self.moderation.get(exam["id"], {})),
+                "subject_averages": {subj: sum(vals) / len(vals) for subj, vals in subject_marks.items()},
+                "class_average": sum(totals.values()) / (len(totals) * len(exam["subjects"])) if totals else None,
+                "toppers": sorted(totals.items(), key=lambda x: x[1], reverse=True)[:top]}
+
     def class_result_summary(self):
         header("Exam / Class Summary")
         if not self.exams:
             print(Fore.YELLOW + "No exams.")
             return
-        self.list_exams()
+        self.list_recent_exams()
         eid = input("Enter Exam ID for summary: ").strip()
-        exam = next((x for x in self.exams if x["id"].lower() == eid.lower()), None)
-        if not exam:
-            print(Fore.RED + " Exam not found.")
+        try:
+            summary = self.class_summary(eid)
+        except NotFoundError as e:
+            print(Fore.RED + f" {e}")
             return
-        records = self.marks.get(exam["id"], {})
-        if not records:
+        exam = summary["exam"]
+        if not summary["students"]:
             print(Fore.YELLOW + "No marks entered for this exam.")
             return
         # for each subject compute avg
         print(Fore.CYAN + f"Summary for {exam['name']} ({exam['id']})")
-        subject_averages = {}
-        totals = {}
-        for reg_no, subdict in records.items():
-            total = sum(v for v in subdict.values())
-            totals[reg_no] = total
-            for subj in exam["subjects"]:
-                if subj in subdict:
-                    subject_averages.setdefault(subj, []).append(subdict[subj])
-        for subj, vals in subject_averages.items():
-            avg = sum(vals) / len(vals)
+        if summary["moderated"]:
+            print(Fore.YELLOW + f"Moderated subjects: {', '.join(summary['moderated'])}")
+        for subj, avg in summary["subject_averages"].items():
             print(f"  {subj}: avg = {avg:.2f}")
         # class average & toppers
-        class_avg = sum(totals.values()) / (len(totals) * len(exam["subjects"]))
-        print(Fore.GREEN + f"\nClass average (per subject basis): {class_avg:.2f}")
-        sorted_totals = sorted(totals.items(), key=lambda x: x[1], reverse=True)
+        print(Fore.GREEN + f"\nClass average (per subject basis): {summary['class_average']:.2f}")
         print("\nTop performers:")
-        for reg_no, tot in sorted_totals[:5]:
+        for reg_no, tot in summary["toppers"]:
             st = self.student_manager.get_student(reg_no)
             name = st["name"] if st else reg_no
             print(f"  {name} ({reg_no}) - Total: {tot}")
 
-    def _grade_from_avg(self, avg):
-        if avg >= 90:
-            return "A+"
-        if avg >= 80:
-            return "A"
-        if avg >= 70:
-            return "B"
-        if avg >= 60:
-            return "C"
-        if avg >= 50:
-            return "D"
-        return "F"
+    def exam_statistics(self):
+        header("Exam Statistics")
+        if not self.exams:
+            print(Fore.YELLOW + "No exams.")
+            return
+        self.list_recent_exams()
+        eid = input("Enter Exam ID (blank for all exams): ").strip()
+        if eid:
+            exam = self.get_exam(eid)
+            if not exam:
+                print(Fore.RED + " Exam not found.")
+                return
+            self._print_exam_statistics(exam, histograms=True)
+        else:
+            snap = self.snapshot()
+            for exam in snap.exams:
+                snap._print_exam_statistics(exam, histograms=False)
+
+    @read_locked
+    def exam_stats(self, eid):
+        # pass rate and per-subject statistics (None where a subject has no marks)
+        exam = self.require_exam(eid)
+        with self.class_locks[exam["grade"]].read():
+            return {"exam": exam,
+                    "pass_rate": self.analytics.exam_pass_rate(exam, self.marks.get(exam["id"], {})),
+                    "subjects": {subj: self.analytics.subject_stats(exam["id"], subj) for subj in exam["subjects"]}}
+
+    def pass_counts(self):
+        # (passed, marked) summed over every exam, from one snapshot
+        snap = self.snapshot()
+        passed = marked = 0
+        for exam in snap.exams:
+            p, m = snap.analytics.exam_pass_counts(exam, snap.marks.get(exam["id"], {}))
+            passed += p
+            marked += m
+        return passed, marked
+
+    def _print_exam_statistics(self, exam, histograms):
+        stats = self.exam_stats(exam["id"])
+        pass_rate = stats["pass_rate"]
+        print(Fore.CYAN + f"\n{exam['name']} ({exam['id']}) - {exam['grade']} - {exam['date']}")
+        if pass_rate is None:
+            print(Fore.YELLOW + "  No marks entered for this exam.")
+            return
+        pct = self.analytics.PERCENTILES
+        table = PrettyTable()
+        table.field_names = (["Subject", "N", "Mean", "Median", "Std Dev", "Min", "Max"]
+                             + [f"P{p}" for p in pct] + ["Pass %"])
+        stats_by_subject = []
+        for subj in exam["subjects"]:
+            st = stats["subjects"][subj]
+            if st is None:
+                table.add_row([subj, 0] + ["-"] * (6 + len(pct)))
+                continue
+            stats_by_subject.append((subj, st))
+            table.add_row([subj, st["count"], f"{st['mean']:.2f}", f"{st['median']:.1f}", f"{st['stdev']:.2f}",
+                           st["min"], st["max"]] + [f"{st['percentiles'][p]:.1f}" for p in pct]
+                          + [f"{st['pass_rate']:.1f}"])
+        print(table)
+        print(Fore.GREEN + f"Class pass rate (all subjects >= {self.analytics.PASS_MARK}): {pass_rate:.1f}%")
+        if histograms:
+            for subj, st in stats_by_subject:
+                print(Fore.YELLOW + f"\n{subj} distribution:")
+                widest = max(c for _, c in st["histogram"]) or 1
+                for band, c in st["histogram"]:
+                    print(f"  {band:>6} | {'#' * round(30 * c / widest)} {c}")
+
+    @read_locked
+    def student_trend(self, reg_no):
+        # [(date, exam id, average)] oldest first, and marks gained per exam
+        student = self.student_manager.require_student(reg_no)
+        with self.progress.mutex:
+            return list(self.progress.series.get(student["reg_no"], [])), self.progress.slope(student["reg_no"])
+
+    @read_locked
+    def class_trend(self, grade):
+        # [(exam, class average)] for the class's exams that have marks, oldest first
+        grade = self.student_manager.clean_field("grade", grade)
+        rows = [(e, self.progress.class_average(e["id"])) for e in self.exams_between(grade)]
+        return [(e, avg) for e, avg in rows if avg is not None]
+
+    @read_locked
+    def top_movers(self, grade=None, count=10):
+        # biggest changes since each student's previous exam, for a class or the whole school
+        reg_nos = None
+        if grade:
+            reg_nos = [s["reg_no"] for s in self.student_manager.students_in_class(grade)]
+        return {"improved": self.progress.movers(count, False, reg_nos),
+                "declining": self.progress.movers(count, True, reg_nos)}
+
+    def progress_trends(self):
+        header("Progress Trends")
+        print("1. Student trend")
+        print("2. Class trend")
+        print("3. Most improved / declining students")
+        choice = input("Choice: ").strip()
+        if choice == "1":
+            reg_no = input("Enter student register number: ").strip()
+            student = self.student_manager.get_student(reg_no)
+            if not student:
+                print(Fore.RED + " Student not found.")
+                return
+            points, slope = self.student_trend(student["reg_no"])
+            if not points:
+                print(Fore.YELLOW + "No marks recorded for this student yet.")
+                return
+            print(Fore.CYAN + f"Progress for {student['name']} ({student['reg_no']})")
+            prev = None
+            for date, eid, avg in points:
+                delta = "" if prev is None else f"  ({avg - prev:+.2f})"
+                print(f"  {date} | {self._exams_by_id[eid]['name']} ({eid}) | Average: {avg:.2f}{delta}")
+                prev = avg
+            if slope is not None:
+                print(Fore.GREEN + f"  Trend: {slope:+.2f} marks per exam")
+        elif choice == "2":
+            grade = normalize_class_name(input("Enter class (1-12 or 'Class N'): ").strip())
+            if not grade:
+                print(Fore.RED + " Invalid class.")
+                return
+            rows = self.class_trend(grade)
+            if not rows:
+                print(Fore.YELLOW + f"No marks recorded for {grade}.")
+                return
+            print(Fore.CYAN + f"Class average trend for {grade}")
+            prev = None
+            for e, avg in rows:
+                delta = "" if prev is None else f"  ({avg - prev:+.2f})"
+                print(f"  {e['date']} | {e['name']} ({e['id']}) | Average: {avg:.2f}{delta}")
+                prev = avg
+        elif choice == "3":
+            cls = input("Class (1-12, blank for whole school): ").strip()
+            if cls and not normalize_class_name(cls):
+                print(Fore.RED + " Invalid class.")
+                return
+            movers_by = self.top_movers(cls or None)
+            for title, key in (("Most improved", "improved"), ("Declining", "declining")):
+                print(Fore.CYAN + f"\n{title}:")
+                movers = movers_by[key]
+                if not movers:
+                    print("  (none)")
+                for reg_no, delta in movers:
+                    st = self.student_manager.get_student(reg_no)
+                    name = st["name"] if st else reg_no
+                    print(f"  {name} ({reg_no}) - {delta:+.2f} since previous exam")
+        else:
+            print(Fore.RED + " Invalid option.")
+
+    def effective_marks(self, eid):
+        # marks as reports should see them: moderated where a subject has moderation set
+        specs = self.moderation.get(eid)
+        if not specs:
+            return self.marks.get(eid, {})
+        moderated = self._moderated.get(eid)
+        if moderated is None:
+            # one pass per moderated subject using that subject's column statistics
+            moderated = {reg_no: dict(subdict) for reg_no, subdict in self.marks[eid].items()}
+            for subj, spec in specs.items():
+                st = self.analytics.subject_stats(eid, subj)
+                if st is None:
+                    continue
+                scale = moderation_function(spec, st)
+                for subdict in moderated.values():
+                    if subj in subdict:
+                        subdict[subj] = scale(subdict[subj])
+            self._moderated[eid] = moderated
+        return moderated
+
+    MODERATION_PARAMS = {"zscore": ("mean", "sd"), "linear": ("mean",), "cap": ("cap",), "none": ()}
+
+    @write_locked
+    def set_moderation(self, eid, subjects, method, **params):
+        # subjects: list or "all"; method "none" removes moderation from them
+        exam = self.require_exam(eid)
+        if isinstance(subjects, str):
+            subjects = list(exam["subjects"]) if subjects.strip().lower() == "all" else [subjects.strip()]
+        for subj in subjects:
+            if subj not in exam["subjects"]:
+                raise ValidationError("Invalid subject.")
+        method = str(method).strip().lower()
+        if method not in self.MODERATION_PARAMS:
+            raise ValidationError("Invalid method.")
+        spec = {"method": method}
+        for name in self.MODERATION_PARAMS[method]:
+            try:
+                value = float(params[name])
+            except (KeyError, TypeError, ValueError):
+                raise ValidationError("Value must be numeric.")
+            if not isfinite(value):
+                raise ValidationError("Value must be a finite number.")
+            if name == "sd" and value <= 0:
+                raise ValidationError("Standard deviation must be greater than 0.")
+            if name in ("mean", "cap") and not 0 <= value <= 100:
+                raise ValidationError(f"{'Target mean' if name == 'mean' else 'Maximum mark'} must be 0-100.")
+            spec[name] = value
+        specs = self.moderation.setdefault(exam["id"], {})
+        for subj in subjects:
+            if method == "none":
+                specs.pop(subj, None)
+            else:
+                specs[subj] = spec
+        if not specs:
+            del self.moderation[exam["id"]]
+        self._moderated.pop(exam["id"], None)
+        self._grade_cache.pop(exam["id"], None)
+        self.report_cache.invalidate_exam(exam["id"])
+        return spec
+
+    def moderate_marks(self):
+        header("Moderate Marks")
+        if not self.exams:
+            print(Fore.YELLOW + "No exams.")
+            return
+        self.list_recent_exams()
+        exam = self.get_exam(input("Enter Exam ID: ").strip())
+        if not exam:
+            print(Fore.RED + " Exam not found.")
+            return
+        current = self.moderation.get(exam["id"], {})
+        for subj in exam["subjects"]:
+            print(f"  {subj}: {describe_moderation(current[subj]) if subj in current else 'raw marks'}")
+        subj_input = input("Subject to moderate (or 'all'): ").strip()
+        if subj_input.lower() != "all" and subj_input not in exam["subjects"]:
+            print(Fore.RED + " Invalid subject.")
+            return
+        subjects = list(exam["subjects"]) if subj_input.lower() == "all" else [subj_input]
+        method = input("Method (zscore / linear / cap / none): ").strip().lower()
+        if method not in self.MODERATION_PARAMS:
+            print(Fore.RED + " Invalid method.")
+            return
+        prompts = {"mean": "Target mean: ", "sd": "Target standard deviation: ", "cap": "Maximum mark: "}
+        params = {name: input(prompts[name]).strip() for name in self.MODERATION_PARAMS[method]}
+        try:
+            spec = self.set_moderation(exam["id"], subjects, method, **params)
+        except ValidationError as e:
+            print(Fore.RED + f" {e}")
+            return
+        print(Fore.GREEN + f" Moderation for {', '.join(subjects)} in {exam['id']}: "
+              f"{describe_moderation(spec) if method != 'none' else 'removed'}.")
+
+    def report_cache_stats(self):
+        header("Report Card Cache")
+        st = self.report_cache.stats()
+        print(f"Entries: {st['entries']} / {self.report_cache.max_entries}")
+        print(f"Approx. memory: {st['approx_bytes'] / 1024:.1f} KB / {self.report_cache.max_bytes / 1024:.0f} KB")
+        print(f"Hits: {st['hits']} | Misses: {st['misses']} | Hit rate: {st['hit_rate']:.1f}% | Evictions: {st['evictions']}")
+
+    def exam_grades(self, exam):
+        grades = self._grade_cache.get(exam["id"])
+        if grades is None:
+            averages = {}
+            for reg_no, subdict in self.effective_marks(exam["id"]).items():
+                avg = exam_average(exam, subdict)
+                if avg is not None:
+                    averages[reg_no] = avg
+            grades = apply_grading_scheme(GRADING_SCHEMES[self.grading_scheme], averages)
+            self._grade_cache[exam["id"]] = grades
+        return grades
+
+    def set_grading_scheme(self):
+        header("Set Grading Scheme")
+        print(f"Current scheme: {self.grading_scheme}")
+        for name, scheme in GRADING_SCHEMES.items():
+            bands = " < ".join(scheme["grades"])
+            basis = "percentile" if scheme["type"] == "relative" else "average"
+            print(f"  {name}: {bands} (by {basis}, cutoffs {scheme['cutoffs']})")
+        name = input("Scheme name: ").strip().lower()
+        try:
+            self.change_grading_scheme(name)
+        except ValidationError as e:
+            print(Fore.RED + f" {e}")
+            return
+        print(Fore.GREEN + f" Grading scheme set to {name}.")
+
+    @write_locked
+    def change_grading_scheme(self, name):
+        name = str(name).strip().lower()
+        if name not in GRADING_SCHEMES:
+            raise ValidationError("Unknown grading scheme.")
+        if name != self.grading_scheme:
+            self.grading_scheme = name
+            self._grade_cache.clear()
+            self.report_cache.clear()
+        return GRADING_SCHEMES[name]
 
 # -------------------- Fees Manager --------------------
 
 class FeesManager:
+    DEFAULT_FEE = 10000
+    frozen = False  # True on a snapshot
+
     def __init__(self, student_manager):
         self.student_manager = student_manager
         # fee structure: class -> amount (default 10000 if not set)
         self.fee_structure = {}
         # payments: reg_no -> list of payments {amount, date, method}
         self.payments = {}
+        # running totals per student: reg_no -> {paid, last_payment, by_method}
+        self.balances = {}
+        # append-only ledger of every payment and reversal, in time order, with
+        # prefix sums of amount so any time range totals in two bisects
+        self.ledger_times = []
+        self.ledger = []  # (time, reg_no, amount, method)
+        self._ledger_prefix = [0]
+        # bank references already posted, so a statement can't be applied twice
+        self.references = set()
+        # class -> [(due date, amount)] installments in date order; fee_structure holds their sum
+        self.fee_schedule = {}
+        # reg_no -> {overdue, buckets}, only for students with something overdue
+        self.aging = {}
+        self._aging_day = None  # date the aging was last brought up to
+        self.reminders = None  # last ReminderDispatcher run
+        # paid by students who have since left; the ledger total is this plus every balance
+        self.departed_paid = 0
+        # every student's outstanding due as sorted (due, reg_no), for "due > X" queries;
+        # _due_of holds the entry filed for each reg_no
+        self._due_index = []
+        self._due_of = {}
+        # fee structure and schedules; each student's payments and balance are under
+        # class_locks[their class]; the school-wide ledger and aging have their own locks
+        self.lock = RWLock()
+        self.class_locks = PartitionLocks()
+        self.ledger_lock = RWLock()
+        self._aging_lock = threading.RLock()
+        self._due_lock = threading.Lock()
+        student_manager.events.subscribe("student_added", self._on_student_added)
+        student_manager.events.subscribe("student_changed", self._on_student_changed)
+        student_manager.events.subscribe("student_removed", self._on_student_removed)
+
+    def snapshot(self):
+        if self.frozen:
+            return self
+        # the student list is settled first: its removals and moves are already in the fee records
+        with self.student_manager.events.paused(), self.lock.write():
+            students = self.student_manager.settled_snapshot()
+            with self._aging_lock, self.ledger_lock.read():
+                snap = frozen_copy(self)
+                snap.ledger_lock = RWLock()
+                snap._aging_lock = threading.RLock()
+                snap._due_lock = threading.Lock()
+                snap.student_manager = students
+                snap.fee_structure = dict(self.fee_structure)
+                snap.fee_schedule = dict(self.fee_schedule)
+                snap.payments = dict(self.payments)
+                snap.balances = dict(self.balances)
+                snap.references = set(self.references)
+                snap.aging = dict(self.aging)
+                snap.ledger_times = list(self.ledger_times)
+                snap.ledger = list(self.ledger)
+                snap._ledger_prefix = list(self._ledger_prefix)
+                snap._due_index = list(self._due_index)
+                snap._due_of = dict(self._due_of)
+        return snap
+
+    def fee_for(self, grade):
+        return self.fee_structure.get(grade, self.DEFAULT_FEE)
+
+    def balance(self, student):
+        # O(1): fee for the class against the running paid total
+        bal = self.balances.get(student["reg_no"])
+        paid = bal["paid"] if bal else 0
+        fee_amount = self.fee_for(student["grade"])
+        return {"fee": fee_amount, "paid": paid, "due": max(fee_amount - paid, 0),
+                "last_payment": bal["last_payment"] if bal else None}
+
+    def _index_due(self, reg_no):
+        # re-file one student in the due index from their current class and balance;
+        # a reg_no that no longer names a student is dropped from it
+        student = self.student_manager.get_student(reg_no)
+        with self._due_lock:
+            old = self._due_of.pop(reg_no, None)
+            if old is not None:
+                del self._due_index[bisect_left(self._due_index, (old, reg_no))]
+            if student and student["reg_no"] == reg_no:
+                due = self.balance(student)["due"]
+                insort(self._due_index, (due, reg_no))
+                self._due_of[reg_no] = due
+
+    def _index_class_dues(self, grade):
+        for s in self.student_manager.students_in_class(grade):
+            self._index_due(s["reg_no"])
+
+    def due_scan(self, op, value, count_only=False):
+        # reg_nos whose outstanding due satisfies `due op value` (or just how many)
+        with self._due_lock:
+            start, stop = sorted_range(self._due_index, op, value)
+            if count_only:
+                return stop - start
+            return [reg_no for _, reg_no in self._due_index[start:stop]]
+
+    def _apply_payment(self, reg_no, pay):
+        self._post_payments([(reg_no, pay)])
+
+    def _class_of(self, reg_no):
+        student = self.student_manager.get_student(reg_no)
+        return student["grade"] if student else None
+
+    def _post_payments(self, items):
+        # history, running totals and ledger change together; the ledger is merged once per batch
+        with self.lock.read(), self.class_locks.write_many(self._class_of(reg_no) for reg_no, _ in items):
+            self._post_payments_locked(items)
+
+    def _post_payments_locked(self, items):
+        # everything that can fail is checked before any record changes
+        for reg_no, _ in items:
+            if not self.student_manager.get_student(reg_no):
+                raise NotFoundError("Student not found.")  # removed or renamed since the payment was checked
+        times = []
+        for _, pay in items:
+            try:
+                when = datetime.fromisoformat(pay["date"])
+            except ValueError:
+                when = None
+            if when is None or when.tzinfo is not None:
+                raise ValidationError(f"Invalid payment date {pay['date']!r}.")
+            times.append(when)
+        entries = []
+        for (reg_no, pay), when in zip(items, times):
+            # new history and balance records swapped in, so snapshots keep the old ones
+            old = self.balances.get(reg_no) or {"paid": 0, "last_payment": None, "by_method": {}}
+            self.payments[reg_no] = self.payments.get(reg_no, []) + [pay]
+            method = pay["method"].title()
+            last = old["last_payment"]
+            self.balances[reg_no] = {
+                "paid": old["paid"] + pay["amount"],
+                "last_payment": pay["date"] if last is None or pay["date"] > last else last,
+                "by_method": {**old["by_method"], method: old["by_method"].get(method, 0) + pay["amount"]}}
+            if pay.get("reference"):
+                self.references.add(pay["reference"].lower())
+            entries.append((when, reg_no, pay["amount"], method))
+        if entries:
+            self._ledger_add(entries)
+        for reg_no in {reg_no for reg_no, _ in items}:
+            self._refresh_aging(reg_no)
+            self._index_due(reg_no)
+
+    def _reverse_payment(self, reg_no, pay):
+        # the payment is replaced by a reversed copy; returns the copy
+        reversed_pay = dict(pay, reversed=True)
+        self.payments[reg_no] = [reversed_pay if p is pay else p for p in self.payments[reg_no]]
+        old = self.balances[reg_no]
+        method = pay["method"].title()
+        bal = {"paid": old["paid"] - pay["amount"], "last_payment": old["last_payment"],
+               "by_method": {**old["by_method"], method: old["by_method"][method] - pay["amount"]}}
+        if bal["last_payment"] == pay["date"]:
+            live = [p["date"] for p in self.payments[reg_no] if not p.get("reversed")]
+            bal["last_payment"] = max(live) if live else None
+        self.balances[reg_no] = bal
+        # the ledger is append-only: a reversal is a negative entry at the time it happens
+        self._ledger_add([(datetime.now().replace(microsecond=0), reg_no, -pay["amount"], method)])
+        self._refresh_aging(reg_no)
+        self._index_due(reg_no)
+        return reversed_pay
+
+    def _on_student_added(self, student):
+        with self.lock.read(), self.class_locks[student["grade"]].write():
+            self._index_due(student["reg_no"])
+
+    def _on_student_removed(self, student):
+        # history, balance and aging go with the student; the ledger keeps the money that was collected
+        reg_no = student["reg_no"]
+        with self.lock.read(), self.class_locks[student["grade"]].write():
+            self.payments.pop(reg_no, None)
+            bal = self.balances.pop(reg_no, None)
+            if bal:
+                with self.ledger_lock.write():
+                    self.departed_paid += bal["paid"]
+            self._index_due(reg_no)
+        with self._aging_lock:
+            self.aging.pop(reg_no, None)
+
+    def _on_student_changed(self, before, after):
+        old, new = before["reg_no"], after["reg_no"]
+        if old == new and before["grade"] == after["grade"]:
+            return
+        # both classes are locked, so nothing in flight sees the student half moved
+        with self.lock.read(), self.class_locks.write_many([before["grade"], after["grade"]]):
+            if old != new:
+                # payments already posted under the new reg_no (before this event arrived) are kept too
+                if old in self.payments:
+                    self.payments[new] = self.payments.pop(old) + self.payments.get(new, [])
+                if old in self.balances:
+                    self.balances[new] = self._merge_balances(self.balances.pop(old), self.balances.get(new))
+                with self._aging_lock:
+                    self.aging.pop(old, None)
+                self._index_due(old)
+            # the new class may have a different fee and schedule
+            self._refresh_aging(new)
+            self._index_due(new)
+
+    def _merge_balances(self, bal, other):
+        if not other:
+            return bal
+        dates = [d for d in (bal["last_payment"], other["last_payment"]) if d]
+        return {"paid": bal["paid"] + other["paid"], "last_payment": max(dates) if dates else None,
+                "by_method": {m: bal["by_method"].get(m, 0) + other["by_method"].get(m, 0)
+                              for m in {**bal["by_method"], **other["by_method"]}}}
+
+    def _ledger_add(self, entries):
+        with self.ledger_lock.write():
+            self._ledger_merge(entries)
+
+    def _ledger_merge(self, entries):
+        entries = sorted(entries, key=lambda e: e[0])
+        start = len(self.ledger)
+        if self.ledger_times and entries[0][0] < self.ledger_times[-1]:
+            # back-dated entries: merge, then rebuild prefix sums from the first one touched
+            start = bisect_right(self.ledger_times, entries[0][0])
+            self.ledger[start:] = sorted(self.ledger[start:] + entries, key=lambda e: e[0])
+            self.ledger_times[start:] = [e[0] for e in self.ledger[start:]]
+        else:
+            self.ledger.extend(entries)
+            self.ledger_times.extend(e[0] for e in entries)
+        del self._ledger_prefix[start + 1:]
+        running = self._ledger_prefix[-1]
+        for e in self.ledger[start:]:
+            running += e[2]
+            self._ledger_prefix.append(running)
+
+    def _ledger_range(self, start, end):
+        # index range of ledger entries with start <= time < end
+        return bisect_left(self.ledger_times, start), bisect_left(self.ledger_times, end)
+
+    def collected_between(self, start, end):
+        with self.ledger_lock.read():
+            lo, hi = self._ledger_range(start, end)
+            return self._ledger_prefix[hi] - self._ledger_prefix[lo]
+
+    def ledger_entries(self, start, end):
+        # ([(time, reg_no, amount, method)], total) for start <= time < end
+        with self.ledger_lock.read():
+            lo, hi = self._ledger_range(start, end)
+            return self.ledger[lo:hi], self._ledger_prefix[hi] - self._ledger_prefix[lo]
+
+    def daily_collections(self, start_day, end_day):
+        # [(day, total)] for each day in [start_day, end_day]
+        days = []
+        day = start_day
+        while day <= end_day:
+            days.append((day, self.collected_between(day, day + timedelta(days=1))))
+            day += timedelta(days=1)
+        return days
+
+    def monthly_collections(self, start_day, end_day):
+        # [(month, total)] for each month touching [start_day, end_day]; the first and
+        # last months only count the days inside the range
+        months = []
+        until = end_day + timedelta(days=1)
+        month = start_day.replace(day=1)
+        while month <= end_day:
+            nxt = (month + timedelta(days=32)).replace(day=1)
+            months.append((month, self.collected_between(max(month, start_day), min(nxt, until))))
+            month = nxt
+        return months
+
+    def collections_by_method(self, start, end):
+        totals = {}
+        for _, _, amount, method in self.ledger_entries(start, end)[0]:
+            totals[method] = totals.get(method, 0) + amount
+        return totals
+
+    def collections_report(self):
+        header("Collections Report")
+        print("1. Collections between dates")
+        print("2. Today's cash counter close")
+        print("3. Payments in the last N hours")
+        choice = input("Choice: ").strip()
+        now = datetime.now()
+        if choice == "1":
+            start = input("From date (YYYY-MM-DD): ").strip()
+            end = input("To date (YYYY-MM-DD): ").strip()
+            if not (is_valid_date(start) and is_valid_date(end)) or start > end:
+                print(Fore.RED + " Invalid date range (use YYYY-MM-DD).")
+                return
+            start_day = datetime.strptime(start, "%Y-%m-%d")
+            end_day = datetime.strptime(end, "%Y-%m-%d")
+            until = end_day + timedelta(days=1)
+            # daily rows for up to two months, monthly rows beyond that
+            if (end_day - start_day).days <= 62:
+                label, fmt, rollup = "Day", "%Y-%m-%d", self.daily_collections(start_day, end_day)
+            else:
+                label, fmt, rollup = "Month", "%Y-%m", self.monthly_collections(start_day, end_day)
+            table = PrettyTable()
+            table.field_names = [label, "Collected"]
+            for period, amt in rollup:
+                if amt:
+                    table.add_row([period.strftime(fmt), amt])
+            print(table)
+            self._print_method_totals(self.collections_by_method(start_day, until))
+            print(Fore.GREEN + f"Total collected {start} to {end}: {self.collected_between(start_day, until)}")
+        elif choice == "2":
+            today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            entries, total = self.ledger_entries(today, today + timedelta(days=1))
+            print(Fore.CYAN + f"Cash counter close for {today.strftime('%Y-%m-%d')} - {len(entries)} entries")
+            self._print_method_totals(self.collections_by_method(today, today + timedelta(days=1)))
+            print(Fore.GREEN + f"Total collected today: {total}")
+        elif choice == "3":
+            hours = input("Hours: ").strip()
+            if not hours.isdigit():
+                print(Fore.RED + " Hours must be numeric.")
+                return
+            since = now - timedelta(hours=int(hours))
+            entries, total = self.ledger_entries(since, now + timedelta(seconds=1))
+            for when, reg_no, amount, method in entries:
+                print(f"{when} | {reg_no} | {amount} | {method}")
+            print(Fore.GREEN + f"{len(entries)} entries, total {total}")
+        else:
+            print(Fore.RED + " Invalid option.")
+
+    def _print_method_totals(self, totals):
+        if not totals:
+            print(Fore.YELLOW + "No payments in this period.")
+            return
+        table = PrettyTable()
+        table.field_names = ["Payment Method", "Collected"]
+        for method, amt in sorted(totals.items()):
+            table.add_row([method, amt])
+        print(table)
+
+    AGING_BUCKETS = ("0-30", "31-60", "61-90", "90+")
+
+    def _refresh_aging(self, reg_no, today=None):
+        with self._aging_lock:
+            self._refresh_aging_locked(reg_no, today)
+
+    def _refresh_aging_locked(self, reg_no, today):
+        # re-age one student: payments settle installments oldest first
+        if self._aging_day is None:
+            return  # nothing aged yet; the first aging query does a full pass
+        today = today or self._aging_day
+        student = self.student_manager.get_student(reg_no)
+        schedule = self.fee_schedule.get(student["grade"]) if student else None
+        if not schedule:
+            self.aging.pop(reg_no, None)
+            return
+        bal = self.balances.get(student["reg_no"])
+        remaining = bal["paid"] if bal else 0
+        buckets = [0, 0, 0, 0]
+        for due_date, amount in schedule:
+            covered = min(remaining, amount)
+            remaining -= covered
+            days = (today - due_date).days
+            if days <= 0:
+                break
+            if amount > covered:
+                buckets[0 if days <= 30 else 1 if days <= 60 else 2 if days <= 90 else 3] += amount - covered
+        if any(buckets):
+            self.aging[student["reg_no"]] = {"overdue": sum(buckets), "buckets": buckets}
+        else:
+            self.aging.pop(student["reg_no"], None)
+
+    def _roll_aging(self):
+        # once per day (or after a schedule change) every student is re-aged
+        today = datetime.now().date()
+        with self._aging_lock:
+            if self._aging_day == today:
+                return
+            self._aging_day = today
+            self.aging.clear()
+            with self.student_manager.lock.read():
+                students = list(self.student_manager.students)
+            for s in students:
+                if s["grade"] in self.fee_schedule:
+                    self._refresh_aging_locked(s["reg_no"], today)
+
+    def _reage_class(self, grade):
+        for s in self.student_manager.students_in_class(grade):
+            self._refresh_aging(s["reg_no"])
+
+    def defaulters(self, limit=None):
+        self._roll_aging()
+        with self._aging_lock:
+            rows = [(r, a) for r, a in self.aging.items() if self.student_manager.get_student(r)]
+        if limit:
+            return heapq.nlargest(limit, rows, key=lambda x: x[1]["overdue"])
+        return sorted(rows, key=lambda x: x[1]["overdue"], reverse=True)
+
+    @write_locked
+    def define_fee_schedule(self, grade, installments):
+        # installments: [(due date YYYY-MM-DD, amount)]; the class fee becomes their total
+        grade = normalize_class_name(str(grade).strip())
+        if not grade:
+            raise ValidationError("Invalid class.")
+        if not 1 <= len(installments) <= 12:
+            raise ValidationError("Installments must be 1-12.")
+        schedule = []
+        for due, amt in installments:
+            due, amt = str(due).strip(), str(amt).strip()
+            if not is_valid_date(due):
+                raise ValidationError("Invalid date (use YYYY-MM-DD).")
+            if not amt.isdigit():
+                raise ValidationError("Amount must be numeric.")
+            schedule.append((datetime.strptime(due, "%Y-%m-%d").date(), int(amt)))
+        schedule.sort()
+        self.fee_schedule[grade] = schedule
+        self.fee_structure[grade] = sum(amt for _, amt in schedule)
+        self._reage_class(grade)
+        self._index_class_dues(grade)
+        return schedule
+
+    def set_fee_schedule(self):
+        header("Set Fee Schedule")
+        grade = normalize_class_name(input("Enter class (1-12 or 'Class N'): ").strip())
+        if not grade:
+            print(Fore.RED + " Invalid class.")
+            return
+        n = input("Number of installments: ").strip()
+        if not (n.isdigit() and 1 <= int(n) <= 12):
+            print(Fore.RED + " Installments must be 1-12.")
+            return
+        installments = []
+        for i in range(1, int(n) + 1):
+            due = input(f"  Installment {i} due date (YYYY-MM-DD): ").strip()
+            if not is_valid_date(due):
+                print(Fore.RED + " Invalid date (use YYYY-MM-DD).")
+                return
+            amt = input(f"  Installment {i} amount: ").strip()
+            installments.append((due, amt))
+        try:
+            schedule = self.define_fee_schedule(grade, installments)
+        except ValidationError as e:
+            print(Fore.RED + f" {e}")
+            return
+        print(Fore.GREEN + f" Fee schedule set for {grade}: {len(schedule)} installments, total {self.fee_structure[grade]}")
+
+    def aging_report(self):
+        header("Fee Aging & Defaulters")
+        if not self.fee_schedule:
+            print(Fore.YELLOW + "No fee schedules with due dates have been set.")
+            return
+        rows = self.defaulters()
+        totals = [sum(a["buckets"][i] for _, a in rows) for i in range(len(self.AGING_BUCKETS))]
+        table = PrettyTable()
+        table.field_names = ["Days overdue"] + list(self.AGING_BUCKETS) + ["Total"]
+        table.add_row(["Amount"] + totals + [sum(totals)])
+        print(table)
+        if not rows:
+            print(Fore.GREEN + "No overdue fees.")
+            return
+        limit = input(f"Show how many defaulters? [{min(len(rows), 20)}]: ").strip()
+        limit = int(limit) if limit.isdigit() else 20
+        table = PrettyTable()
+        table.field_names = ["Reg No", "Name", "Class", "Overdue"] + list(self.AGING_BUCKETS)
+        for reg_no, a in rows[:limit]:
+            st = self.student_manager.get_student(reg_no)
+            table.add_row([reg_no, st["name"], st["grade"], a["overdue"]] + a["buckets"])
+        print(table)
+        print(Fore.CYAN + f"{len(rows)} students with overdue fees.")
+
+    def send_fee_reminders(self):
+        header("Send Fee Reminders")
+        if self.reminders and self.reminders.running():
+            print(Fore.YELLOW + "Reminders are still being sent; check Reminder Status.")
+            return
+        rows = self.defaulters()
+        if not rows:
+            print(Fore.GREEN + "No overdue fees; nothing to send.")
+            return
+        host = input("SMTP host [localhost]: ").strip() or "localhost"
+        port = input("SMTP port [1025]: ").strip() or "1025"
+        sender = input("Sender address [office@school.example]: ").strip() or "office@school.example"
+        sms_url = input("SMS gateway URL (blank to skip SMS): ").strip() or None
+        rate = input("Max messages per second [50]: ").strip() or "50"
+        try:
+            sent = self.start_reminders(host, port, sender, sms_url, rate)
+        except SchoolError as e:
+            print(Fore.RED + f" {e}")
+            return
+        print(Fore.GREEN + f" Sending {sent} reminders in the background.")
+
+    def start_reminders(self, host="localhost", port=1025, sender="office@school.example", sms_url=None, rate=50):
+        # queues a reminder for every defaulter and returns how many were queued
+        if self.reminders and self.reminders.running():
+            raise SchoolError("Reminders are still being sent.")
+        port, rate = str(port).strip(), str(rate).strip()
+        if not (port.isdigit() and rate.isdigit() and int(rate) > 0):
+            raise ValidationError("Port and rate must be numeric.")
+        rows = self.defaulters()
+        if not rows:
+            return 0
+        reminders = []
+        for reg_no, aging in rows:
+            st = self.student_manager.get_student(reg_no)
+            reminders.append({"reg_no": reg_no, "name": st["name"], "email": st["email"], "phone": st["phone"],
+                              "text": f"Dear parent, fees of {aging['overdue']} are overdue for {st['name']} "
+                                      f"({reg_no}, {st['grade']}). Please pay at the earliest."})
+        self.reminders = ReminderDispatcher(host, int(port), sender, sms_url, rate_per_second=int(rate))
+        self.reminders.start(reminders)
+        return len(reminders)
+
+    def reminder_status(self):
+        header("Reminder Status")
+        if not self.reminders:
+            print(Fore.YELLOW + "No reminders have been sent.")
+            return
+        print("Running" if self.reminders.running() else "Finished")
+        for channel, counts in self.reminders.summary().items():
+            print(f"  {channel}: " + ", ".join(f"{state} {n}" for state, n in sorted(counts.items())))
+        failed = [(k, d) for k, d in self.reminders.delivery.items() if d["state"] == "failed"]
+        for (reg_no, channel), d in failed[:10]:
+            print(Fore.RED + f"  {reg_no} {channel}: {d['error']}")
+
+    STATEMENT_DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%d/%m/%Y %H:%M:%S")
+
+    def reconcile_statement(self):
+        header("Reconcile Bank Statement")
+        print("CSV columns: date, amount, reference, description (optional reg_no)")
+        path = input("Statement CSV path: ").strip()
+        default_out = os.path.splitext(path)[0] + "_exceptions.csv"
+        out = input(f"Exceptions file [{default_out}]: ").strip() or default_out
+        try:
+            result = self.reconcile_statement_file(path, out)
+        except (OSError, ValidationError) as e:
+            print(Fore.RED + f" Could not reconcile statement: {e}")
+            return
+        print(Fore.GREEN + f" Posted {result['posted']} payments totalling {result['amount']} "
+                           f"({result['by_reg_no']} by reg_no, {result['by_reference']} by reference, "
+                           f"{result['by_amount']} by amount).")
+        if result["exceptions"]:
+            print(Fore.YELLOW + f" {result['exceptions']} rows need review: {out}")
+
+    def _parse_statement_date(self, raw):
+        try:
+            return datetime.fromisoformat(raw)
+        except ValueError:
+            pass
+        for fmt in self.STATEMENT_DATE_FORMATS:
+            try:
+                return datetime.strptime(raw, fmt)
+            except ValueError:
+                pass
+        return None
+
+    @write_locked
+    def reconcile_statement_file(self, path, exceptions_path):
+        students = {s["reg_no"].lower(): s for s in self.student_manager.students}
+        # fallback index: outstanding due -> students owing exactly that much; re-keyed as
+        # rows credit students, so a due already paid off in this statement can't match again
+        dues, by_due = {}, {}
+        for s in self.student_manager.students:
+            due = self.balance(s)["due"]
+            if due:
+                dues[s["reg_no"]] = due
+                by_due.setdefault(due, []).append(s["reg_no"])
+
+        def credit(reg_no, amount):
+            due = dues.pop(reg_no, 0)
+            if not due:
+                return
+            by_due[due].remove(reg_no)
+            if due > amount:
+                dues[reg_no] = due - amount
+                by_due.setdefault(due - amount, []).append(reg_no)
+        matched = []
+        counts = {"by_reg_no": 0, "by_reference": 0, "by_amount": 0}
+        seen_refs = set()
+        # statements repeat the same few dates, so each distinct string is parsed once
+        dates = {}
+        exceptions = 0
+        with open(path, newline="", encoding="utf-8") as f, \
+                open(exceptions_path, "w", newline="", encoding="utf-8") as exc_file:
+            reader = csv.reader(f)
+            head = next(reader, None)
+            if not head:
+                raise ValidationError("statement is empty")
+            cols = [h.strip().lower() for h in head]
+            missing = [c for c in ("date", "amount", "reference") if c not in cols]
+            if missing:
+                raise ValidationError(f"missing columns: {', '.join(missing)}")
+            idx = {c: cols.index(c) for c in ("date", "amount", "reference", "description", "reg_no") if c in cols}
+            writer = csv.writer(exc_file)
+            writer.writerow(head + ["reason"])
+
+            def cell(row, name):
+                i = idx.get(name)
+                return row[i].strip() if i is not None and i < len(row) else ""
+
+            for row in reader:
+                if not any(c.strip() for c in row):
+                    continue
+                reason = None
+                raw_date = cell(row, "date")
+                if raw_date not in dates:
+                    dates[raw_date] = self._parse_statement_date(raw_date)
+                when = dates[raw_date]
+                amount = cell(row, "amount").replace(",", "")
+                ref = cell(row, "reference")
+                reg_no = None
+                how = None
+                try:
+                    amount = float(amount)
+                except ValueError:
+                    amount = None
+                if when is None:
+                    reason = "unreadable date"
+                elif amount is None or not isfinite(amount) or amount <= 0 or amount != int(amount):
+                    reason = "amount must be a positive whole number"
+                elif not ref:
+                    reason = "missing reference"
+                elif ref.lower() in self.references or ref.lower() in seen_refs:
+                    reason = "reference already posted"
+                else:
+                    amount = int(amount)
+                    student = students.get(cell(row, "reg_no").lower())
+                    if student:
+                        reg_no, how = student["reg_no"], "by_reg_no"
+                    else:
+                        # any token of the reference or narration that is a known reg_no
+                        tokens = {t for t in re.split(r"[^0-9a-z]+", f"{ref} {cell(row, 'description')}".lower()) if t}
+                        hits = {students[t]["reg_no"] for t in tokens if t in students}
+                        if len(hits) == 1:
+                            reg_no, how = hits.pop(), "by_reference"
+                        elif len(hits) > 1:
+                            reason = f"reference matches several students: {', '.join(sorted(hits))}"
+                        else:
+                            candidates = by_due.get(amount, [])
+                            if len(candidates) == 1:
+                                reg_no, how = candidates[0], "by_amount"
+                            elif candidates:
+                                reason = f"amount matches the dues of {len(candidates)} students"
+                            else:
+                                reason = "no matching student"
+                if reg_no is None:
+                    writer.writerow(row + [reason])
+                    exceptions += 1
+                    continue
+                seen_refs.add(ref.lower())
+                counts[how] += 1
+                credit(reg_no, amount)
+                matched.append((reg_no, {"amount": amount, "date": when.strftime("%Y-%m-%d %H:%M:%S"),
+                                         "method": "Online", "reference": ref}))
+        self._post_payments(matched)
+        return dict(counts, posted=len(matched), amount=sum(p["amount"] for _, p in matched), exceptions=exceptions)
+
+    # ---- service methods ----
+
+    @write_locked
+    def set_class_fee(self, grade, amount):
+        grade = normalize_class_name(str(grade).strip())
+        if not grade:
+            raise ValidationError("Invalid class.")
+        amount = str(amount).strip()
+        if not amount.isdigit():
+            raise ValidationError("Amount must be numeric.")
+        self.fee_structure[grade] = int(amount)
+        if grade in self.fee_schedule:
+            # a flat fee replaces any installment plan for the class
+            del self.fee_schedule[grade]
+            self._reage_class(grade)
+        self._index_class_dues(grade)
+        return self.fee_structure[grade]
+
+    def check_payment(self, reg_no, amount, method="Cash", date=None):
+        # validated (reg_no, payment) ready for _post_payments; date defaults to now
+        student = self.student_manager.require_student(reg_no)
+        amount = str(amount).strip()
+        if not amount.isdigit():
+            raise ValidationError("Invalid amount.")
+        date = str(date or "").strip()
+        if date:
+            # local school time, stored in one format so stored dates compare as text
+            try:
+                when = datetime.fromisoformat(date)
+            except ValueError:
+                raise ValidationError("Invalid date (use YYYY-MM-DD or YYYY-MM-DD HH:MM:SS).")
+            if when.tzinfo is not None:
+                raise ValidationError("Invalid date (no time zone; use the school's local time).")
+        else:
+            when = datetime.now()
+        return student["reg_no"], {"amount": int(amount), "date": when.strftime("%Y-%m-%d %H:%M:%S"),
+                                   "method": str(method or "").strip() or "Cash"}
+
+    def add_payment(self, reg_no, amount, method="Cash", date=None):
+        reg_no, pay = self.check_payment(reg_no, amount, method, date)
+        self._apply_payment(reg_no, pay)
+        return pay
+
+    def live_payments(self, reg_no):
+        # payments that can still be reversed, oldest first
+        student = self.student_manager.require_student(reg_no)
+        with self.class_locks[student["grade"]].read():
+            return [p for p in self.payments.get(student["reg_no"], []) if not p.get("reversed")]
+
+    def undo_payment(self, reg_no, number):
+        # number: 1-based position in live_payments()
+        history = self.live_payments(reg_no)
+        if not history:
+            raise NotFoundError("No payments to reverse.")
+        number = str(number).strip()
+        if not (number.isdigit() and 1 <= int(number) <= len(history)):
+            raise ValidationError("Invalid choice.")
+        pay = history[int(number) - 1]
+        student = self.student_manager.require_student(reg_no)
+        with self.lock.read(), self.class_locks[student["grade"]].write():
+            if not any(p is pay for p in self.payments.get(student["reg_no"], [])):
+                raise ValidationError("Payment already reversed.")  # by another terminal meanwhile
+            return self._reverse_payment(student["reg_no"], pay)
+
+    @read_locked
+    def student_fees(self, reg_no):
+        # balance plus overdue amounts and installments where the class has a schedule
+        student = self.student_manager.require_student(reg_no)
+        with self.class_locks[student["grade"]].read():
+            fees = self.balance(student)
+        fees["overdue"], fees["buckets"], fees["installments"] = 0, None, []
+        if student["grade"] in self.fee_schedule:
+            self._roll_aging()
+            aging = self.aging.get(student["reg_no"])
+            if aging:
+                fees["overdue"] = aging["overdue"]
+                fees["buckets"] = dict(zip(self.AGING_BUCKETS, aging["buckets"]))
+            fees["installments"] = [(due_date.isoformat(), amount) for due_date, amount in self.fee_schedule[student["grade"]]]
+        return fees
+
+    def payment_history(self, reg_no):
+        student = self.student_manager.require_student(reg_no)
+        with self.class_locks[student["grade"]].read():
+            return list(self.payments.get(student["reg_no"], []))
+
+    @read_locked
+    def class_fees(self, grade):
+        grade = normalize_class_name(str(grade).strip())
+        if not grade:
+            raise ValidationError("Invalid class.")
+        totals = {"grade": grade, "students": 0, "paid": 0, "due": 0}
+        students = self.student_manager.students_in_class(grade)
+        with self.class_locks[grade].read():
+            for s in students:
+                bal = self.balance(s)
+                totals["students"] += 1
+                totals["paid"] += bal["paid"]
+                totals["due"] += bal["due"]
+        return totals
+
+    # ---- menu actions ----
 
     def set_fee_for_class(self):
         header("Set Fee for Class")
         cls = input("Enter class (1-12 or 'Class N'): ").strip()
-        grade = normalize_class_name(cls)
-        if not grade:
+        if not normalize_class_name(cls):
             print(Fore.RED + " Invalid class.")
             return
         amt = input("Enter fee amount (numeric): ").strip()
-        if not amt.isdigit():
-            print(Fore.RED + " Amount must be numeric.")
+        try:
+            self.set_class_fee(cls, amt)
+        except ValidationError as e:
+            print(Fore.RED + f" {e}")
             return
-        self.fee_structure[grade] = int(amt)
-        print(Fore.GREEN + f" Fee set for {grade}: {amt}")
+        print(Fore.GREEN + f" Fee set for {normalize_class_name(cls)}: {amt}")
 
     def record_payment(self):
         header("Record Fee Payment")
@@ -698,65 +3081,686 @@ class FeesManager:
             print(Fore.RED + " Student not found.")
             return
         grade = student["grade"]
-        fee_amount = self.fee_structure.get(grade, None)
-        if fee_amount is None:
-            # default
-            fee_amount = 10000
-        already_paid = sum(p["amount"] for p in self.payments.get(reg_no, []))
-        due = fee_amount - already_paid
-        print(Fore.CYAN + f"{student['name']} - {grade} | Fee: {fee_amount} | Paid: {already_paid} | Due: {max(due,0)}")
+        bal = self.balance(student)
+        print(Fore.CYAN + f"{student['name']} - {grade} | Fee: {bal['fee']} | Paid: {bal['paid']} | Due: {bal['due']}")
         amt = input("Enter payment amount: ").strip()
         if not amt.isdigit():
             print(Fore.RED + " Invalid amount.")
             return
-        amt = int(amt)
         method = input("Payment method (Cash/Card/Online): ").strip() or "Cash"
-        pay = {"amount": amt, "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "method": method}
-        self.payments.setdefault(reg_no, []).append(pay)
+        self.add_payment(student["reg_no"], amt, method)
         print(Fore.GREEN + f" Recorded payment of {amt} for {student['name']}.")
 
-    def view_pending_fees(self):
-        header("Pending Fees for Student")
+    def reverse_payment(self):
+        header("Reverse Fee Payment")
         reg_no = input("Enter student register number: ").strip()
         student = self.student_manager.get_student(reg_no)
         if not student:
             print(Fore.RED + " Student not found.")
             return
-        grade = student["grade"]
-        fee_amount = self.fee_structure.get(grade, 10000)
-        paid = sum(p["amount"] for p in self.payments.get(reg_no, []))
-        due = fee_amount - paid
-        print(Fore.CYAN + f"{student['name']} | Fee: {fee_amount} | Paid: {paid} | Due: {max(due,0)}")
+        history = self.live_payments(student["reg_no"])
+        if not history:
+            print(Fore.YELLOW + "No payments to reverse.")
+            return
+        for i, p in enumerate(history, start=1):
+            print(f"{i}. {p['date']} | {p['amount']} | {p['method']}")
+        choice = input("Payment number to reverse: ").strip()
+        if not (choice.isdigit() and 1 <= int(choice) <= len(history)):
+            print(Fore.RED + " Invalid choice.")
+            return
+        pay = history[int(choice) - 1]
+        confirm = input(Fore.YELLOW + f"Confirm reverse payment of {pay['amount']} on {pay['date']} (y/N): ").strip().lower()
+        if confirm != "y":
+            print("Cancelled.")
+            return
+        self.undo_payment(student["reg_no"], choice)
+        print(Fore.GREEN + f" Reversed payment of {pay['amount']} for {student['name']}.")
+
+    def view_pending_fees(self):
+        header("Pending Fees for Student")
+        reg_no = input("Enter student register number: ").strip()
+        try:
+            fees = self.student_fees(reg_no)
+        except NotFoundError as e:
+            print(Fore.RED + f" {e}")
+            return
+        student = self.student_manager.get_student(reg_no)
+        last = f" | Last payment: {fees['last_payment']}" if fees["last_payment"] else ""
+        print(Fore.CYAN + f"{student['name']} | Fee: {fees['fee']} | Paid: {fees['paid']} | Due: {fees['due']}{last}")
+        if fees["buckets"]:
+            parts = ", ".join(f"{b} days: {amt}" for b, amt in fees["buckets"].items() if amt)
+            print(Fore.RED + f"Overdue: {fees['overdue']} ({parts})")
+        for due_date, amount in fees["installments"]:
+            print(f"  Installment due {due_date}: {amount}")
 
     def view_payment_history(self):
         header("Payment History")
-        reg_no = input("Enter student register number: ").strip()
-        history = self.payments.get(reg_no, [])
+        try:
+            history = self.payment_history(input("Enter student register number: "))
+        except NotFoundError as e:
+            print(Fore.RED + f" {e}")
+            return
         if not history:
             print(Fore.YELLOW + "No payments found.")
             return
         for p in history:
-            print(f"{p['date']} | {p['amount']} | {p['method']}")
+            note = " (reversed)" if p.get("reversed") else ""
+            print(f"{p['date']} | {p['amount']} | {p['method']}{note}")
 
     def fee_report_for_class(self):
         header("Fee Report for Class")
-        cls = input("Enter class (1-12): ").strip()
-        grade = normalize_class_name(cls)
-        if not grade:
-            print(Fore.RED + " Invalid class.")
+        try:
+            totals = self.class_fees(input("Enter class (1-12): "))
+        except ValidationError as e:
+            print(Fore.RED + f" {e}")
             return
-        students = [s for s in self.student_manager.students if s["grade"] == grade]
-        if not students:
+        if not totals["students"]:
             print(Fore.YELLOW + "No students in this class.")
             return
-        fee_amount = self.fee_structure.get(grade, 10000)
-        total_due = 0
-        total_paid = 0
+        print(Fore.CYAN + f"Class {totals['grade']} - Students: {totals['students']} | Total Paid: {totals['paid']} | Total Due: {totals['due']}")
+
+    def fee_summary(self):
+        # one pass over a snapshot, reading each running balance once: the totals
+        # are from a single instant and payments keep posting while it runs
+        def bucket():
+            return {"students": 0, "fee": 0, "paid": 0, "due": 0, "defaulters": 0}
+        by_grade, by_gender, by_method = {}, {}, {}
+        total = bucket()
+        snap = self.snapshot()
+        snap._add_to_summary(snap.student_manager.students, bucket, by_grade, by_gender, by_method, total)
+        return {"by_grade": by_grade, "by_gender": by_gender, "by_method": by_method, "total": total}
+
+    def _add_to_summary(self, students, bucket, by_grade, by_gender, by_method, total):
         for s in students:
-            paid = sum(p["amount"] for p in self.payments.get(s["reg_no"], []))
-            total_paid += paid
-            total_due += max(fee_amount - paid, 0)
-        print(Fore.CYAN + f"Class {grade} - Students: {len(students)} | Total Paid: {total_paid} | Total Due: {total_due}")
+            bal = self.balances.get(s["reg_no"])
+            paid = bal["paid"] if bal else 0
+            fee_amount = self.fee_for(s["grade"])
+            due = max(fee_amount - paid, 0)
+            for agg in (by_grade.setdefault(s["grade"], bucket()), by_gender.setdefault(s["gender"], bucket()), total):
+                agg["students"] += 1
+                agg["fee"] += fee_amount
+                agg["paid"] += paid
+                agg["due"] += due
+                agg["defaulters"] += due > 0
+            if bal:
+                for method, amt in bal["by_method"].items():
+                    by_method[method] = by_method.get(method, 0) + amt
+
+    def fee_dashboard(self):
+        header("School Fee Dashboard")
+        if not self.student_manager.students:
+            print(Fore.YELLOW + "No students.")
+            return
+        summary = self.fee_summary()
+
+        def row(label, agg):
+            pct = 100 * agg["paid"] / agg["fee"] if agg["fee"] else 100.0
+            return [label, agg["students"], agg["fee"], agg["paid"], agg["due"], f"{pct:.1f}", agg["defaulters"]]
+
+        columns = ["Students", "Fee", "Paid", "Due", "Collected %", "Defaulters"]
+        table = PrettyTable()
+        table.field_names = ["Class"] + columns
+        for grade in sorted(summary["by_grade"], key=lambda g: int("".join(ch for ch in g if ch.isdigit()))):
+            table.add_row(row(grade, summary["by_grade"][grade]))
+        table.add_row(row("Total", summary["total"]))
+        print(table)
+        table = PrettyTable()
+        table.field_names = ["Gender"] + columns
+        for gender in sorted(summary["by_gender"]):
+            table.add_row(row(gender, summary["by_gender"][gender]))
+        print(table)
+        if summary["by_method"]:
+            table = PrettyTable()
+            table.field_names = ["Payment Method", "Collected"]
+            for method, amt in sorted(summary["by_method"].items(), key=lambda x: x[1], reverse=True):
+                table.add_row([method, amt])
+            print(table)
+
+# -------------------- Fee Reminders --------------------
+
+class RateLimiter:
+    # token bucket shared by all senders of one dispatch run
+    def __init__(self, per_second):
+        self.per_second = per_second
+        self.tokens = per_second
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.per_second, self.tokens + (now - self.updated) * self.per_second)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.per_second)
+
+class SmtpPool:
+    # a fixed set of SMTP connections, opened on first use and reused for every message
+    def __init__(self, host, port, size, user=None, password=None, starttls=False):
+        self.host, self.port = host, port
+        self.user, self.password, self.starttls = user, password, starttls
+        self.idle = asyncio.Queue()
+        for _ in range(size):
+            self.idle.put_nowait(None)
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            conn.starttls()
+        if self.user:
+            conn.login(self.user, self.password)
+        return conn
+
+    def _send(self, conn, messages):
+        # runs in a worker thread; returns the connection to keep (None once it broke) and
+        # per-message errors. Messages the server already accepted keep None even if the
+        # connection is lost later in the batch, so a retry never sends them twice.
+        errors = []
+        for i, msg in enumerate(messages):
+            try:
+                if conn is None:
+                    conn = self._connect()
+                try:
+                    conn.send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    # an idle pooled connection may have timed out; one fresh try
+                    conn = None
+                    conn = self._connect()
+                    conn.send_message(msg)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                # this message was refused; the server reset the transaction, the connection is still good.
+                # Caught first: every SMTPException is an OSError
+                errors.append(str(e))
+            except OSError as e:
+                # no usable connection (dropped, refused, failed login): this message and the rest
+                # of the batch are left for a retry
+                if conn is not None:
+                    conn.close()
+                return None, errors + [str(e)] * (len(messages) - i)
+            else:
+                errors.append(None)
+        return conn, errors
+
+    async def send_batch(self, messages):
+        conn = await self.idle.get()
+        try:
+            conn, errors = await asyncio.to_thread(self._send, conn, messages)
+        except Exception:
+            conn = None  # in an unknown state; the slot reconnects on next use
+            raise
+        finally:
+            self.idle.put_nowait(conn)
+        return errors
+
+    async def close(self):
+        while not self.idle.empty():
+            conn = self.idle.get_nowait()
+            if conn is not None:
+                try:
+                    await asyncio.to_thread(conn.quit)
+                except (OSError, smtplib.SMTPException):
+                    pass
+
+class SmsGateway:
+    # JSON-over-HTTP gateway client; one keep-alive connection per pooled slot
+    def __init__(self, url, size):
+        parts = urlsplit(url)
+        self.https = parts.scheme == "https"
+        self.netloc, self.path = parts.netloc, parts.path or "/"
+        self.idle = asyncio.Queue()
+        for _ in range(size):
+            self.idle.put_nowait(None)
+
+    def _post(self, conn, batch):
+        if conn is None:
+            conn = (http.client.HTTPSConnection if self.https else http.client.HTTPConnection)(self.netloc, timeout=30)
+        body = json.dumps({"messages": batch}).encode()
+        try:
+            conn.request("POST", self.path, body, {"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            raise
+        if resp.status >= 300:
+            raise OSError(f"SMS gateway returned HTTP {resp.status}")
+        return conn
+
+    async def send_batch(self, batch):
+        conn = await self.idle.get()
+        try:
+            conn = await asyncio.to_thread(self._post, conn, batch)
+            return [None] * len(batch)
+        except (OSError, http.client.HTTPException) as e:
+            conn = None
+            return [str(e)] * len(batch)
+        finally:
+            self.idle.put_nowait(conn)
+
+class ReminderDispatcher:
+    def __init__(self, smtp_host="localhost", smtp_port=1025, sender="office@school.example", sms_url=None,
+                 pool_size=4, rate_per_second=50, batch_size=50, max_attempts=3, backoff=0.5):
+        self.smtp_host, self.smtp_port, self.sender = smtp_host, smtp_port, sender
+        self.sms_url = sms_url
+        self.pool_size, self.rate_per_second = pool_size, rate_per_second
+        self.batch_size, self.max_attempts, self.backoff = batch_size, max_attempts, backoff
+        # (reg_no, channel) -> {"state": queued/sent/failed, "attempts", "error"}
+        self.delivery = {}
+        self.thread = None
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, reminders):
+        # reminders: [{"reg_no", "name", "email", "phone", "text"}]; sending happens off the CLI thread
+        for r in reminders:
+            self.delivery[(r["reg_no"], "email")] = {"state": "queued", "attempts": 0, "error": None}
+            if self.sms_url:
+                self.delivery[(r["reg_no"], "sms")] = {"state": "queued", "attempts": 0, "error": None}
+        self.thread = threading.Thread(target=asyncio.run, args=(self._run(reminders),), daemon=True)
+        self.thread.start()
+
+    def summary(self):
+        counts = {}
+        for (_, channel), d in self.delivery.items():
+            counts.setdefault(channel, {}).setdefault(d["state"], 0)
+            counts[channel][d["state"]] += 1
+        return counts
+
+    def _email(self, r):
+        msg = EmailMessage()
+        msg["From"] = self.sender
+        msg["To"] = r["email"]
+        msg["Subject"] = f"Fee reminder for {r['name']} ({r['reg_no']})"
+        msg.set_content(r["text"])
+        return msg
+
+    async def _run(self, reminders):
+        limiter = RateLimiter(self.rate_per_second)
+        smtp = SmtpPool(self.smtp_host, self.smtp_port, self.pool_size)
+        sms = SmsGateway(self.sms_url, self.pool_size) if self.sms_url else None
+        queue = asyncio.Queue()
+        for i in range(0, len(reminders), self.batch_size):
+            batch = reminders[i:i + self.batch_size]
+            queue.put_nowait(("email", batch))
+            if sms:
+                queue.put_nowait(("sms", batch))
+        workers = [asyncio.create_task(self._worker(queue, limiter, smtp, sms)) for _ in range(self.pool_size * 2)]
+        await queue.join()
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await smtp.close()
+
+    async def _worker(self, queue, limiter, smtp, sms):
+        while True:
+            channel, batch = await queue.get()
+            try:
+                await self._deliver(channel, batch, limiter, smtp, sms)
+            except Exception as e:
+                # fails what is left of this batch, not the worker: the rest of the queue still drains
+                for r in batch:
+                    d = self.delivery[(r["reg_no"], channel)]
+                    if d["state"] != "sent":
+                        d.update(state="failed", error=f"{type(e).__name__}: {e}")
+            finally:
+                queue.task_done()
+
+    async def _deliver(self, channel, batch, limiter, smtp, sms):
+        pending = batch
+        for attempt in range(1, self.max_attempts + 1):
+            for _ in pending:
+                await limiter.acquire()
+            if channel == "email":
+                errors = await smtp.send_batch([self._email(r) for r in pending])
+            else:
+                errors = await sms.send_batch([{"to": r["phone"], "text": r["text"]} for r in pending])
+            retry = []
+            for r, err in zip(pending, errors):
+                d = self.delivery[(r["reg_no"], channel)]
+                d["attempts"] = attempt
+                d["error"] = err
+                if err is None:
+                    d["state"] = "sent"
+                elif attempt == self.max_attempts:
+                    d["state"] = "failed"
+                else:
+                    retry.append(r)
+            if not retry:
+                return
+            pending = retry
+            await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+
+# -------------------- Student Queries --------------------
+# "Girls in Class 10 aged 15-16 with fees due" as one where-clause over student
+# fields and fee and exam state. Class, gender, age, fee due and reg_no are
+# indexed; the planner asks each index how many students it would yield for its
+# predicate, starts from the smallest, and checks every predicate on just those
+# students. With no usable index (or none smaller than the school) it scans.
+
+class QueryManager:
+    # field -> kind; text compares case-insensitively, number includes grade (by class number)
+    FIELDS = {"reg_no": "text", "name": "text", "gender": "text", "email": "text", "phone": "text",
+              "grade": "number", "age": "number", "due": "number", "paid": "number", "overdue": "number",
+              "average": "number", "exams": "number"}
+    OPS = {"text": ("=", "!=", "contains", "missing", "present"),
+           "number": ("=", "!=", "<", "<=", ">", ">=", "between", "missing", "present")}
+    # filters run cheapest first: the student record, then the fee ledger, then exam history
+    COST = {"due": 1, "paid": 1, "overdue": 1, "average": 2, "exams": 2}
+    DERIVED = ("due", "paid", "overdue", "average", "exams")
+    CLAUSE = re.compile(r"(\w+)\s*(<=|>=|!=|=|<|>|between\b|contains\b|missing\b|present\b)\s*(.*)", re.I)
+
+    def __init__(self, student_manager, exam_manager, fees_manager):
+        self.student_manager = student_manager
+        self.exam_manager = exam_manager
+        self.fees_manager = fees_manager
+
+    def parse(self, where):
+        # "gender = female and grade = 10 and age between 15 16 and due > 0" -> [(field, op, value)]
+        where = str(where or "").strip()
+        if not where:
+            return []
+        # "between 15 and 16" is one clause, not two
+        where = re.sub(r"\bbetween\s+(\S+)\s+and\s+(\S+)", r"between \1 \2", where, flags=re.I)
+        preds = []
+        for clause in re.split(r"\s+and\s+", where, flags=re.I):
+            m = self.CLAUSE.fullmatch(clause.strip())
+            if not m:
+                raise ValidationError(f"Cannot read '{clause.strip()}' (use: field op value).")
+            field, op, raw = m.group(1).lower(), m.group(2).lower(), m.group(3).strip().strip("'\"")
+            if field not in self.FIELDS:
+                raise ValidationError(f"Unknown field '{field}' (one of: {', '.join(self.FIELDS)}).")
+            if op not in self.OPS[self.FIELDS[field]]:
+                raise ValidationError(f"'{op}' does not apply to {field}.")
+            if op in ("missing", "present"):
+                if raw:
+                    raise ValidationError(f"'{op}' takes no value.")
+                value = None
+            elif op == "between":
+                bounds = raw.split()
+                if len(bounds) != 2:
+                    raise ValidationError("between takes two values, e.g. age between 15 16.")
+                value = tuple(sorted(self._value_of(field, b) for b in bounds))
+            else:
+                value = self._value_of(field, raw)
+            preds.append((field, op, value))
+        return preds
+
+    def _value_of(self, field, raw):
+        if field == "grade":
+            grade = normalize_class_name(raw)
+            if not grade:
+                raise ValidationError("Invalid class (must be 1..12).")
+            return class_number(grade)
+        if self.FIELDS[field] == "number":
+            try:
+                value = float(raw)
+            except ValueError:
+                raise ValidationError(f"{field} needs a number.")
+            if not isfinite(value):
+                raise ValidationError(f"{field} needs a finite number.")
+            return int(value) if value == int(value) else value
+        if field == "gender":
+            if not is_valid_gender(raw):
+                raise ValidationError("Invalid gender.")
+            return raw.title()
+        if not raw:
+            raise ValidationError(f"{field} needs a value.")
+        return raw.lower()
+
+    @staticmethod
+    def describe(pred):
+        field, op, value = pred
+        shown = value
+        if field == "grade":
+            shown = f"Class {value}" if op != "between" else tuple(f"Class {v}" for v in value)
+        if op in ("missing", "present"):
+            return f"{field} {op}"
+        if op == "between":
+            return f"{field} between {shown[0]} and {shown[1]}"
+        return f"{field} {op} {shown}"
+
+    def _field(self, s, field):
+        if field in ("due", "paid"):
+            # balance records are replaced, never changed, so one read is consistent
+            return self.fees_manager.balance(s)[field]
+        if field == "overdue":
+            aging = self.fees_manager.aging.get(s["reg_no"])
+            return aging["overdue"] if aging else 0
+        if field in ("average", "exams"):
+            average, taken = self.exam_manager.progress.latest(s["reg_no"])
+            return average if field == "average" else taken
+        if field == "grade":
+            return class_number(s["grade"])
+        if field in ("age", "gender"):
+            return s[field]
+        return str(s[field]).lower()
+
+    def _test(self, s, pred):
+        field, op, value = pred
+        v = self._field(s, field)
+        if op in ("missing", "present"):
+            return (v in (None, "")) == (op == "missing")
+        if v in (None, ""):
+            return False
+        if op == "contains":
+            return value in v
+        return compare(v, op, value)
+
+    def _index_scan(self, pred, count_only=False):
+        # what the index for this predicate yields, None if there is none
+        field, op, value = pred
+        if field == "due":
+            if op not in RANGE_OPS:
+                return None
+            if count_only:
+                return self.fees_manager.due_scan(op, value, count_only=True)
+            hits = map(self.student_manager.get_student, self.fees_manager.due_scan(op, value))
+            return [s for s in hits if s]
+        return self.student_manager.index_scan(field, op, value, count_only)
+
+    def plan(self, preds):
+        # [(estimated rows, predicate)] for each predicate an index answers, smallest first
+        options = []
+        for pred in preds:
+            estimate = self._index_scan(pred, count_only=True)
+            if estimate is not None:
+                options.append((estimate, pred))
+        return sorted(options, key=lambda o: o[0])
+
+    def _run(self, where):
+        preds = self.parse(where)
+        # the fee index follows student changes through events; let them land first
+        self.student_manager.events.deliver()
+        if any(field == "overdue" for field, _, _ in preds):
+            self.fees_manager._roll_aging()
+        total = len(self.student_manager.students)
+        options = self.plan(preds)
+        driver = None
+        if options and options[0][0] < total:
+            estimate, driver = options[0]
+            candidates = self._index_scan(driver)
+        else:
+            estimate = total
+            with self.student_manager.lock.read():
+                candidates = list(self.student_manager.students)
+        # the student indexes are exact, but the due index can trail a payment still posting
+        filters = sorted((p for p in preds if p is not driver or driver[0] == "due"),
+                         key=lambda p: self.COST.get(p[0], 0))
+        rows = [s for s in candidates if all(self._test(s, p) for p in filters)]
+        rows.sort(key=lambda s: (class_number(s["grade"]), s["reg_no"]))
+        plan = {"where": [self.describe(p) for p in preds],
+                "access": f"index on {driver[0]}" if driver else "full scan",
+                "driver": self.describe(driver) if driver else None,
+                "considered": [{"predicate": self.describe(p), "estimate": n} for n, p in options],
+                "filters": [self.describe(p) for p in filters],
+                "students": total, "estimated": estimate, "examined": len(candidates), "returned": len(rows)}
+        return rows, plan, preds
+
+    # ---- service methods ----
+
+    def query(self, where=""):
+        return self._run(where)[0]
+
+    def explain(self, where=""):
+        # the plan chosen for `where`, with the rows it actually examined and returned
+        return self._run(where)[1]
+
+    # ---- menu actions ----
+
+    def query_students(self):
+        header("Query Students")
+        print("Conditions joined by 'and', e.g. gender = female and grade = 10 and age between 15 16 and due > 0")
+        print(f"Fields: {', '.join(self.FIELDS)}")
+        print("Operators: = != < <= > >= between contains missing present (prefix 'explain' to see the plan)")
+        where = input("Where: ").strip()
+        show_plan = where.lower().startswith("explain")
+        if show_plan:
+            where = where[len("explain"):]
+        try:
+            rows, plan, preds = self._run(where)
+        except ValidationError as e:
+            print(Fore.RED + f" {e}")
+            return
+        if show_plan:
+            table = PrettyTable()
+            table.field_names = ["Indexed predicate", "Estimated rows"]
+            for option in plan["considered"]:
+                table.add_row([option["predicate"], option["estimate"]])
+            if plan["considered"]:
+                print(table)
+            print(f"Access: {plan['access']}" + (f" ({plan['driver']})" if plan["driver"] else "")
+                  + f", estimated {plan['estimated']} of {plan['students']} students")
+            if plan["filters"]:
+                print(f"Then filter: {' and '.join(plan['filters'])}")
+        print(Fore.CYAN + f"{plan['access']}: examined {plan['examined']}, returned {plan['returned']}")
+        if not rows:
+            print(Fore.YELLOW + "No students match.")
+            return
+        extra = [f for f in self.DERIVED if any(field == f for field, _, _ in preds)]
+        table = PrettyTable()
+        table.field_names = ["Reg No", "Name", "Class", "Age", "Gender"] + [f.title() for f in extra]
+        for s in rows:
+            table.add_row([s["reg_no"], s["name"], s["grade"], s["age"], s["gender"]]
+                          + [self._field(s, f) for f in extra])
+        print(table)
+
+# -------------------- Diagnostics --------------------
+
+class ActionStats:
+    # latency histogram with power-of-two microsecond buckets: bucket i holds calls under 2**i us
+    BUCKETS = 32
+
+    def __init__(self):
+        self.lock = threading.Lock()  # batch jobs and API worker threads time calls concurrently
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * self.BUCKETS
+        self.size_total = 0
+        self.size_max = 0
+
+    def add(self, seconds, size, failed=False):
+        with self.lock:
+            self.calls += 1
+            self.errors += failed
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self.histogram[min(int(seconds * 1e6).bit_length(), self.BUCKETS - 1)] += 1
+            self.size_total += size
+            self.size_max = max(self.size_max, size)
+
+    def percentile(self, p):
+        # upper edge of the bucket holding the p-th percentile call, in milliseconds
+        target = self.calls * p / 100
+        seen = 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                return min(2 ** i / 1000, self.max * 1000)
+        return 0.0
+
+    def to_dict(self):
+        return {"calls": self.calls, "errors": self.errors,
+                "mean_ms": 1000 * self.total / self.calls if self.calls else 0.0,
+                "p50_ms": self.percentile(50), "p95_ms": self.percentile(95), "p99_ms": self.percentile(99),
+                "max_ms": 1000 * self.max, "histogram_us_pow2": list(self.histogram),
+                "data_size_mean": self.size_total / self.calls if self.calls else 0, "data_size_max": self.size_max}
+
+class Instrumentation:
+    # wraps the manager service methods while enabled - the ones batch ops, API calls
+    # and the menus all go through, so timings cover code rather than time spent at a
+    # prompt; disabling removes the wrappers so the managers run their plain methods again
+    # what the menus call besides the batch/API ops, so menu use is timed as well
+    MENU_SERVICES = [
+        ("student_manager", "class_counts"), ("student_manager", "students_in_class"),
+        ("teacher_manager", "subject_teachers"),
+        ("timetable_manager", "get_timetable"),
+        ("exam_manager", "exams_between"), ("exam_manager", "recent_exams"), ("exam_manager", "report_card"),
+        ("exam_manager", "write_report_cards"), ("exam_manager", "snapshot"), ("exam_manager", "top_movers"),
+        ("exam_manager", "class_trend"), ("exam_manager", "student_trend"),
+        ("fees_manager", "live_payments"), ("fees_manager", "collected_between"), ("fees_manager", "ledger_entries"),
+        ("fees_manager", "daily_collections"), ("fees_manager", "monthly_collections"),
+        ("fees_manager", "collections_by_method"), ("fees_manager", "start_reminders"),
+        ("query_manager", "_run"),
+    ]
+
+    def __init__(self, system):
+        self.system = system
+        self.enabled = False
+        self.stats = {}
+
+    def enable(self):
+        if self.enabled:
+            return
+        for manager_attr, name in self.service_methods():
+            manager = getattr(self.system, manager_attr)
+            setattr(manager, name, self._wrap(manager_attr, name, getattr(manager, name)))
+        self.enabled = True
+
+    def disable(self):
+        if not self.enabled:
+            return
+        for manager_attr, name in self.service_methods():
+            getattr(self.system, manager_attr).__dict__.pop(name, None)
+        self.enabled = False
+
+    @classmethod
+    def service_methods(cls):
+        return sorted(set(BatchRunner.OPS.values()) | set(cls.MENU_SERVICES))
+
+    def _wrap(self, manager_attr, name, method):
+        stats = self.stats.setdefault(f"{manager_attr}.{name}", ActionStats())
+        size_of = self.system.data_size
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = method(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                stats.add(time.perf_counter() - start, size_of(manager_attr), failed)
+        timed.__name__ = name
+        timed.instrumented = True  # frozen_copy leaves these behind
+        return timed
+
+    def snapshot(self):
+        return {"enabled": self.enabled, "generated": datetime.now().isoformat(timespec="seconds"),
+                "actions": {name: st.to_dict() for name, st in sorted(self.stats.items()) if st.calls}}
+
+    def reset(self):
+        for name in list(self.stats):
+            self.stats[name] = ActionStats()
+        if self.enabled:
+            # wrappers hold their stats object, so re-install them
+            self.disable()
+            self.enable()
 
 # -------------------- Main Class --------------------
 
@@ -767,6 +3771,63 @@ class SchoolManagementSystem:
         self.timetable_manager = TimetableManger()
         self.exam_manager = ExamManager(self.student_manager, self.teacher_manager)
         self.fees_manager = FeesManager(self.student_manager)
+        self.query_manager = QueryManager(self.student_manager, self.exam_manager, self.fees_manager)
+        self.instrumentation = Instrumentation(self)
+
+    def data_size(self, manager_attr):
+        # rough count of the records an action of this manager can touch
+        if manager_attr in ("student_manager", "query_manager"):
+            return len(self.student_manager.students)
+        if manager_attr == "teacher_manager":
+            return len(self.teacher_manager.teachers)
+        if manager_attr == "timetable_manager":
+            return len(self.timetable_manager.time_tables)
+        if manager_attr == "exam_manager":
+            return sum(self.exam_manager._marks_in_class.values())
+        return len(self.fees_manager.ledger)
+
+    def diagnostics_menu(self):
+        inst = self.instrumentation
+        while True:
+            header("Diagnostics")
+            print(f"Instrumentation is {'ON' if inst.enabled else 'OFF'}")
+            print("1. Turn instrumentation on/off")
+            print("2. Show action timings")
+            print("3. Dump timings to JSON file")
+            print("4. Reset timings")
+            print("5. Back")
+            choice = input("Choice: ").strip()
+            if choice == "1":
+                inst.disable() if inst.enabled else inst.enable()
+            elif choice == "2":
+                actions = inst.snapshot()["actions"]
+                if not actions:
+                    print(Fore.YELLOW + "No timings recorded.")
+                    continue
+                table = PrettyTable()
+                table.field_names = ["Action", "Calls", "Errors", "Mean ms", "p50 ms", "p95 ms", "p99 ms", "Max ms",
+                                     "Data size"]
+                for name, st in sorted(actions.items(), key=lambda x: x[1]["mean_ms"] * x[1]["calls"], reverse=True):
+                    table.add_row([name, st["calls"], st["errors"], f"{st['mean_ms']:.3f}", f"{st['p50_ms']:.3f}",
+                                   f"{st['p95_ms']:.3f}", f"{st['p99_ms']:.3f}", f"{st['max_ms']:.3f}",
+                                   st["data_size_max"]])
+                print(table)
+            elif choice == "3":
+                path = input("File [diagnostics.json]: ").strip() or "diagnostics.json"
+                try:
+                    with open(path, "w", encoding="utf-8") as f:
+                        json.dump(inst.snapshot(), f, indent=2)
+                except OSError as e:
+                    print(Fore.RED + f" Could not write {path}: {e}")
+                    continue
+                print(Fore.GREEN + f" Timings written to {path}.")
+            elif choice == "4":
+                inst.reset()
+                print(Fore.GREEN + " Timings reset.")
+            elif choice == "5":
+                break
+            else:
+                print(Fore.RED + " Invalid option.")
 
     def main_menu(self):
         while True:
@@ -791,6 +3852,8 @@ class SchoolManagementSystem:
             elif choice == "6":
                 print(Fore.GREEN + "Exiting, Thank you")
                 break
+            elif choice.lower() == "d":  # hidden
+                self.diagnostics_menu()
             else:
                 print(Fore.RED + " Invalid option.")
 
@@ -804,7 +3867,8 @@ class SchoolManagementSystem:
             print("5. Search Student")
             print("6. Count Students per Class")
             print("7. List Students by Class")
-            print("8. Back")
+            print("8. Query Students")
+            print("9. Back")
             choice = input("Choice: ").strip()
             if choice == "1": self.student_manager.add_student()
             elif choice == "2": self.student_manager.view_students()
@@ -813,7 +3877,8 @@ class SchoolManagementSystem:
             elif choice == "5": self.student_manager.search_student()
             elif choice == "6": self.student_manager.count_students_per_class()
             elif choice == "7": self.student_manager.list_students_by_class()
-            elif choice == "8": break
+            elif choice == "8": self.query_manager.query_students()
+            elif choice == "9": break
             else: print(Fore.RED + " Invalid option.")
 
     def teacher_menu(self):
@@ -866,14 +3931,30 @@ class SchoolManagementSystem:
             print("3. Enter Marks for Student")
             print("4. View Student Report Card")
             print("5. Exam/Class Summary")
-            print("6. Back")
+            print("6. Remove Exam")
+            print("7. Bulk Enter Marks from CSV")
+            print("8. Set Grading Scheme")
+            print("9. Export Report Cards")
+            print("10. Exam Statistics")
+            print("11. Progress Trends")
+            print("12. Moderate Marks")
+            print("13. Report Card Cache Stats")
+            print("14. Back")
             choice = input("Choice: ").strip()
             if choice == "1": self.exam_manager.add_exam()
-            elif choice == "2": self.exam_manager.list_exams()
+            elif choice == "2": self.exam_manager.find_exams()
             elif choice == "3": self.exam_manager.enter_marks()
             elif choice == "4": self.exam_manager.view_report_card()
             elif choice == "5": self.exam_manager.class_result_summary()
-            elif choice == "6": break
+            elif choice == "6": self.exam_manager.remove_exam()
+            elif choice == "7": self.exam_manager.bulk_enter_marks()
+            elif choice == "8": self.exam_manager.set_grading_scheme()
+            elif choice == "9": self.exam_manager.export_report_cards()
+            elif choice == "10": self.exam_manager.exam_statistics()
+            elif choice == "11": self.exam_manager.progress_trends()
+            elif choice == "12": self.exam_manager.moderate_marks()
+            elif choice == "13": self.exam_manager.report_cache_stats()
+            elif choice == "14": break
             else: print(Fore.RED + " Invalid option.")
 
     def fees_menu(self):
@@ -884,20 +3965,569 @@ class SchoolManagementSystem:
             print("3. View Pending Fees for Student")
             print("4. View Payment History")
             print("5. Fee Report for Class")
-            print("6. Back")
+            print("6. Reverse Payment")
+            print("7. School Fee Dashboard")
+            print("8. Collections Report")
+            print("9. Reconcile Bank Statement")
+            print("10. Set Fee Schedule (Installments)")
+            print("11. Fee Aging & Defaulters")
+            print("12. Send Fee Reminders")
+            print("13. Reminder Status")
+            print("14. Back")
             choice = input("Choice: ").strip()
             if choice == "1": self.fees_manager.set_fee_for_class()
             elif choice == "2": self.fees_manager.record_payment()
             elif choice == "3": self.fees_manager.view_pending_fees()
             elif choice == "4": self.fees_manager.view_payment_history()
             elif choice == "5": self.fees_manager.fee_report_for_class()
-            elif choice == "6": break
+            elif choice == "6": self.fees_manager.reverse_payment()
+            elif choice == "7": self.fees_manager.fee_dashboard()
+            elif choice == "8": self.fees_manager.collections_report()
+            elif choice == "9": self.fees_manager.reconcile_statement()
+            elif choice == "10": self.fees_manager.set_fee_schedule()
+            elif choice == "11": self.fees_manager.aging_report()
+            elif choice == "12": self.fees_manager.send_fee_reminders()
+            elif choice == "13": self.fees_manager.reminder_status()
+            elif choice == "14": break
             else: print(Fore.RED + " Invalid option.")
 
+# -------------------- Batch Mode --------------------
+
+class BatchRunner:
+    # runs JSONL commands ({"op": ..., "args": {...}, "id": optional}) without a terminal;
+    # args are the keyword arguments of the service method the op maps to
+    OPS = {
+        "add_student": ("student_manager", "create_student"),
+        "update_student": ("student_manager", "edit_student"),
+        "remove_student": ("student_manager", "delete_student"),
+        "search_students": ("student_manager", "find_students"),
+        "query_students": ("query_manager", "query"),
+        "explain_query": ("query_manager", "explain"),
+        "add_teacher": ("teacher_manager", "create_teacher"),
+        "update_teacher": ("teacher_manager", "edit_teacher"),
+        "remove_teacher": ("teacher_manager", "delete_teacher"),
+        "assign_subject": ("teacher_manager", "assign_subject_to_teacher"),
+        "add_timetable": ("timetable_manager", "set_timetable"),
+        "edit_timetable": ("timetable_manager", "set_period"),
+        "remove_timetable": ("timetable_manager", "delete_timetable"),
+        "remove_timetable_day": ("timetable_manager", "remove_day"),
+        "clear_timetable_day": ("timetable_manager", "clear_day"),
+        "clear_timetable": ("timetable_manager", "clear_timetable"),
+        "add_exam": ("exam_manager", "create_exam"),
+        "remove_exam": ("exam_manager", "delete_exam"),
+        "enter_marks": ("exam_manager", "record_marks"),
+        "load_marks_csv": ("exam_manager", "import_marks"),
+        "set_grading_scheme": ("exam_manager", "change_grading_scheme"),
+        "moderate_marks": ("exam_manager", "set_moderation"),
+        "report_card": ("exam_manager", "student_report"),
+        "class_summary": ("exam_manager", "class_summary"),
+        "exam_stats": ("exam_manager", "exam_stats"),
+        "set_fee_for_class": ("fees_manager", "set_class_fee"),
+        "set_fee_schedule": ("fees_manager", "define_fee_schedule"),
+        "record_payment": ("fees_manager", "add_payment"),
+        "reverse_payment": ("fees_manager", "undo_payment"),
+        "balance": ("fees_manager", "student_fees"),
+        "payment_history": ("fees_manager", "payment_history"),
+        "class_fees": ("fees_manager", "class_fees"),
+        "fee_summary": ("fees_manager", "fee_summary"),
+        "defaulters": ("fees_manager", "defaulters"),
+        "reconcile_statement": ("fees_manager", "reconcile_statement_file"),
+    }
+    LOG_CHUNK = 1000
+    # bad input from the command file; anything else is a bug, logged with its type
+    EXPECTED_ERRORS = (SchoolError, ValueError, LookupError, TypeError, OSError)
+
+    def __init__(self, system):
+        self.system = system
+        self.pending_payments = []  # (log entry, reg_no, pay) waiting to be posted together
+
+    @classmethod
+    def error_text(cls, e):
+        return str(e) if isinstance(e, cls.EXPECTED_ERRORS) else f"{type(e).__name__}: {e}"
+
+    def service(self, op):
+        if op not in self.OPS:
+            raise ValidationError(f"unknown op '{op}'")
+        manager, method = self.OPS[op]
+        return getattr(getattr(self.system, manager), method)
+
+    def _flush_payments(self, log, counts):
+        # posts the buffered payments in one batch, then logs them (and any rejected ones) in command order.
+        # If the batch is refused, each payment is posted on its own so only the bad ones fail
+        pending, self.pending_payments = self.pending_payments, []
+        posted = [(reg_no, pay) for _, reg_no, pay in pending if pay]
+        batch_failed = False
+        if posted:
+            try:
+                self.system.fees_manager._post_payments(posted)
+            except Exception:
+                batch_failed = True
+        for entry, reg_no, pay in pending:
+            if pay:
+                try:
+                    if batch_failed:
+                        self.system.fees_manager._post_payments([(reg_no, pay)])
+                    entry.update(ok=True, result=pay)
+                except Exception as e:
+                    entry.update(ok=False, error=self.error_text(e))
+            counts["ok" if entry["ok"] else "error"] += 1
+            log.append(json.dumps(entry, default=str))
+
+    def run(self, commands, log_file):
+        # commands: iterable of JSON lines; results are written to log_file as JSON lines
+        log = []
+        counts = {"ok": 0, "error": 0}
+        for line_no, raw in enumerate(commands, start=1):
+            if not raw.strip():
+                continue
+            entry = {"line": line_no, "id": None, "op": None}
+            try:
+                cmd = json.loads(raw)
+                op, args = cmd.get("op"), cmd.get("args") or {}
+                entry.update(id=cmd.get("id"), op=op)
+                if op == "record_payment":
+                    # consecutive payments are checked one by one and posted together
+                    # (counted when they are posted)
+                    try:
+                        reg_no, pay = self.system.fees_manager.check_payment(**args)
+                    except (SchoolError, TypeError) as e:
+                        reg_no, pay = None, None
+                        entry.update(ok=False, error=str(e))
+                    self.pending_payments.append((entry, reg_no, pay))
+                    continue
+                self._flush_payments(log, counts)
+                entry["result"] = self.service(op)(**args)
+                entry["ok"] = True
+                counts["ok"] += 1
+            except Exception as e:
+                # one failed command is logged and the rest still run
+                self._flush_payments(log, counts)
+                entry.update(ok=False, error=self.error_text(e))
+                counts["error"] += 1
+            # serialised now, before later commands change the objects a result refers to
+            log.append(json.dumps(entry, default=str))
+            if len(log) >= self.LOG_CHUNK:
+                log_file.write("\n".join(log) + "\n")
+                log = []
+        self._flush_payments(log, counts)
+        if log:
+            log_file.write("\n".join(log) + "\n")
+        return counts
+
+# -------------------- API Server --------------------
+
+class SchoolServer:
+    # HTTP/1.1 JSON API over one shared SchoolManagementSystem. Connections are
+    # kept alive and pipelined requests are answered in order; listings are
+    # streamed with chunked encoding so large schools don't build one huge body
+    # (to an HTTP/1.0 client, unframed and ended by closing the connection).
+    #   GET  /students[?grade=N]      GET /students/<reg_no>[/fees|/report-card]
+    #   GET  /teachers                GET /exams[?grade=&start=&end=]
+    #   GET  /exams/<eid>/summary     GET /exams/<eid>/stats
+    #   GET  /timetables/<class>      GET /fees/summary    GET /fees/defaulters[?limit=N]
+    #   GET  /health                  POST /ops/<op>  (body: batch-mode args)
+    # Ops that read or write files on the server (LOCAL_OPS) are batch-mode only.
+    # Service calls run on worker threads - the managers lock for themselves - so a
+    # long report or import doesn't hold up every other connection.
+    REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               411: "Length Required", 413: "Payload Too Large", 431: "Request Header Fields Too Large",
+               500: "Internal Server Error"}
+    MAX_BODY = 1024 * 1024
+    LOCAL_OPS = ("load_marks_csv", "reconcile_statement")
+    STREAM_CHUNK = 500  # records per chunk of a streamed listing
+
+    def __init__(self, system, host="127.0.0.1", port=8080, idle_timeout=30):
+        self.system = system
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.ops = BatchRunner(system)
+        self.requests = 0
+        self.connections = 0
+
+    def serve_forever(self):
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._connection, self.host, self.port, limit=64 * 1024)
+        print(f"Serving on http://{self.host}:{self.port}", file=sys.stderr, flush=True)
+        async with server:
+            await server.serve_forever()
+
+    async def _connection(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+                except asyncio.LimitOverrunError:
+                    self._respond(writer, 431, {"ok": False, "error": "headers too large"}, False)
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                parts = lines[0].split(" ")
+                if len(parts) != 3:
+                    self._respond(writer, 400, {"ok": False, "error": "malformed request line"}, False)
+                    break
+                method, target, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if value:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                if "transfer-encoding" in headers:
+                    self._respond(writer, 411, {"ok": False, "error": "send a Content-Length body"}, False)
+                    break
+                length = headers.get("content-length", "0")
+                if not length.isdigit():
+                    self._respond(writer, 400, {"ok": False, "error": "invalid Content-Length"}, False)
+                    break
+                if int(length) > self.MAX_BODY:
+                    self._respond(writer, 413, {"ok": False, "error": "body too large"}, False)
+                    break
+                try:
+                    body = await reader.readexactly(int(length)) if int(length) else b""
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                self.requests += 1
+                keep_alive = await self._dispatch(writer, method, target, body, keep_alive, version == "HTTP/1.1")
+                if not keep_alive:
+                    break
+                # pipelined requests already buffered are read next; only wait when the socket is backed up
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _dispatch(self, writer, method, target, body, keep_alive, chunked):
+        # returns whether the connection can take another request
+        path, _, query = target.partition("?")
+        params = {k: v[-1] for k, v in parse_qs(query).items()}
+        segs = [unquote(seg) for seg in path.strip("/").split("/")]
+        try:
+            if method == "POST" and len(segs) == 2 and segs[0] == "ops":
+                args = json.loads(body or b"{}")
+                if not isinstance(args, dict):
+                    raise ValidationError("body must be a JSON object of arguments")
+                if segs[1] in self.LOCAL_OPS:
+                    raise NotFoundError(f"op '{segs[1]}' takes server file paths and is only available in batch mode")
+                result = await asyncio.to_thread(self.ops.service(segs[1]), **args)
+            elif method != "GET":
+                self._respond(writer, 405, {"ok": False, "error": f"{method} not allowed"}, keep_alive)
+                return keep_alive
+            else:
+                result = await asyncio.to_thread(self._get, segs, params)
+                if isinstance(result, list):
+                    # without chunked encoding, closing the connection is what ends the body
+                    keep_alive = keep_alive and chunked
+                    await self._stream(writer, result, keep_alive, chunked)
+                    return keep_alive
+        except NotFoundError as e:
+            self._respond(writer, 404, {"ok": False, "error": str(e)}, keep_alive)
+        except (SchoolError, ValueError, TypeError) as e:
+            self._respond(writer, 400, {"ok": False, "error": str(e)}, keep_alive)
+        except Exception as e:
+            print(Fore.RED + f"{method} {target} failed: {e!r}", file=sys.stderr)
+            self._respond(writer, 500, {"ok": False, "error": "internal error"}, keep_alive)
+        else:
+            self._respond(writer, 200, {"ok": True, "result": result}, keep_alive)
+        return keep_alive
+
+    def _get(self, segs, params):
+        # a list result is streamed; anything else is sent as one JSON body
+        students, exams, fees = self.system.student_manager, self.system.exam_manager, self.system.fees_manager
+        head, rest = segs[0], segs[1:]
+        if head == "students" and not rest:
+            if "where" in params:
+                return self.system.query_manager.query(params["where"])
+            return students.students_in_class(params["grade"]) if "grade" in params else list(students.students)
+        if head == "students" and len(rest) == 1:
+            return students.require_student(rest[0])
+        if head == "students" and len(rest) == 2 and rest[1] == "fees":
+            return fees.student_fees(rest[0])
+        if head == "students" and len(rest) == 2 and rest[1] == "report-card":
+            return exams.student_report(rest[0])
+        if head == "teachers" and not rest:
+            return list(self.system.teacher_manager.teachers)
+        if head == "exams" and not rest:
+            grade = params.get("grade")
+            if grade:
+                grade = students.clean_field("grade", grade)
+            return exams.exams_between(grade, params.get("start"), params.get("end"))
+        if head == "exams" and len(rest) == 2 and rest[1] == "summary":
+            return exams.class_summary(rest[0])
+        if head == "exams" and len(rest) == 2 and rest[1] == "stats":
+            return exams.exam_stats(rest[0])
+        if head == "timetables" and len(rest) == 1:
+            return self.system.timetable_manager.get_timetable(rest[0])
+        if segs == ["fees", "summary"]:
+            return fees.fee_summary()
+        if segs == ["fees", "defaulters"]:
+            limit = params.get("limit", "")
+            return fees.defaulters(int(limit) if limit.isdigit() else None)
+        if segs == ["health"]:
+            return {"requests": self.requests, "connections": self.connections}
+        raise NotFoundError(f"no route for /{'/'.join(segs)}")
+
+    def _head(self, status, keep_alive, extra):
+        close = "" if keep_alive else "Connection: close\r\n"
+        return (f"HTTP/1.1 {status} {self.REASONS[status]}\r\nContent-Type: application/json\r\n"
+                f"{extra}{close}\r\n").encode("latin-1")
+
+    def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, default=str).encode()
+        writer.write(self._head(status, keep_alive, f"Content-Length: {len(body)}\r\n") + body)
+
+    async def _stream(self, writer, items, keep_alive, chunked=True):
+        # {"ok": true, "result": [...]} sent STREAM_CHUNK records at a time
+        writer.write(self._head(200, keep_alive, "Transfer-Encoding: chunked\r\n" if chunked else ""))
+        for i in range(0, len(items) or 1, self.STREAM_CHUNK):
+            part = ",".join(json.dumps(item, default=str) for item in items[i:i + self.STREAM_CHUNK])
+            data = (('{"ok": true, "result": [' if i == 0 else ",") + part
+                    + ("]}" if i + self.STREAM_CHUNK >= len(items) else "")).encode()
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data) if chunked else data)
+            await writer.drain()
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+
+# -------------------- District Shards --------------------
+# One deployment can serve a whole district. Every school is a separate
+# SchoolManagementSystem living in one of N worker processes, picked by a
+# stable hash of its id, so a school's data and locks never leave its process
+# and schools on different shards run in parallel. The router forwards
+# batch-mode ops to the owning shard; district reports are scatter-gather:
+# each shard totals its own schools and the router merges the rows.
+
+def _shard_main(conn):
+    # one worker process: serves (request id, school id, op, args) until it gets None
+    schools = {}  # school id (lower case) -> (school id, BatchRunner over the school's system)
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        req_id, school_id, op, args = msg
+        try:
+            reply = (req_id, True, _shard_call(schools, school_id, op, args))
+        except Exception as e:
+            reply = (req_id, False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:  # the result didn't pickle
+            conn.send((req_id, False, SchoolError(f"Could not return the result: {e}")))
+    conn.close()
+
+def _shard_call(schools, school_id, op, args):
+    if op in District.REPORTS:
+        return [(sid, District.REPORTS[op](runner.system)) for sid, runner in schools.values()]
+    school_id = str(school_id or "").strip()
+    if op == "add_school":
+        if not is_alphanumeric(school_id):
+            raise ValidationError("Invalid school id (must be alphanumeric).")
+        if school_id.lower() in schools:
+            raise ValidationError("A school with this id already exists.")
+        schools[school_id.lower()] = (school_id, BatchRunner(SchoolManagementSystem()))
+        return {"school": school_id}
+    if school_id.lower() not in schools:
+        raise NotFoundError("School not found.")
+    return schools[school_id.lower()][1].service(op)(**args)
+
+class District:
+    # routes ops to the shard owning each school and runs district reports across all shards
+    REPORTS = {
+        "school_students": lambda system: len(system.student_manager.students),
+        "school_fees": lambda system: system.fees_manager.fee_summary()["total"],
+        "school_pass_counts": lambda system: system.exam_manager.pass_counts(),
+    }
+    LOG_CHUNK = 1000
+
+    def __init__(self, shards=None):
+        self.shards = max(int(shards or os.cpu_count() or 1), 1)
+        self._ids = itertools.count()
+        self._pending = {}  # request id -> (shard, Future)
+        self._pending_lock = threading.Lock()
+        self._conns, self._send_locks, self._procs = [], [], []
+        # every worker is forked before any receiver thread starts
+        for k in range(self.shards):
+            conn, child = multiprocessing.Pipe()
+            proc = multiprocessing.Process(target=_shard_main, args=(child,), name=f"shard-{k}", daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(conn)
+            self._send_locks.append(threading.Lock())
+            self._procs.append(proc)
+        for k in range(self.shards):
+            threading.Thread(target=self._receive, args=(k,), daemon=True).start()
+
+    def shard_of(self, school_id):
+        return zlib.crc32(str(school_id).strip().lower().encode()) % self.shards
+
+    def _send(self, shard, school_id, op, args):
+        fut = Future()
+        req_id = next(self._ids)
+        with self._pending_lock:
+            self._pending[req_id] = (shard, fut)
+        with self._send_locks[shard]:
+            self._conns[shard].send((req_id, school_id, op, args))
+        return fut
+
+    def _receive(self, shard):
+        conn = self._conns[shard]
+        while True:
+            try:
+                req_id, ok, result = conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._pending_lock:
+                _, fut = self._pending.pop(req_id)
+            if ok:
+                fut.set_result(result)
+            else:
+                fut.set_exception(result)
+        # the worker is gone, so nothing still waiting on it will be answered
+        with self._pending_lock:
+            lost = [req_id for req_id, (k, _) in self._pending.items() if k == shard]
+            futures = [self._pending.pop(req_id)[1] for req_id in lost]
+        for fut in futures:
+            fut.set_exception(SchoolError(f"Shard {shard} stopped."))
+
+    def submit(self, school_id, op, args=None):
+        # Future of the op's result; a school's ops run in the order they were submitted
+        return self._send(self.shard_of(school_id), school_id, op, args or {})
+
+    def call(self, school_id, op, args=None):
+        return self.submit(school_id, op, args).result()
+
+    def add_school(self, school_id):
+        return self.call(school_id, "add_school")
+
+    def _gather(self, report):
+        # every shard works on the report at once; rows come back as (school id, result)
+        futures = [self._send(k, None, report, {}) for k in range(self.shards)]
+        return sorted((row for fut in futures for row in fut.result()), key=lambda row: row[0].lower())
+
+    def schools(self):
+        # school id -> students, for every school in the district
+        return dict(self._gather("school_students"))
+
+    def district_fees(self):
+        rows = self._gather("school_fees")
+        total = {"students": 0, "fee": 0, "paid": 0, "due": 0, "defaulters": 0}
+        for _, totals in rows:
+            for key in total:
+                total[key] += totals[key]
+        return {"schools": dict(rows), "total": total}
+
+    def district_pass_rates(self):
+        schools = {}
+        passed = marked = 0
+        for sid, (p, m) in self._gather("school_pass_counts"):
+            schools[sid] = {"passed": p, "marked": m, "pass_rate": 100 * p / m if m else None}
+            passed += p
+            marked += m
+        return {"schools": schools,
+                "total": {"passed": passed, "marked": marked, "pass_rate": 100 * passed / marked if marked else None}}
+
+    DISTRICT_OPS = {"schools": schools, "district_fees": district_fees, "district_pass_rates": district_pass_rates}
+
+    def run(self, commands, log_file):
+        # like BatchRunner.run, but each command names its "school" (except the district-wide
+        # ops); shards work through their queues in parallel while the log keeps command order
+        counts = {"ok": 0, "error": 0}
+        queued = deque()  # (log entry, Future or None)
+
+        def drain(limit):
+            log = []
+            while len(queued) > limit:
+                entry, fut = queued.popleft()
+                if fut is not None:
+                    try:
+                        entry["result"] = fut.result()
+                        entry["ok"] = True
+                    except Exception as e:  # raised in the shard, whatever it was
+                        entry.update(ok=False, error=BatchRunner.error_text(e))
+                counts["ok" if entry["ok"] else "error"] += 1
+                log.append(json.dumps(entry, default=str))
+            if log:
+                log_file.write("\n".join(log) + "\n")
+
+        for line_no, raw in enumerate(commands, start=1):
+            if not raw.strip():
+                continue
+            entry = {"line": line_no, "id": None, "op": None}
+            fut = None
+            try:
+                cmd = json.loads(raw)
+                op, args = cmd.get("op"), cmd.get("args") or {}
+                entry.update(id=cmd.get("id"), op=op)
+                if op in self.DISTRICT_OPS:
+                    # sent after every earlier command, so each shard answers with those applied
+                    entry["result"] = self.DISTRICT_OPS[op](self)
+                    entry["ok"] = True
+                elif op != "add_school" and op not in BatchRunner.OPS:
+                    raise ValidationError(f"unknown op '{op}'")
+                elif not cmd.get("school"):
+                    raise ValidationError("missing school")
+                else:
+                    entry["school"] = cmd["school"]
+                    fut = self.submit(cmd["school"], op, args)
+            except Exception as e:
+                entry.update(ok=False, error=BatchRunner.error_text(e))
+            queued.append((entry, fut))
+            drain(self.LOG_CHUNK)
+        drain(0)
+        return counts
+
+    def close(self):
+        for conn, lock in zip(self._conns, self._send_locks):
+            with lock:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass  # that worker is already gone
+        for proc in self._procs:
+            proc.join()
+        for conn in self._conns:
+            conn.close()
+
 # -------------------- Run --------------------
 
-print(Fore.MAGENTA + "\n" + "=" * 40)
-print(Fore.GREEN + Back.WHITE + Style.BRIGHT + "\n Welcome to School Management System" + Style.RESET_ALL)
-print(Fore.MAGENTA + "\n" + "=" * 40 + Style.RESET_ALL,end="")
-system = SchoolManagementSystem()
-system.main_menu()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="School Management System")
+    parser.add_argument("--batch", metavar="COMMANDS.jsonl", help="run commands from a JSONL file without prompts")
+    parser.add_argument("--log", metavar="RESULTS.jsonl", help="where to write batch results (default: stdout)")
+    parser.add_argument("--shards", type=int, metavar="N",
+                        help="with --batch: a district of schools across N worker processes; commands name their school")
+    parser.add_argument("--serve", action="store_true", help="run the HTTP/JSON API instead of the menus")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    cli_args = parser.parse_args()
+    system = SchoolManagementSystem()
+    if cli_args.serve:
+        try:
+            SchoolServer(system, cli_args.host, cli_args.port).serve_forever()
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+    if cli_args.batch:
+        runner = District(cli_args.shards) if cli_args.shards else BatchRunner(system)
+        try:
+            with open(cli_args.batch, encoding="utf-8") as commands:
+                if cli_args.log:
+                    with open(cli_args.log, "w", encoding="utf-8") as log_file:
+                        counts = runner.run(commands, log_file)
+                else:
+                    counts = runner.run(commands, sys.stdout)
+        finally:
+            if cli_args.shards:
+                runner.close()
+        print(f"{counts['ok']} commands succeeded, {counts['error']} failed.", file=sys.stderr)
+        sys.exit(1 if counts["error"] else 0)
+    print(Fore.MAGENTA + "\n" + "=" * 40)
+    print(Fore.GREEN + Back.WHITE + Style.BRIGHT + "\n Welcome to School Management System" + Style.RESET_ALL)
+    print(Fore.MAGENTA + "\n" + "=" * 40 + Style.RESET_ALL,end="")
+    system.main_menu()
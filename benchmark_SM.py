@@ -0,0 +1,610 @@
+# -------------------- School Management System Benchmarks --------------------
+# Builds a deterministic synthetic school through the real manager methods of
+# Final_SM.py (answering their prompts from a script, output discarded) and
+# times every operation at each requested scale.
+#
+#   python benchmark_SM.py --sizes 1000,10000 --out bench.json
+#   python benchmark_SM.py --sizes 1000 --compare bench.json
+#   python benchmark_SM.py --http --sizes 2000 --connections 8 --pipeline 4
+#   python benchmark_SM.py --stress --sizes 2000 --threads 8 --duration 10
+#   python benchmark_SM.py --district --sizes 30000 --schools 300 --shards 4
+
+import argparse
+import asyncio
+import builtins
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import Final_SM as sm
+
+FIRST_NAMES = ["Arun", "Priya", "Kavin", "Divya", "Rahul", "Meena", "Surya", "Anitha", "Karthik", "Lakshmi",
+               "Vijay", "Deepa", "Hari", "Nisha", "Ravi", "Sneha", "Ganesh", "Pooja", "Ajay", "Keerthana"]
+LAST_NAMES = ["Kumar", "Raj", "Devi", "Sharma", "Nair", "Iyer", "Reddy", "Pillai", "Das", "Menon"]
+GENDERS = ["Male", "Female", "Other"]
+METHODS = ["Cash", "Card", "Online"]
+
+# -------------------- Scripted prompts --------------------
+
+class ScriptedInput:
+    # stands in for input(): each call returns the next scripted answer
+    def __init__(self):
+        self.answers = []
+
+    def __call__(self, prompt=""):
+        if not self.answers:
+            raise EOFError(f"benchmark script ran out of answers at prompt {prompt!r}")
+        return self.answers.pop()
+
+    def load(self, answers):
+        self.answers = [str(a) for a in reversed(answers)]
+
+SCRIPT = ScriptedInput()
+
+@contextlib.contextmanager
+def headless():
+    real_input = builtins.input
+    builtins.input = SCRIPT
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        builtins.input = real_input
+
+def call(method, *answers):
+    SCRIPT.load(answers)
+    method()
+    if SCRIPT.answers:
+        raise RuntimeError(f"{method.__name__} left {len(SCRIPT.answers)} answers unused")
+
+# -------------------- Timing --------------------
+
+class Timer:
+    def __init__(self):
+        self.results = {}
+
+    def run(self, name, calls):
+        # calls: list of (method, answers); records total and per-call time
+        start = time.perf_counter()
+        for method, answers in calls:
+            call(method, *answers)
+        elapsed = time.perf_counter() - start
+        self.results[name] = {"ops": len(calls), "total_s": round(elapsed, 6),
+                              "mean_us": round(1e6 * elapsed / max(len(calls), 1), 3),
+                              "ops_per_s": round(len(calls) / elapsed, 1) if elapsed else None}
+
+# -------------------- Synthetic school --------------------
+
+def student_rows(n, rnd):
+    for i in range(n):
+        grade = i % 12 + 1
+        yield {"name": f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}", "reg_no": f"S{i:07d}",
+               "grade": grade, "age": grade + 5, "gender": rnd.choice(GENDERS),
+               "email": f"s{i}@school.example", "phone": f"98{i:08d}"}
+
+def run_scale(n, seed, sample):
+    rnd = random.Random(seed)
+    system = sm.SchoolManagementSystem()
+    students, teachers = system.student_manager, system.teacher_manager
+    timetables, exams, fees = system.timetable_manager, system.exam_manager, system.fees_manager
+    timer = Timer()
+    rows = list(student_rows(n, rnd))
+    subjects = sm.StudentManager.DEFAULT_SUBJECTS
+    picks = [rnd.choice(rows) for _ in range(min(sample, n))]
+    classes = list(range(1, 13))
+    today = datetime.now()
+
+    # students
+    timer.run("student.add_student", [(students.add_student, (r["name"], r["reg_no"], r["grade"], r["age"],
+                                                             r["gender"], r["email"], r["phone"])) for r in rows])
+    timer.run("student.view_students", [(students.view_students, ())])
+    timer.run("student.search_student", [(students.search_student, (r["reg_no"],)) for r in picks[:20]])
+    timer.run("student.count_students_per_class", [(students.count_students_per_class, ())])
+    timer.run("student.list_students_by_class", [(students.list_students_by_class, (c,)) for c in classes])
+    timer.run("student.update_student", [(students.update_student, (r["reg_no"], "phone", f"97{i:08d}"))
+                                         for i, r in enumerate(picks)])
+
+    # teachers
+    n_teachers = max(n // 25, 6)
+    timer.run("teacher.add_teacher", [(teachers.add_teacher, (f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}",
+                                                              rnd.randint(1, 30), "B.Ed"))
+                                      for _ in range(n_teachers)])
+    timer.run("teacher.assign_subject", [(teachers.assign_subject, (f"T{i + 1:03d}", subjects[i % len(subjects)]))
+                                         for i in range(n_teachers)])
+    timer.run("teacher.view_teachers", [(teachers.view_teachers, ())])
+    timer.run("teacher.view_subjects_and_teachers", [(teachers.view_subjects_and_teachers, ())])
+
+    # timetables
+    timer.run("timetable.add_timetable", [(timetables.add_timetable,
+                                           [c] + [rnd.choice(subjects) for _ in range(35)]) for c in classes])
+    timer.run("timetable.view_timetable", [(timetables.view_timetable, (c,)) for c in classes])
+
+    # exams: a midterm and a final per class, marks for every student
+    exam_calls = []
+    for c in classes:
+        exam_calls.append((exams.add_exam, ("Midterm", c, "all", (today - timedelta(days=120)).strftime("%Y-%m-%d"))))
+        exam_calls.append((exams.add_exam, ("Final", c, "all", (today - timedelta(days=10)).strftime("%Y-%m-%d"))))
+    timer.run("exam.add_exam", exam_calls)
+    midterm = {f"Class {c}": f"E{2 * i + 1:03d}" for i, c in enumerate(classes)}
+    final = {f"Class {c}": f"E{2 * i + 2:03d}" for i, c in enumerate(classes)}
+    timer.run("exam.enter_marks", [(exams.enter_marks, [midterm[f"Class {r['grade']}"], r["reg_no"]]
+                                    + [rnd.randint(20, 100) for _ in subjects]) for r in rows])
+    with tempfile.TemporaryDirectory() as tmp:
+        sheets = []
+        for c in classes:
+            path = os.path.join(tmp, f"class{c}.csv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("reg_no," + ",".join(subjects) + "\n")
+                for r in rows:
+                    if r["grade"] == c:
+                        f.write(r["reg_no"] + "," + ",".join(str(rnd.randint(20, 100)) for _ in subjects) + "\n")
+            sheets.append((exams.bulk_enter_marks, (final[f"Class {c}"], path)))
+        timer.run("exam.bulk_enter_marks", sheets)
+    timer.run("exam.find_exams", [(exams.find_exams, (c, "", "")) for c in classes])
+    timer.run("exam.view_report_card.cold", [(exams.view_report_card, (r["reg_no"],)) for r in picks])
+    timer.run("exam.view_report_card.warm", [(exams.view_report_card, (r["reg_no"],)) for r in picks])
+    timer.run("exam.class_result_summary", [(exams.class_result_summary, (final[f"Class {c}"],)) for c in classes])
+    timer.run("exam.exam_statistics", [(exams.exam_statistics, (final[f"Class {c}"],)) for c in classes])
+    timer.run("exam.progress_trends.declining", [(exams.progress_trends, ("3", ""))])
+    timer.run("exam.moderate_marks", [(exams.moderate_marks, (final[f"Class {c}"], "all", "zscore", 65, 12))
+                                      for c in classes])
+    timer.run("exam.view_report_card.moderated", [(exams.view_report_card, (r["reg_no"],)) for r in picks])
+    timer.run("exam.snapshot", [(exams.snapshot, ())])
+
+    # fees: an installment plan per class and two payments per student
+    timer.run("fees.set_fee_schedule", [(fees.set_fee_schedule, (c, 2, (today - timedelta(days=75)).strftime("%Y-%m-%d"),
+                                                                 6000, (today + timedelta(days=60)).strftime("%Y-%m-%d"),
+                                                                 6000)) for c in classes])
+    timer.run("fees.record_payment", [(fees.record_payment, (r["reg_no"], rnd.randint(500, 6000), rnd.choice(METHODS)))
+                                      for r in rows for _ in range(2)])
+    timer.run("fees.view_pending_fees", [(fees.view_pending_fees, (r["reg_no"],)) for r in picks])
+    timer.run("fees.view_payment_history", [(fees.view_payment_history, (r["reg_no"],)) for r in picks])
+    timer.run("fees.fee_report_for_class", [(fees.fee_report_for_class, (c,)) for c in classes])
+    timer.run("fees.fee_dashboard", [(fees.fee_dashboard, ())])
+    timer.run("fees.snapshot", [(fees.snapshot, ())])
+    timer.run("fees.aging_report", [(fees.aging_report, (20,))])
+    timer.run("fees.collections_report.today", [(fees.collections_report, ("2",))])
+    day = today.strftime("%Y-%m-%d")
+    timer.run("fees.collections_report.range", [(fees.collections_report, ("1", day, day))])
+
+    # queries: each narrowed by a different index, then one no index can answer
+    query = system.query_manager
+    timer.run("query.query_students.indexed", [(query.query_students, (where,)) for where in (
+        "gender = female and grade = 10 and age between 15 16 and due > 0",
+        "due > 8000 and grade < 4", "age <= 8 and average >= 60", f"reg_no = {picks[0]['reg_no']}")])
+    timer.run("query.query_students.scan", [(query.query_students, ("name contains an and overdue > 0",))])
+
+    # removals last, so they run against the fully loaded school
+    timer.run("student.remove_student", [(students.remove_student, (r["reg_no"], "y"))
+                                         for r in {r["reg_no"]: r for r in picks}.values()])
+    return timer.results
+
+# -------------------- HTTP load --------------------
+# Drives a `Final_SM.py --serve` subprocess over keep-alive connections, each
+# sending requests `pipeline` at a time. Latency is measured per request, from
+# writing its batch to reading its full response.
+
+def http_request(method, path, args=None):
+    body = json.dumps(args).encode() if args is not None else b""
+    return f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    headers = {}
+    for line in head.decode("latin-1").split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        if value:
+            headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding") == "chunked":
+        body = bytearray()
+        while True:
+            size = int(await reader.readline(), 16)
+            chunk = await reader.readexactly(size + 2)
+            if not size:
+                break
+            body += chunk[:-2]
+    else:
+        body = await reader.readexactly(int(headers.get("content-length", "0")))
+    return int(head[9:12]), bytes(body)
+
+async def http_client(port, requests, pipeline, latencies, errors):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for i in range(0, len(requests), pipeline):
+        batch = requests[i:i + pipeline]
+        start = time.perf_counter()
+        writer.write(b"".join(batch))
+        for _ in batch:
+            status, _ = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors[status] = errors.get(status, 0) + 1
+    writer.close()
+
+async def http_phase(port, requests, connections, pipeline):
+    latencies, errors = [], {}
+    # round-robin the requests over the connections, which all run at once
+    start = time.perf_counter()
+    await asyncio.gather(*(http_client(port, requests[c::connections], pipeline, latencies, errors)
+                           for c in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def pct(p):
+        return round(1000 * latencies[min(int(p / 100 * len(latencies)), len(latencies) - 1)], 3) if latencies else None
+
+    return {"ops": len(requests), "total_s": round(elapsed, 6),
+            "mean_us": round(1e6 * sum(latencies) / max(len(latencies), 1), 3),
+            "ops_per_s": round(len(requests) / elapsed, 1) if elapsed else None,
+            "p50_ms": pct(50), "p99_ms": pct(99), "max_ms": pct(100), "errors": errors}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def run_http(n, seed, n_requests, connections, pipeline):
+    rnd = random.Random(seed)
+    port = free_port()
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Final_SM.py"),
+                               "--serve", "--port", str(port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        else:
+            raise RuntimeError("API server did not start")
+        rows = list(student_rows(n, rnd))
+        subjects = sm.StudentManager.DEFAULT_SUBJECTS
+        today = datetime.now().strftime("%Y-%m-%d")
+
+        def phase(requests, connections=connections):
+            return asyncio.run(http_phase(port, requests, connections, pipeline))
+
+        results = {}
+        results["http.add_student"] = phase([http_request("POST", "/ops/add_student", r) for r in rows])
+        # one exam per class, created in class order so exam i + 1 belongs to Class i + 1
+        phase([http_request("POST", "/ops/add_exam", {"name": "Final", "grade": c, "date": today})
+               for c in range(1, 13)], connections=1)
+        results["http.enter_marks"] = phase([http_request("POST", "/ops/enter_marks", {
+            "eid": f"E{r['grade']:03d}", "reg_no": r["reg_no"],
+            "marks": {subj: rnd.randint(20, 100) for subj in subjects}}) for r in rows])
+        mixed = []
+        for _ in range(n_requests):
+            r = rnd.choice(rows)
+            kind = rnd.random()
+            if kind < 0.35:
+                mixed.append(http_request("GET", f"/students/{r['reg_no']}"))
+            elif kind < 0.65:
+                mixed.append(http_request("GET", f"/students/{r['reg_no']}/fees"))
+            elif kind < 0.85:
+                mixed.append(http_request("GET", f"/students/{r['reg_no']}/report-card"))
+            else:
+                mixed.append(http_request("POST", "/ops/record_payment",
+                                          {"reg_no": r["reg_no"], "amount": rnd.randint(500, 6000),
+                                           "method": rnd.choice(METHODS)}))
+        results["http.mixed"] = phase(mixed)
+        results["http.list_students.streamed"] = phase([http_request("GET", "/students")] * 20)
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+
+# -------------------- District shards --------------------
+# Loads `schools` schools (n students in total) through a District router with
+# `shards` worker processes, keeping every shard's queue full, then times the
+# scatter-gather district reports.
+
+def district_phase(district, calls):
+    # calls: [(school id, op, args)], all submitted before any result is awaited
+    start = time.perf_counter()
+    futures = [district.submit(*c) for c in calls]
+    errors = {}
+    for fut in futures:
+        try:
+            fut.result()
+        except sm.SchoolError as e:
+            errors[str(e)] = errors.get(str(e), 0) + 1
+    elapsed = time.perf_counter() - start
+    return {"ops": len(calls), "total_s": round(elapsed, 6), "mean_us": round(1e6 * elapsed / max(len(calls), 1), 3),
+            "ops_per_s": round(len(calls) / elapsed, 1) if elapsed else None, "errors": errors}
+
+def district_report(report, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        report()
+    elapsed = time.perf_counter() - start
+    return {"ops": repeat, "total_s": round(elapsed, 6), "mean_us": round(1e6 * elapsed / repeat, 3),
+            "ops_per_s": round(repeat / elapsed, 1) if elapsed else None, "errors": {}}
+
+def run_district(n, seed, n_schools, shards):
+    rnd = random.Random(seed)
+    schools = [f"SCH{i:04d}" for i in range(n_schools)]
+    rows = [(schools[i % n_schools], r) for i, r in enumerate(student_rows(n, rnd))]
+    subjects = sm.StudentManager.DEFAULT_SUBJECTS
+    today = datetime.now().strftime("%Y-%m-%d")
+    district = sm.District(shards)
+    try:
+        results = {}
+        results["district.add_school"] = district_phase(district, [(sid, "add_school", {}) for sid in schools])
+        results["district.add_student"] = district_phase(district, [(sid, "add_student", r) for sid, r in rows])
+        # per school, exam i + 1 belongs to Class i + 1
+        results["district.add_exam"] = district_phase(district, [
+            (sid, "add_exam", {"name": "Final", "grade": c, "date": today}) for sid in schools for c in range(1, 13)])
+        results["district.enter_marks"] = district_phase(district, [
+            (sid, "enter_marks", {"eid": f"E{r['grade']:03d}", "reg_no": r["reg_no"],
+                                  "marks": {subj: rnd.randint(20, 100) for subj in subjects}}) for sid, r in rows])
+        results["district.record_payment"] = district_phase(district, [
+            (sid, "record_payment", {"reg_no": r["reg_no"], "amount": rnd.randint(500, 6000),
+                                     "method": rnd.choice(METHODS)}) for sid, r in rows])
+        results["district.district_fees"] = district_report(district.district_fees, 10)
+        results["district.district_pass_rates"] = district_report(district.district_pass_rates, 10)
+        return results
+    finally:
+        district.close()
+
+# -------------------- Concurrency stress --------------------
+# Threads share one SchoolManagementSystem and hammer its service methods with
+# a mix of reads and writes. School errors (a student removed by another
+# thread, say) are expected; any other exception is a failure, and so is any
+# broken invariant between the managers' indexes, totals and ledger, whether
+# in a snapshot taken mid-run or in the live managers afterwards.
+
+def stress_ops(system, rnd, rows, counter):
+    students, teachers = system.student_manager, system.teacher_manager
+    exams, fees = system.exam_manager, system.fees_manager
+    subjects = sm.StudentManager.DEFAULT_SUBJECTS
+
+    def some_reg_no():
+        return rnd.choice(rows)["reg_no"]
+
+    def add_student():
+        i = next(counter)
+        students.create_student("Stress Student", f"X{i:07d}", rnd.randint(1, 12), 12, "Other",
+                                f"x{i}@school.example", f"97{i:08d}")
+
+    def record_marks():
+        reg_no = some_reg_no()
+        student = students.require_student(reg_no)
+        eid = f"E{int(student['grade'].split()[1]):03d}"
+        exams.record_marks(eid, reg_no, {subj: rnd.randint(0, 100) for subj in rnd.sample(subjects, 3)})
+
+    def reverse_payment():
+        fees.undo_payment(some_reg_no(), 1)
+
+    def snapshots():
+        # taken mid-stream, a snapshot must still satisfy every invariant
+        exam_snap = exams.snapshot()
+        problems = check_invariants(SimpleNamespace(student_manager=exam_snap.student_manager, teacher_manager=teachers,
+                                                    exam_manager=exam_snap, fees_manager=fees.snapshot()))
+        if problems:
+            raise AssertionError("snapshot: " + "; ".join(problems))
+
+    # (name, weight, is_write, callable)
+    return [
+        ("add_student", 3, True, add_student),
+        ("remove_student", 2, True, lambda: students.delete_student(some_reg_no())),
+        ("edit_student", 3, True, lambda: students.edit_student(some_reg_no(), "phone", f"96{rnd.randint(0, 10**8):08d}")),
+        ("move_student", 1, True, lambda: students.edit_student(some_reg_no(), "grade", rnd.randint(1, 12))),
+        ("rename_student", 1, True, lambda: students.edit_student(some_reg_no(), "reg_no", f"Y{next(counter):07d}")),
+        ("add_teacher", 1, True, lambda: teachers.create_teacher("Stress Teacher", rnd.randint(1, 30), "B.Ed")),
+        ("record_marks", 10, True, record_marks),
+        ("add_payment", 10, True, lambda: fees.add_payment(some_reg_no(), rnd.randint(100, 2000), rnd.choice(METHODS))),
+        ("reverse_payment", 2, True, reverse_payment),
+        ("set_class_fee", 1, True, lambda: fees.set_class_fee(rnd.randint(1, 12), rnd.randint(8000, 12000))),
+        ("report_card", 10, False, lambda: exams.student_report(some_reg_no())),
+        ("student_fees", 10, False, lambda: fees.student_fees(some_reg_no())),
+        ("class_summary", 3, False, lambda: exams.class_summary(f"E{rnd.randint(1, 12):03d}")),
+        ("exam_stats", 3, False, lambda: exams.exam_stats(f"E{rnd.randint(1, 12):03d}")),
+        ("top_movers", 1, False, lambda: exams.top_movers()),
+        ("fee_summary", 1, False, fees.fee_summary),
+        ("snapshots", 1, False, snapshots),
+        ("class_fees", 3, False, lambda: fees.class_fees(rnd.randint(1, 12))),
+        ("defaulters", 1, False, lambda: fees.defaulters(20)),
+        ("collections", 3, False, lambda: fees.collections_by_method(datetime(2000, 1, 1), datetime(2100, 1, 1))),
+        ("find_students", 2, False, lambda: students.find_students("kumar")),
+        ("class_counts", 2, False, students.class_counts),
+        ("query_students", 2, False, lambda: system.query_manager.query(rnd.choice(STRESS_QUERIES))),
+    ]
+
+STRESS_QUERIES = ("gender = female and grade = 10 and age between 12 16 and due > 0", "due > 9000 and grade = 3",
+                  "age >= 15 and exams > 0", "grade between 1 2 and paid > 0")
+
+def check_invariants(system):
+    students, teachers = system.student_manager, system.teacher_manager
+    exams, fees = system.exam_manager, system.fees_manager
+    problems = []
+    if len(students.students) != len(students._by_reg) or \
+            any(students._by_reg.get(s["reg_no"].lower()) is not s for s in students.students):
+        problems.append("student list and reg_no index disagree")
+    if sum(map(len, students._by_grade.values())) != len(students.students) or \
+            sum(map(len, students._by_gender.values())) != len(students.students) or \
+            any(students._by_grade[s["grade"]].get(s["reg_no"].lower()) is not s or
+                students._by_gender[s["gender"]].get(s["reg_no"].lower()) is not s for s in students.students) or \
+            students._ages != sorted((s["age"], s["reg_no"].lower()) for s in students.students):
+        problems.append("student list and query indexes disagree")
+    ids = [t["id"] for t in teachers.teachers]
+    if len(ids) != len(set(ids)):
+        problems.append("duplicate teacher ids")
+    if len(exams._exam_dates) != len(exams.exams) or len(exams._exams_by_id) != len(exams.exams):
+        problems.append("exam indexes out of step with the exam list")
+    # each manager against its own student list (a snapshot carries the one it was taken with)
+    enrolled = {s["reg_no"] for s in exams.student_manager.students}
+    if any(reg_no not in enrolled for records in exams.marks.values() for reg_no in records) or \
+            any(reg_no not in enrolled for reg_no in exams.student_exams):
+        problems.append("marks left behind for a student who was removed or renamed")
+    enrolled = {s["reg_no"] for s in fees.student_manager.students}
+    if any(reg_no not in enrolled for index in (fees.payments, fees.balances) for reg_no in index):
+        problems.append("fee records left behind for a student who was removed or renamed")
+    for (eid, subj), col in exams.analytics.scores.items():
+        marked = [d[subj] for d in exams.marks.get(eid, {}).values() if subj in d]
+        if sorted(marked) != col:
+            problems.append(f"analytics column {eid}/{subj} out of step with marks")
+            break
+    for reg_no, bal in fees.balances.items():
+        live = sum(p["amount"] for p in fees.payments.get(reg_no, []) if not p.get("reversed"))
+        if live != bal["paid"] or sum(bal["by_method"].values()) != bal["paid"]:
+            problems.append(f"balance of {reg_no} out of step with its payments")
+            break
+    paid = sum(bal["paid"] for bal in fees.balances.values()) + fees.departed_paid
+    if fees._ledger_prefix[-1] != paid or len(fees._ledger_prefix) != len(fees.ledger) + 1:
+        problems.append(f"ledger total {fees._ledger_prefix[-1]} != balances plus departed {paid}")
+    if fees._due_index != sorted((fees.balance(s)["due"], s["reg_no"]) for s in fees.student_manager.students):
+        problems.append("due index out of step with balances")
+    if fees.ledger_times != sorted(fees.ledger_times):
+        problems.append("ledger out of time order")
+    return problems
+
+def run_stress(n, seed, threads, duration):
+    rnd = random.Random(seed)
+    system = sm.SchoolManagementSystem()
+    rows = list(student_rows(n, rnd))
+    for r in rows:
+        system.student_manager.create_student(**r)
+    today = datetime.now().strftime("%Y-%m-%d")
+    for c in range(1, 13):
+        system.exam_manager.create_exam("Final", c, "all", today)  # E001..E012, one per class
+    counter = iter(range(10**7))
+    stop = threading.Event()
+    stats = {}
+    failures = []
+    stats_lock = threading.Lock()
+
+    def worker(k):
+        wrnd = random.Random(seed * 1000 + k)
+        ops = stress_ops(system, wrnd, rows, counter)
+        weights = [w for _, w, _, _ in ops]
+        local = {}
+        while not stop.is_set():
+            name, _, _, fn = wrnd.choices(ops, weights)[0]
+            start = time.perf_counter()
+            try:
+                fn()
+                outcome = "ok"
+            except sm.SchoolError:
+                outcome = "rejected"
+            except Exception as e:
+                outcome = "failed"
+                failures.append(f"{name}: {e!r}")
+            st = local.setdefault(name, {"ok": 0, "rejected": 0, "failed": 0, "max_ms": 0.0})
+            st[outcome] += 1
+            st["max_ms"] = max(st["max_ms"], 1000 * (time.perf_counter() - start))
+        with stats_lock:
+            for name, st in local.items():
+                agg = stats.setdefault(name, {"ok": 0, "rejected": 0, "failed": 0, "max_ms": 0.0})
+                for key in ("ok", "rejected", "failed"):
+                    agg[key] += st[key]
+                agg["max_ms"] = round(max(agg["max_ms"], st["max_ms"]), 3)
+
+    # switch threads far more often than the default 5 ms, to shake out races
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        pool = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+        for t in pool:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in pool:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    results = {f"stress.{name}": dict(st, ops=st["ok"] + st["rejected"] + st["failed"])
+               for name, st in sorted(stats.items())}
+    return results, failures[:20], check_invariants(system)
+
+# -------------------- Reporting --------------------
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for scale, ops in results.items():
+        for name, res in ops.items():
+            base = baseline.get("results", {}).get(scale, {}).get(name)
+            if base and base["mean_us"] and res["mean_us"] > base["mean_us"] * (1 + threshold / 100):
+                regressions.append((scale, name, base["mean_us"], res["mean_us"]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the School Management System managers.")
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="comma-separated student counts, e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sample", type=int, default=200, help="students used for per-student operations")
+    parser.add_argument("--out", help="write JSON results to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare mean per-op times against")
+    parser.add_argument("--threshold", type=float, default=20.0, help="regression threshold in percent")
+    parser.add_argument("--http", action="store_true", help="load-test the HTTP API server instead of the managers")
+    parser.add_argument("--requests", type=int, default=20000, help="mixed requests per --http scale")
+    parser.add_argument("--connections", type=int, default=8, help="concurrent keep-alive connections for --http")
+    parser.add_argument("--pipeline", type=int, default=4, help="requests in flight per connection for --http")
+    parser.add_argument("--district", action="store_true", help="load a sharded multi-school district instead")
+    parser.add_argument("--schools", type=int, default=300, help="schools sharing the --sizes students for --district")
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1, help="worker processes for --district")
+    parser.add_argument("--stress", action="store_true", help="run the multi-threaded consistency stress test")
+    parser.add_argument("--threads", type=int, default=8, help="worker threads for --stress")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per --stress scale")
+    args = parser.parse_args(argv)
+
+    if args.stress:
+        ok = True
+        for n in [int(x) for x in args.sizes.split(",") if x.strip()]:
+            print(f"Stressing scale {n} with {args.threads} threads for {args.duration:g} s ...", file=sys.stderr)
+            results, failures, problems = run_stress(n, args.seed, args.threads, args.duration)
+            for name, res in results.items():
+                print(f"  {name:<28} {res['ops']:>8} ops  ok {res['ok']:>8}  rejected {res['rejected']:>6}"
+                      f"  failed {res['failed']:>4}  max {res['max_ms']:>8.1f} ms", file=sys.stderr)
+            for line in failures + problems:
+                print(f"FAIL {line}", file=sys.stderr)
+            ok = ok and not failures and not problems
+        print("stress test passed" if ok else "stress test FAILED", file=sys.stderr)
+        return 0 if ok else 1
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    report = {"meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "python": sys.version.split()[0],
+                       "platform": platform.platform(), "seed": args.seed, "sample": args.sample},
+              "results": {}}
+    for n in sizes:
+        print(f"Running scale {n} ...", file=sys.stderr)
+        if args.http:
+            report["results"][str(n)] = run_http(n, args.seed, args.requests, args.connections, args.pipeline)
+        elif args.district:
+            report["results"][str(n)] = run_district(n, args.seed, args.schools, args.shards)
+        else:
+            with headless():
+                report["results"][str(n)] = run_scale(n, args.seed, args.sample)
+        for name, res in report["results"][str(n)].items():
+            line = f"  {name:<36} {res['ops']:>9} ops  {res['mean_us']:>12.1f} us/op  {res['total_s']:>9.3f} s"
+            if "p99_ms" in res:
+                line += f"  {res['ops_per_s']:>9.0f} req/s  p50 {res['p50_ms']:.2f} ms  p99 {res['p99_ms']:.2f} ms"
+            if res.get("errors"):
+                line += f"  errors {res['errors']}"
+            print(line, file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report["results"], json.load(f), args.threshold)
+        for scale, name, before, after in regressions:
+            print(f"REGRESSION {scale} {name}: {before:.1f} -> {after:.1f} us/op", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
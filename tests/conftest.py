@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import Final_SM as sm
+
+STUDENTS = [
+    # name, reg_no, grade, age, gender
+    ("Asha", "A1", 10, 15, "Female"),
+    ("Ravi", "A2", 10, 16, "Male"),
+    ("Meena", "A3", 10, 17, "Female"),
+    ("Kumar", "B1", 9, 14, "Male"),
+    ("Divya", "B2", 9, 15, "Female"),
+]
+
+
+@pytest.fixture
+def school():
+    system = sm.SchoolManagementSystem()
+    for name, reg_no, grade, age, gender in STUDENTS:
+        system.student_manager.create_student(name, reg_no, grade, age, gender,
+                                              f"{reg_no.lower()}@school.example", "9876543210")
+    return system
@@ -0,0 +1,112 @@
+import http.client
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+import Final_SM as sm
+
+
+@pytest.fixture
+def server(school):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    srv = sm.SchoolServer(school, port=port)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return port
+
+
+def request(port, method, path, args=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        conn.request(method, path, body=json.dumps(args) if args is not None else None)
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read())
+    finally:
+        conn.close()
+
+
+def test_listings_are_streamed(server):
+    status, body = request(server, "GET", "/students")
+    assert status == 200 and [s["reg_no"] for s in body["result"]] == ["A1", "A2", "A3", "B1", "B2"]
+    status, body = request(server, "GET", "/students?where=grade%20%3D%209")
+    assert [s["reg_no"] for s in body["result"]] == ["B1", "B2"]
+
+
+def test_errors_map_to_status_codes(server):
+    assert request(server, "GET", "/students/NOPE")[0] == 404
+    assert request(server, "GET", "/nowhere")[0] == 404
+    assert request(server, "POST", "/ops/record_payment", {"reg_no": "A1", "amount": "x"})[0] == 400
+    assert request(server, "DELETE", "/students/A1")[0] == 405
+
+
+def test_ops_update_the_shared_school(server, school):
+    status, body = request(server, "POST", "/ops/record_payment", {"reg_no": "a1", "amount": 2500})
+    assert status == 200 and body["result"]["amount"] == 2500
+    status, body = request(server, "GET", "/students/A1/fees")
+    assert body["result"]["paid"] == 2500
+    assert school.fees_manager.student_fees("A1")["paid"] == 2500
+
+
+@pytest.mark.parametrize("op, args", [
+    ("reconcile_statement", {"path": "/etc/hostname", "exceptions_path": "victim.txt"}),
+    ("load_marks_csv", {"eid": "E001", "path": "/etc/passwd"}),
+])
+def test_file_path_ops_are_not_served(server, school, tmp_path, op, args):
+    if "exceptions_path" in args:
+        victim = tmp_path / args["exceptions_path"]
+        victim.write_text("keep me")
+        args = dict(args, exceptions_path=str(victim))
+    status, body = request(server, "POST", f"/ops/{op}", args)
+    assert status == 404 and "batch mode" in body["error"]
+    if "exceptions_path" in args:
+        assert victim.read_text() == "keep me"
+
+
+def test_slow_call_does_not_stall_other_clients(server, school):
+    summary = school.fees_manager.fee_summary
+
+    def slow_summary():
+        time.sleep(1.5)
+        return summary()
+
+    school.fees_manager.fee_summary = slow_summary
+    slow = threading.Thread(target=request, args=(server, "GET", "/fees/summary"))
+    slow.start()
+    time.sleep(0.2)
+    start = time.perf_counter()
+    status, _ = request(server, "GET", "/health")
+    assert status == 200 and time.perf_counter() - start < 1.0
+    slow.join()
+
+
+def raw_get(port, path, version, headers=""):
+    # the whole response, read until the server closes the connection
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as sock:
+        sock.sendall(f"GET {path} {version}\r\n{headers}\r\n".encode())
+        data = b""
+        while chunk := sock.recv(65536):
+            data += chunk
+    head, _, body = data.partition(b"\r\n\r\n")
+    return head.decode("latin-1").lower(), body
+
+
+@pytest.mark.parametrize("headers", ["", "Connection: keep-alive\r\n"])
+def test_http10_listing_is_not_chunked(server, headers):
+    head, body = raw_get(server, "/students", "HTTP/1.0", headers)
+    assert "transfer-encoding" not in head and "connection: close" in head
+    assert [s["reg_no"] for s in json.loads(body)["result"]] == ["A1", "A2", "A3", "B1", "B2"]
+
+
+def test_http11_listing_is_chunked(server):
+    head, body = raw_get(server, "/students", "HTTP/1.1", "Connection: close\r\n")
+    assert "transfer-encoding: chunked" in head and body.endswith(b"0\r\n\r\n")
@@ -0,0 +1,78 @@
+import io
+import json
+
+import pytest
+
+import Final_SM as sm
+
+TEACHER = {"name": "Lakshmi", "experience": 4, "qualifications": "MSc"}
+
+
+def commands(school=None):
+    cmds = [{"op": "add_teacher", "args": TEACHER},
+            {"op": "add_timetable", "args": {"class_name": 10, "days": 5}},  # AttributeError in set_timetable
+            {"op": "add_teacher", "args": dict(TEACHER, experience="four")},
+            {"op": "add_teacher", "args": TEACHER}]
+    if school:
+        cmds = [{"op": "add_school", "school": school}] + [dict(c, school=school) for c in cmds]
+    return [json.dumps(c) for c in cmds]
+
+
+def run(runner, cmds):
+    log = io.StringIO()
+    counts = runner.run(cmds, log)
+    return counts, [json.loads(line) for line in log.getvalue().splitlines()]
+
+
+def check_log(entries):
+    assert [e["ok"] for e in entries] == [True, False, False, True]
+    assert entries[1]["error"].startswith("AttributeError: ")
+    assert entries[2]["error"] == "Experience must be numeric."
+
+
+def test_unexpected_error_is_logged_and_the_batch_goes_on():
+    counts, entries = run(sm.BatchRunner(sm.SchoolManagementSystem()), commands())
+    assert counts == {"ok": 2, "error": 2}
+    check_log(entries)
+
+
+@pytest.fixture
+def district():
+    district = sm.District(2)
+    try:
+        yield district
+    finally:
+        district.close()
+
+
+def test_district_logs_whatever_a_shard_raised(district):
+    counts, entries = run(district, commands("GHS01"))
+    assert counts == {"ok": 3, "error": 2}
+    check_log(entries[1:])
+    assert entries[-1]["result"]["id"] == "T002"
+
+
+def test_close_after_a_worker_died(district):
+    district._procs[0].kill()
+    district._procs[0].join()
+    district.close()
+    assert not any(proc.is_alive() for proc in district._procs)
+
+
+def test_refused_payment_batch_fails_only_the_bad_payments(school, monkeypatch):
+    post = sm.FeesManager._post_payments_locked
+
+    def refuse_a2(self, items):
+        if any(reg_no == "A2" for reg_no, _ in items):
+            raise RuntimeError("ledger unavailable")
+        post(self, items)
+
+    monkeypatch.setattr(sm.FeesManager, "_post_payments_locked", refuse_a2)
+    cmds = [json.dumps({"op": "record_payment", "args": {"reg_no": reg_no, "amount": 100}})
+            for reg_no in ("A1", "A2", "NOPE", "B1")]
+    cmds.append(json.dumps({"op": "add_teacher", "args": TEACHER}))
+    counts, entries = run(sm.BatchRunner(school), cmds)
+    assert counts == {"ok": 3, "error": 2}
+    assert [e["ok"] for e in entries] == [True, False, False, True, True]
+    assert entries[1]["error"] == "RuntimeError: ledger unavailable"
+    assert [school.fees_manager.student_fees(r)["paid"] for r in ("A1", "A2", "B1")] == [100, 0, 100]
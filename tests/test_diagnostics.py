@@ -0,0 +1,77 @@
+import builtins
+
+import Final_SM as sm
+
+
+def test_timings_cover_service_calls_not_prompts(school, monkeypatch):
+    inst = school.instrumentation
+    inst.enable()
+    answers = iter(["S9", "Kid", "Class 3"])
+
+    def slow_input(prompt=""):
+        import time
+        time.sleep(0.2)  # a person typing
+        return next(answers)
+
+    monkeypatch.setattr(builtins, "input", slow_input)
+    school.student_manager.search_student()  # prompts, then calls find_students
+    school.student_manager.create_student("New Kid", "N1", 3, 8, "male", "n1@school.example", "9876543210")
+    actions = inst.snapshot()["actions"]
+    assert actions["student_manager.find_students"]["calls"] == 1
+    assert actions["student_manager.find_students"]["max_ms"] < 100
+    assert actions["student_manager.create_student"]["data_size_max"] == 6
+    assert "student_manager.search_student" not in actions
+
+
+def test_errors_are_counted_and_disable_unwraps(school):
+    inst = school.instrumentation
+    inst.enable()
+    try:
+        school.fees_manager.add_payment("NOPE", 10)
+    except sm.NotFoundError:
+        pass
+    assert inst.snapshot()["actions"]["fees_manager.add_payment"]["errors"] == 1
+    inst.disable()
+    assert "add_payment" not in vars(school.fees_manager)
+
+
+def test_exam_data_size_tracks_mark_records(school):
+    exams = school.exam_manager
+    marks = {subj: 60 for subj in sm.StudentManager.DEFAULT_SUBJECTS}
+    e1 = exams.create_exam("Midterm", 10, "all", "2024-01-10")
+    e2 = exams.create_exam("Midterm", 9, "all", "2024-01-10")
+    for reg_no in ("A1", "A2", "A3"):
+        exams.record_marks(e1["id"], reg_no, marks)
+    exams.record_marks(e1["id"], "A1", marks)  # an update, not a new record
+    exams.record_marks(e2["id"], "B1", marks)
+    assert school.data_size("exam_manager") == 4
+    school.student_manager.delete_student("A2")
+    school.student_manager.edit_student("A3", "reg_no", "Z3")
+    assert school.data_size("exam_manager") == 3
+    exams.delete_exam(e1["id"])
+    assert school.data_size("exam_manager") == 1
+    assert school.data_size("exam_manager") == sum(len(r) for r in exams.marks.values())
+
+
+def test_snapshots_run_their_own_methods_while_timing(school):
+    school.instrumentation.enable()
+    exams = school.exam_manager
+    eid = exams.create_exam("Midterm", 10, "Maths", "2024-01-10")["id"]
+    exams.record_marks(eid, "A1", {"Maths": 40})
+    snap = exams.snapshot()
+    exams.record_marks(eid, "A2", {"Maths": 90})
+    assert "exam_stats" not in vars(snap) and "class_summary" not in vars(snap)
+    assert snap.class_summary(eid)["toppers"] == [("A1", 40)]
+    assert exams.snapshot().exam_stats(eid) != snap.exam_stats(eid)
+
+
+def test_menu_reads_are_timed(school, monkeypatch):
+    inst = school.instrumentation
+    inst.enable()
+    answers = iter(["A1", "10"])
+    monkeypatch.setattr(builtins, "input", lambda prompt="": next(answers))
+    school.exam_manager.view_report_card()
+    school.student_manager.list_students_by_class()
+    actions = inst.snapshot()["actions"]
+    assert actions["exam_manager.report_card"]["calls"] == 1
+    assert actions["student_manager.students_in_class"]["calls"] >= 1
@@ -0,0 +1,29 @@
+import pytest
+
+import Final_SM as sm
+
+
+def test_new_student_reaches_the_fee_index_at_once(school):
+    school.student_manager.create_student("Nila", "C1", 8, 13, "Female", "c1@school.example", "9876543210")
+    assert not school.student_manager.events.pending()
+    assert "C1" in school.fees_manager.due_scan(">", 0)
+
+
+@pytest.mark.parametrize("change", [
+    lambda students: students.delete_student("A1"),
+    lambda students: students.edit_student("A1", "reg_no", "A9"),
+])
+def test_marks_for_a_student_who_left_while_checking_are_refused(school, monkeypatch, change):
+    exams = school.exam_manager
+    eid = exams.create_exam("Unit Test", 10, "Maths")["id"]
+    eligible = exams.eligible_student
+
+    def eligible_then_changed(exam, reg_no):
+        student = eligible(exam, reg_no)
+        change(school.student_manager)
+        return student
+
+    monkeypatch.setattr(exams, "eligible_student", eligible_then_changed)
+    with pytest.raises(sm.NotFoundError):
+        exams.record_marks(eid, "A1", {"Maths": 70})
+    assert "A1" not in exams.marks[eid] and "A1" not in exams.student_exams
@@ -0,0 +1,26 @@
+import Final_SM as sm
+
+
+def add_exams(exams, n):
+    # created out of date order; ids follow creation
+    days = [(7 * i) % n + 1 for i in range(n)]
+    return [exams.create_exam(f"Test {i}", 10, "Maths", f"2024-01-{day:02d}")["id"] for i, day in enumerate(days)]
+
+
+def test_recent_exams_is_a_date_window(school):
+    exams = school.exam_manager
+    add_exams(exams, 20)
+    recent, older = exams.recent_exams(5)
+    assert [e["date"] for e in recent] == [f"2024-01-{day}" for day in range(16, 21)]
+    assert older == 15
+    assert exams.recent_exams(50) == (exams.exams_between(), 0)
+
+
+def test_pickers_list_only_recent_exams(school, monkeypatch, capsys):
+    exams = school.exam_manager
+    add_exams(exams, sm.ExamManager.RECENT_EXAMS + 3)
+    monkeypatch.setattr("builtins.input", lambda prompt="": "NOPE")
+    exams.class_result_summary()
+    out = capsys.readouterr().out
+    assert out.count(" | Class 10 | ") == sm.ExamManager.RECENT_EXAMS
+    assert "2024-01-01" not in out and "3 older exams not shown" in out
@@ -0,0 +1,57 @@
+import pytest
+
+import Final_SM as sm
+
+
+def test_payment_history_resolves_the_student_like_other_readers(school):
+    fees = school.fees_manager
+    fees.add_payment("A1", 100, "Cash", "2024-04-01")
+    fees.add_payment("a1", 250, "UPI", "2024-04-02")
+    assert fees.student_fees("a1")["paid"] == 350
+    assert [p["amount"] for p in fees.payment_history("a1")] == [100, 250]
+    assert [p["amount"] for p in fees.payment_history(" A1 ")] == [100, 250]
+    assert fees.payment_history("A2") == []
+
+
+def test_payment_history_of_unknown_student(school):
+    with pytest.raises(sm.NotFoundError):
+        school.fees_manager.payment_history("NOPE")
+
+
+def test_reversed_payment_stays_in_history(school):
+    fees = school.fees_manager
+    fees.add_payment("A1", 100)
+    fees.undo_payment("a1", 1)
+    (pay,) = fees.payment_history("A1")
+    assert pay["reversed"] and fees.student_fees("A1")["paid"] == 0
+
+
+def test_payment_dates_are_local_and_normalised(school):
+    fees = school.fees_manager
+    assert fees.add_payment("A1", 5, date="2024-01-04")["date"] == "2024-01-04 00:00:00"
+    assert fees.add_payment("A1", 5, date="2024-01-04T10:00:00")["date"] == "2024-01-04 10:00:00"
+    for bad in ("2024-01-04T10:00:00+05:30", "04/01/2024", "soon"):
+        with pytest.raises(sm.ValidationError):
+            fees.add_payment("A1", 7, date=bad)
+    assert fees.student_fees("A1")["paid"] == 10
+    assert fees.student_fees("A1")["last_payment"] == "2024-01-04 10:00:00"
+
+
+def test_posting_checks_every_date_before_changing_anything(school):
+    fees = school.fees_manager
+    good = fees.check_payment("A1", 5)
+    bad = ("A2", dict(good[1], date="2024-01-04T10:00:00+05:30"))
+    with pytest.raises(sm.ValidationError):
+        fees._post_payments([good, bad])
+    assert fees.payment_history("A1") == [] and fees.student_fees("A1")["paid"] == 0
+    assert fees.collected_between(sm.datetime(2000, 1, 1), sm.datetime(2100, 1, 1)) == 0
+
+
+def test_monthly_collections_stay_inside_the_range(school):
+    fees = school.fees_manager
+    for date in ("2024-01-10", "2024-01-20", "2024-02-15", "2024-04-05", "2024-04-20"):
+        fees.add_payment("A1", 100, date=date)
+    start, end = sm.datetime(2024, 1, 15), sm.datetime(2024, 4, 10)
+    months = fees.monthly_collections(start, end)
+    assert [(m.month, amt) for m, amt in months] == [(1, 100), (2, 100), (3, 0), (4, 100)]
+    assert sum(amt for _, amt in months) == fees.collected_between(start, end + sm.timedelta(days=1))
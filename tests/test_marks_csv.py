@@ -0,0 +1,19 @@
+import Final_SM as sm
+
+
+def test_every_row_is_loaded_or_reported(school, tmp_path):
+    exams = school.exam_manager
+    eid = exams.create_exam("Midterm", 10, "Maths,English", "2024-01-10")["id"]
+    sheet = tmp_path / "marks.csv"
+    sheet.write_text("reg_no,Maths,English\n"
+                     "A1,70,80\n"
+                     "A2, , \n"
+                     "A3,,55\n"
+                     "B1,60,60\n"
+                     ",,\n"
+                     "NOPE,50,50\n")
+    loaded, errors = exams.import_marks(eid, str(sheet))
+    assert loaded == 2
+    assert errors == [(3, "A2", "no marks given"), (5, "B1", "student not in Class 10"),
+                      (7, "NOPE", "student not found")]
+    assert sorted(exams.marks[eid]) == ["A1", "A3"]
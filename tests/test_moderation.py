@@ -0,0 +1,36 @@
+import pytest
+
+import Final_SM as sm
+
+
+@pytest.fixture
+def exam(school):
+    eid = school.exam_manager.create_exam("Midterm", 10, "Maths", "2024-01-10")["id"]
+    for reg_no, mark in (("A1", 40), ("A2", 60), ("A3", 80)):
+        school.exam_manager.record_marks(eid, reg_no, {"Maths": mark})
+    return eid
+
+
+@pytest.mark.parametrize("method, params", [
+    ("zscore", {"mean": "nan", "sd": 10}),
+    ("zscore", {"mean": 60, "sd": "inf"}),
+    ("zscore", {"mean": 60, "sd": -10}),
+    ("zscore", {"mean": 60, "sd": 0}),
+    ("linear", {"mean": 101}),
+    ("linear", {"mean": -1}),
+    ("cap", {"cap": -5}),
+    ("cap", {"cap": 150}),
+])
+def test_out_of_range_moderation_is_refused(school, exam, method, params):
+    with pytest.raises(sm.ValidationError):
+        school.exam_manager.set_moderation(exam, "all", method, **params)
+    assert exam not in school.exam_manager.moderation
+
+
+def test_valid_moderation_keeps_the_ranking(school, exam):
+    exams = school.exam_manager
+    exams.set_moderation(exam, "all", "zscore", mean="65", sd="12")
+    totals = dict(exams.class_summary(exam)["toppers"])
+    assert totals["A3"] > totals["A2"] > totals["A1"]
+    exams.set_moderation(exam, "Maths", "cap", cap=70)
+    assert max(dict(exams.class_summary(exam)["toppers"]).values()) == 70
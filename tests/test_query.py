@@ -0,0 +1,85 @@
+import pytest
+
+import Final_SM as sm
+
+
+def reg_nos(rows):
+    return [s["reg_no"] for s in rows]
+
+
+def brute_force(school, where):
+    query = school.query_manager
+    preds = query.parse(where)
+    rows = [s for s in school.student_manager.students if all(query._test(s, p) for p in preds)]
+    return sorted(reg_nos(rows), key=lambda r: (sm.class_number(school.student_manager.get_student(r)["grade"]), r))
+
+
+@pytest.fixture
+def paid_school(school):
+    school.fees_manager.add_payment("A2", 10000)
+    school.fees_manager.add_payment("B1", 4000)
+    return school
+
+
+@pytest.mark.parametrize("where", [
+    "gender = female and grade = 10 and age between 15 16 and due > 0",
+    "age between 15 and 16",
+    "grade between 9 10 and paid > 0",
+    "due > 5000 and grade < 10",
+    "due <= 6000",
+    "reg_no = a3",
+    "name contains a",
+    "gender != male",
+    "email missing",
+    "",
+])
+def test_results_match_a_full_scan(paid_school, where):
+    assert reg_nos(paid_school.query_manager.query(where)) == brute_force(paid_school, where)
+
+
+def test_planner_drives_from_the_smallest_index(paid_school):
+    plan = paid_school.query_manager.explain("gender = female and grade = 9 and age between 15 17")
+    assert plan["access"] == "index on grade" and plan["driver"] == "grade = Class 9"
+    assert [c["estimate"] for c in plan["considered"]] == [2, 3, 4]
+    assert plan["filters"] == ["gender = Female", "age between 15 and 17"]
+    assert (plan["examined"], plan["returned"]) == (2, 1)
+
+
+def test_unindexed_query_scans(paid_school):
+    plan = paid_school.query_manager.explain("name contains e")
+    assert plan["access"] == "full scan" and plan["examined"] == 5 and plan["considered"] == []
+
+
+def test_due_index_follows_payments_and_student_changes(paid_school):
+    school = paid_school
+    assert reg_nos(school.query_manager.query("due = 0")) == ["A2"]
+    school.fees_manager.add_payment("A1", 10000)
+    school.student_manager.edit_student("A2", "reg_no", "Z2")
+    school.student_manager.delete_student("A3")
+    school.fees_manager.set_class_fee(9, 4000)
+    assert reg_nos(school.query_manager.query("due = 0")) == ["B1", "A1", "Z2"]
+    assert school.query_manager.explain("due = 0")["access"] == "index on due"
+
+
+def test_negative_bounds_are_not_separators(paid_school):
+    # every due is >= 0, so -5..10 only holds the students who are fully paid
+    assert reg_nos(paid_school.query_manager.query("due between -5 10")) == ["A2"]
+    assert reg_nos(paid_school.query_manager.query("due between 5 10")) == []
+
+
+def test_exam_state_filters(school):
+    exams = school.exam_manager
+    exam = exams.create_exam("Final", 10, "all", "2024-03-10")
+    exams.record_marks(exam["id"], "A1", {subj: 80 for subj in sm.StudentManager.DEFAULT_SUBJECTS})
+    assert reg_nos(school.query_manager.query("average >= 75")) == ["A1"]
+    assert reg_nos(school.query_manager.query("grade = 10 and exams = 0")) == ["A2", "A3"]
+    assert reg_nos(school.query_manager.query("grade = 10 and average missing")) == ["A2", "A3"]
+
+
+@pytest.mark.parametrize("where", [
+    "age > nan", "due < inf", "paid between -inf 5", "height > 3", "age ~ 3", "name < 3",
+    "age between 3", "gender = robot", "grade = 13", "email missing now",
+])
+def test_bad_queries_raise_validation_errors(school, where):
+    with pytest.raises(sm.ValidationError):
+        school.query_manager.query(where)
@@ -0,0 +1,81 @@
+import csv
+
+import pytest
+
+
+def statement(tmp_path, rows):
+    path = tmp_path / "statement.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["date", "amount", "reference", "description", "reg_no"])
+        writer.writerows(rows)
+    return str(path)
+
+
+def reconcile(school, tmp_path, rows):
+    out = tmp_path / "exceptions.csv"
+    result = school.fees_manager.reconcile_statement_file(statement(tmp_path, rows), str(out))
+    with open(out, newline="", encoding="utf-8") as f:
+        exceptions = list(csv.reader(f))[1:]
+    return result, exceptions
+
+
+def paid(school, reg_no):
+    return school.fees_manager.student_fees(reg_no)["paid"]
+
+
+def test_match_by_reg_no_reference_and_amount(school, tmp_path):
+    school.fees_manager.add_payment("A2", 3000)  # A2 now owes 7000, everyone else 10000
+    result, exceptions = reconcile(school, tmp_path, [
+        ["2024-04-01", "10000", "T1", "fees", "a1"],
+        ["2024-04-01", "2000", "T2", "school fees for b1", ""],
+        ["2024-04-01", "7000", "T3", "", ""],
+    ])
+    assert (result["by_reg_no"], result["by_reference"], result["by_amount"]) == (1, 1, 1)
+    assert (paid(school, "A1"), paid(school, "B1"), paid(school, "A2")) == (10000, 2000, 10000)
+    assert exceptions == []
+
+
+def test_student_paid_off_earlier_in_the_statement_is_not_matched_by_amount(school, tmp_path):
+    for reg_no in ("A2", "A3", "B1", "B2"):
+        school.fees_manager.add_payment(reg_no, 10000)  # only A1 still owes anything
+    result, exceptions = reconcile(school, tmp_path, [
+        ["2024-04-01", "10000", "T1", "", "A1"],
+        ["2024-04-02", "10000", "XYZ", "unidentified", ""],
+    ])
+    assert result["posted"] == 1
+    assert paid(school, "A1") == 10000
+    assert [row[-1] for row in exceptions] == ["no matching student"]
+
+
+def test_part_payment_rekeys_the_remaining_due(school, tmp_path):
+    for reg_no in ("A2", "A3", "B1", "B2"):
+        school.fees_manager.add_payment(reg_no, 10000)
+    result, exceptions = reconcile(school, tmp_path, [
+        ["2024-04-01", "4000", "T1", "", "A1"],
+        ["2024-04-02", "6000", "T2", "", ""],
+    ])
+    assert result["by_amount"] == 1 and paid(school, "A1") == 10000 and exceptions == []
+
+
+def test_ambiguous_and_repeated_rows_go_to_exceptions(school, tmp_path):
+    result, exceptions = reconcile(school, tmp_path, [
+        ["2024-04-01", "500", "T1", "a1 and a2", ""],
+        ["2024-04-01", "10000", "T2", "", ""],
+        ["2024-04-01", "500", "T3", "", "B1"],
+        ["2024-04-01", "500", "t3", "", "B2"],
+    ])
+    assert result["posted"] == 1
+    assert [row[-1] for row in exceptions] == ["reference matches several students: A1, A2",
+                                               "amount matches the dues of 5 students",
+                                               "reference already posted"]
+
+
+@pytest.mark.parametrize("amount", ["nan", "inf", "-inf", "12.5", "0", "abc"])
+def test_bad_amounts_are_exceptions_not_crashes(school, tmp_path, amount):
+    result, exceptions = reconcile(school, tmp_path, [
+        ["2024-04-01", amount, "T1", "", "A1"],
+        ["2024-04-01", "100", "T2", "", "A2"],
+    ])
+    assert result["posted"] == 1
+    assert [row[-1] for row in exceptions] == ["amount must be a positive whole number"]
@@ -0,0 +1,126 @@
+import smtplib
+import socket
+
+import pytest
+
+import Final_SM as sm
+
+
+def reminders(n):
+    return [{"reg_no": f"R{i}", "name": f"Kid {i}", "email": f"parent{i}@home.example", "phone": "9876543210",
+             "text": f"Fees overdue for R{i}"} for i in range(n)]
+
+
+def dispatch(dispatcher, items):
+    dispatcher.start(items)
+    dispatcher.thread.join(30)
+    assert not dispatcher.running()
+    return dispatcher.summary()
+
+
+@pytest.fixture
+def smtp_sink():
+    controller_mod = pytest.importorskip("aiosmtpd.controller")
+
+    class Sink:
+        def __init__(self):
+            self.received = []
+
+        async def handle_DATA(self, server, session, envelope):
+            self.received.append(envelope.rcpt_tos[0])
+            return "250 OK"
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    handler = Sink()
+    controller = controller_mod.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield port, handler
+    controller.stop()
+
+
+def test_every_reminder_is_delivered_once(smtp_sink):
+    port, sink = smtp_sink
+    dispatcher = sm.ReminderDispatcher("127.0.0.1", port, pool_size=2, rate_per_second=1000, batch_size=7)
+    summary = dispatch(dispatcher, reminders(40))
+    assert summary == {"email": {"sent": 40}}
+    assert sorted(sink.received) == sorted(r["email"] for r in reminders(40))
+
+
+def test_unreachable_server_fails_after_retries():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]  # nothing listening
+    dispatcher = sm.ReminderDispatcher("127.0.0.1", port, pool_size=1, rate_per_second=1000, backoff=0.01)
+    assert dispatch(dispatcher, reminders(3)) == {"email": {"failed": 3}}
+    assert all(d["attempts"] == 3 for d in dispatcher.delivery.values())
+
+
+class FlakyConnection:
+    # accepts `capacity` messages, then behaves like a dropped connection
+    def __init__(self, sent, capacity):
+        self.sent, self.capacity = sent, capacity
+
+    def send_message(self, msg):
+        if self.capacity == 0:
+            raise smtplib.SMTPServerDisconnected("connection lost")
+        self.capacity -= 1
+        self.sent.append(msg["To"])
+
+    def close(self):
+        pass
+
+    def quit(self):
+        pass
+
+
+def test_connection_lost_mid_batch_resends_only_the_undelivered(monkeypatch):
+    sent = []
+    # first connection drops after 3 messages, the immediate reconnect is refused, later ones work
+    connections = iter([FlakyConnection(sent, 3), OSError("connection refused")]
+                       + [FlakyConnection(sent, 100) for _ in range(5)])
+
+    def connect(self):
+        conn = next(connections)
+        if isinstance(conn, Exception):
+            raise conn
+        return conn
+
+    monkeypatch.setattr(sm.SmtpPool, "_connect", connect)
+    dispatcher = sm.ReminderDispatcher(pool_size=1, rate_per_second=1000, batch_size=10, backoff=0.01)
+    assert dispatch(dispatcher, reminders(10)) == {"email": {"sent": 10}}
+    assert sorted(sent) == sorted(r["email"] for r in reminders(10))  # nobody emailed twice
+    assert [dispatcher.delivery[(f"R{i}", "email")]["attempts"] for i in (0, 3)] == [1, 2]
+
+
+def test_unexpected_error_fails_the_batch_without_hanging(monkeypatch):
+    sent = []
+    monkeypatch.setattr(sm.SmtpPool, "_connect", lambda self: FlakyConnection(sent, 100))
+    items = reminders(6)
+    del items[2]["email"]  # a broken record raises KeyError while building its batch
+    dispatcher = sm.ReminderDispatcher(pool_size=1, rate_per_second=1000, batch_size=3)
+    summary = dispatch(dispatcher, items)
+    assert summary == {"email": {"failed": 3, "sent": 3}}
+    assert dispatcher.delivery[("R0", "email")]["error"].startswith("KeyError")
+
+
+class RefusingConnection(FlakyConnection):
+    # refuses one address, as a server answering 550 to RCPT TO does
+    def __init__(self, sent, refused):
+        super().__init__(sent, 100)
+        self.refused = refused
+
+    def send_message(self, msg):
+        if msg["To"] == self.refused:
+            raise smtplib.SMTPRecipientsRefused({self.refused: (550, b"No such user")})
+        super().send_message(msg)
+
+
+def test_refused_recipient_fails_alone(monkeypatch):
+    sent, items = [], reminders(5)
+    monkeypatch.setattr(sm.SmtpPool, "_connect", lambda self: RefusingConnection(sent, items[1]["email"]))
+    dispatcher = sm.ReminderDispatcher(pool_size=1, rate_per_second=1000, batch_size=5, backoff=0.01)
+    assert dispatch(dispatcher, items) == {"email": {"failed": 1, "sent": 4}}
+    assert sorted(sent) == sorted(r["email"] for i, r in enumerate(items) if i != 1)
+    assert "No such user" in dispatcher.delivery[("R1", "email")]["error"]
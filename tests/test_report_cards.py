@@ -0,0 +1,70 @@
+import Final_SM as sm
+
+
+def marks(value):
+    return {subj: value for subj in sm.StudentManager.DEFAULT_SUBJECTS}
+
+
+def test_report_card_lists_only_exams_the_student_sat(school):
+    exams = school.exam_manager
+    mid = exams.create_exam("Midterm", 10, "all", "2024-01-10")
+    other = exams.create_exam("Midterm", 9, "all", "2024-01-11")
+    final = exams.create_exam("Final", 10, "all", "2024-03-10")
+    exams.record_marks(final["id"], "A1", marks(70))
+    exams.record_marks(mid["id"], "A1", marks(60))
+    exams.record_marks(other["id"], "B1", marks(50))
+
+    cards = exams.student_report("a1")["cards"]
+    assert [c["exam"]["id"] for c in cards] == [mid["id"], final["id"]]
+    assert [c["average"] for c in cards] == [60, 70]
+    assert exams.student_report("A2")["cards"] == []
+
+
+def test_removed_exam_leaves_the_report_card(school):
+    exams = school.exam_manager
+    mid = exams.create_exam("Midterm", 10, "all", "2024-01-10")
+    exams.record_marks(mid["id"], "A1", marks(60))
+    exams.delete_exam(mid["id"])
+    assert exams.student_report("A1")["cards"] == []
+    assert "A1" not in exams.student_exams
+
+
+def test_renamed_student_keeps_their_cards(school):
+    exams = school.exam_manager
+    mid = exams.create_exam("Midterm", 10, "all", "2024-01-10")
+    exams.record_marks(mid["id"], "A1", marks(80))
+    school.student_manager.edit_student("A1", "reg_no", "Z9")
+    assert [c["average"] for c in exams.student_report("Z9")["cards"]] == [80]
+    assert "A1" not in exams.student_exams
+
+
+def export(school, out_dir, **kwargs):
+    return school.exam_manager.write_report_cards(str(out_dir), ("html", "pdf"), 1, **kwargs)
+
+
+def test_reexport_skips_unchanged_cards_and_rewrites_changed_ones(school, tmp_path):
+    exams = school.exam_manager
+    final = exams.create_exam("Final", 10, "all", "2024-03-10")
+    exams.record_marks(final["id"], "A1", marks(72))
+    exams.record_marks(final["id"], "A2", marks(48))
+    assert export(school, tmp_path) == (10, 0)
+    assert export(school, tmp_path) == (0, 10)
+
+    exams.record_marks(final["id"], "A1", marks(95))
+    assert export(school, tmp_path) == (2, 8)
+    assert "95" in (tmp_path / "A1.html").read_text()
+
+    exams.change_grading_scheme("state")  # every graded card changes, the ungraded ones don't
+    assert export(school, tmp_path) == (4, 6)
+    assert "Distinction" in (tmp_path / "A1.html").read_text()
+
+
+def test_fresh_export_rewrites_everything(school, tmp_path):
+    export(school, tmp_path)
+    assert export(school, tmp_path, fresh=True) == (10, 0)
+
+
+def test_partial_file_is_rewritten(school, tmp_path):
+    export(school, tmp_path)
+    (tmp_path / "B1.pdf").write_bytes(b"%PDF-1.4\ntruncated")
+    assert export(school, tmp_path) == (1, 9)
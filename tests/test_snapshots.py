@@ -0,0 +1,54 @@
+import threading
+from contextlib import contextmanager
+
+
+def hold(lock_context):
+    # holds the lock in another thread until released; returns the release event
+    held, release = threading.Event(), threading.Event()
+
+    def run():
+        with lock_context():
+            held.set()
+            release.wait(5)
+
+    threading.Thread(target=run, daemon=True).start()
+    assert held.wait(5)
+    return release
+
+
+def test_exam_snapshot_runs_alongside_a_report(school):
+    exams = school.exam_manager
+    eid = exams.create_exam("Unit Test", 10, "Maths")["id"]
+    exams.record_marks(eid, "A1", {"Maths": 70})
+    release = hold(exams.lock.read)  # a long report in progress
+    try:
+        done = []
+        taker = threading.Thread(target=lambda: done.append(exams.snapshot()), daemon=True)
+        taker.start()
+        taker.join(5)
+        assert done, "snapshot waited for a reader"
+    finally:
+        release.set()
+    snap = done[0]
+    exams.record_marks(eid, "A2", {"Maths": 80})
+    assert list(snap.marks[eid]) == ["A1"] and snap.analytics.scores[(eid, "Maths")] == [70]
+
+
+def test_exam_snapshot_waits_for_a_marks_writer(school):
+    exams = school.exam_manager
+    exams.create_exam("Unit Test", 10, "Maths")
+
+    @contextmanager
+    def marks_writer():  # the locks record_marks holds
+        with exams.lock.read(), exams.class_locks["Class 10"].write():
+            yield
+
+    release = hold(marks_writer)
+    done = []
+    taker = threading.Thread(target=lambda: done.append(exams.snapshot()), daemon=True)
+    taker.start()
+    taker.join(0.2)
+    assert not done
+    release.set()
+    taker.join(5)
+    assert done
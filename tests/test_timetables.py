@@ -0,0 +1,77 @@
+import pytest
+
+import Final_SM as sm
+
+WEEK = {day: ["Maths", "English", "Tamil", "Science", "Social Science", "Computer Science", "Maths"]
+        for day in sm.TimetableManger.WEEKDAYS}
+
+
+@pytest.fixture
+def timetables():
+    tm = sm.TimetableManger()
+    tm.set_timetable("10", WEEK)
+    return tm
+
+
+def feed(monkeypatch, *answers, before=None):
+    # answers the menu's prompts in order; before[i] runs just before answer i
+    answers = iter(enumerate(answers))
+
+    def fake_input(prompt=""):
+        i, answer = next(answers)
+        if before and i in before:
+            before[i]()
+        return answer
+
+    monkeypatch.setattr("builtins.input", fake_input)
+
+
+def test_remove_and_clear_days(timetables):
+    assert timetables.remove_day("class 10", "monday") == "Monday"
+    assert "Monday" not in timetables.get_timetable("Class 10")
+    assert timetables.clear_day("10", "Friday") == "Friday"
+    assert timetables.get_timetable("10")["Friday"] == ["-"] * 7
+    assert timetables.get_timetable("10")["Tuesday"] == WEEK["Tuesday"]
+    timetables.clear_timetable("10")
+    assert set(map(tuple, timetables.get_timetable("10").values())) == {("-",) * 7}
+    assert timetables.delete_timetable("10") == "Class 10"
+    with pytest.raises(sm.NotFoundError):
+        timetables.get_timetable("10")
+
+
+def test_bad_day_or_class(timetables):
+    with pytest.raises(sm.ValidationError):
+        timetables.clear_day("10", "Sunday")
+    timetables.remove_day("10", "Monday")
+    with pytest.raises(sm.ValidationError):
+        timetables.remove_day("10", "Monday")
+    for op in (timetables.delete_timetable, timetables.clear_timetable):
+        with pytest.raises(sm.NotFoundError):
+            op("9")
+
+
+def test_remove_menu_survives_a_concurrent_delete(timetables, monkeypatch, capsys):
+    # the timetable goes away while the menu waits for the confirmation
+    feed(monkeypatch, "10", "3", "Monday", "y", before={3: lambda: timetables.delete_timetable("10")})
+    timetables.remove_timetable()
+    assert "No timetable found for Class 10." in capsys.readouterr().out
+    assert timetables.time_tables == {}
+
+
+def test_remove_menu_uses_the_service_methods(timetables, monkeypatch):
+    feed(monkeypatch, "10", "2", "wednesday", "y")
+    timetables.remove_timetable()
+    assert "Wednesday" not in timetables.get_timetable("10")
+
+
+def test_teacher_menus_report_a_teacher_removed_meanwhile(monkeypatch, capsys):
+    tm = sm.TeacherManager()
+    tid = tm.create_teacher("Lakshmi", "4", "MSc")["id"]
+    feed(monkeypatch, tid, "y", before={1: lambda: tm.delete_teacher(tid)})
+    tm.remove_teacher()
+    feed(monkeypatch, tid, "Maths")
+    tm.assign_subject()
+    feed(monkeypatch, f" {tid.lower()} ")
+    tm.update_teacher()
+    out = capsys.readouterr().out
+    assert out.count("Teacher not found.") == 3